@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+from typing import TYPE_CHECKING, List, Optional, Tuple
+import selectors
+import time
+from constants import (
+    AT_COMMAND_TIMEOUT,
+    AT_SELECT_INTERVAL,
+    AT_ERROR_TERMINATOR,
+    AT_OK_TERMINATOR,
+)
+from at_parser import AtResponse, parse_response
+
+if TYPE_CHECKING:
+    import paramiko
+
+"""
+Expect style AT command engine.
+
+Instead of sleeping and polling, the engine blocks on the shell channel with a selector
+and matches the reply terminators against everything received so far for the command.
+A command returns as soon as the radio answers, or when its own deadline passes.
+Each reply is fed to an at_parser `AtResponse` as its bytes arrive, so it is parsed by
+the time its terminator is (`AtReply.parsed`); the raw reply is kept as well.
+"""
+
+
+class AtReply:
+    def __init__(
+        self,
+        command: str,
+        response: str,
+        terminator: Optional[bytes],
+        latency: float,
+        data: bytes = b"",
+        parsed: Optional[AtResponse] = None,
+    ) -> None:
+        self.command = command
+        self.response = response
+        self.terminator = terminator
+        self.latency = latency
+        self.data = data  # the raw reply, from the echo on
+        self._parsed = parsed
+
+    @property
+    def parsed(self) -> AtResponse:
+        if self._parsed is None:
+            self._parsed = parse_response(self.data, command=self.command)
+        return self._parsed
+
+    @property
+    def is_ok(self) -> bool:
+        return self.terminator == AT_OK_TERMINATOR
+
+    @property
+    def is_error(self) -> bool:
+        return self.terminator == AT_ERROR_TERMINATOR
+
+    @property
+    def is_timeout(self) -> bool:
+        return self.terminator is None
+
+    @property
+    def outcome(self) -> str:
+        return "ok" if self.is_ok else "timeout" if self.is_timeout else "error"
+
+    @property
+    def name(self) -> str:
+        """
+        The command without its value (which may be a password), e.g. "AT+MSPWD=".
+        """
+        name, is_write, _ = self.command.partition("=")
+        return name + is_write
+
+
+class AtCommandEngine:
+    def __init__(self, shell: "paramiko.Channel", verbose: bool = False) -> None:
+        self.shell = shell
+        self.verbose = verbose
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.shell, selectors.EVENT_READ)
+        # Bytes received after the last matched terminator (i.e. the next reply's start)
+        self.pending = bytearray()
+
+    def close(self) -> None:
+        self.selector.close()
+
+    def __enter__(self) -> "AtCommandEngine":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def execute(self, command: str, timeout: float = AT_COMMAND_TIMEOUT) -> AtReply:
+        """
+        Sends a single AT command and waits for "OK" or "ERROR" (up to timeout seconds).
+        """
+        self._discard()
+
+        start = time.monotonic()
+        self.shell.send(command + "\n")
+        parsed = AtResponse(command=command)
+        buffer, terminator = self.expect(
+            terminators=[AT_OK_TERMINATOR, AT_ERROR_TERMINATOR],
+            deadline=start + timeout,
+            response=parsed,
+        )
+        latency = time.monotonic() - start
+
+        if self.verbose and terminator is None:
+            print(f"Timed out waiting for a reply to {command}")
+
+        data = self._from_echo(buffer, command)
+        return AtReply(
+            command=command,
+            response=data.decode(errors="replace"),
+            terminator=terminator,
+            latency=latency,
+            data=data,
+            parsed=parsed,
+        )
+
+    def execute_pipelined(
+        self, commands: List[str], timeout: float = AT_COMMAND_TIMEOUT
+    ) -> List[AtReply]:
+        """
+        Writes all commands back-to-back and then splits the replies in order, one per
+        "OK"/"ERROR" terminator. Only use this for read-only or order independent commands,
+        since a command after an "ERROR" has already been sent.
+        Returns fewer replies than commands if the radio stops answering.
+        """
+        self._discard()
+
+        start = time.monotonic()
+        self.shell.send("".join(command + "\n" for command in commands))
+
+        replies = []
+        for command in commands:
+            parsed = AtResponse(command=command)
+            buffer, terminator = self.expect(
+                terminators=[AT_OK_TERMINATOR, AT_ERROR_TERMINATOR],
+                deadline=time.monotonic() + timeout,
+                response=parsed,
+            )
+            data = self._from_echo(buffer, command)
+            replies.append(
+                AtReply(
+                    command=command,
+                    response=data.decode(errors="replace"),
+                    terminator=terminator,
+                    latency=time.monotonic() - start,
+                    data=data,
+                    parsed=parsed,
+                )
+            )
+            if terminator is None:
+                if self.verbose:
+                    print(f"Timed out waiting for a reply to {command}")
+                break
+
+        return replies
+
+    def _from_echo(self, buffer: bytearray, command: str) -> bytes:
+        """
+        The reply without anything before the command's echo (e.g. a late prompt).
+        """
+        index = buffer.find(command.encode())
+        if index == -1:
+            if self.verbose:
+                print(f"Reply does not echo {command}: {buffer!r}")
+            index = 0
+        return bytes(buffer[index:])
+
+    def _discard(self) -> None:
+        """
+        Discard anything left over (e.g. the prompt after the previous reply).
+        """
+        self.pending = bytearray()
+        while self.shell.recv_ready():
+            self.shell.recv(4096)
+
+    def expect(
+        self,
+        terminators: List[bytes],
+        deadline: float,
+        response: Optional[AtResponse] = None,
+    ) -> Tuple[bytearray, Optional[bytes]]:
+        """
+        Reads from the shell until one of the terminators is found in the accumulated
+        buffer or the monotonic deadline passes. Returns (buffer, matched terminator or None).
+        A terminator split across two reads is still found because the search covers the
+        tail of the previous data. Anything after the terminator is kept for the next call.
+        The data up to the terminator is also fed to response as it arrives.
+        """
+        buffer = self.pending
+        self.pending = bytearray()
+        longest = max(len(t) for t in terminators)
+        searched = 0
+        fed = 0
+
+        while True:
+            while self.shell.recv_ready():
+                buffer += self.shell.recv(4096)
+
+            if len(buffer) > searched:
+                start = max(0, searched - longest + 1)
+                found: Optional[bytes] = None
+                found_at = -1
+                for terminator in terminators:
+                    index = buffer.find(terminator, start)
+                    if index != -1 and (found_at == -1 or index < found_at):
+                        found, found_at = terminator, index
+                if found is not None:
+                    end = found_at + len(found)
+                    self.pending = buffer[end:]
+                    del buffer[end:]
+                    if response is not None:
+                        response.feed(buffer[fed:])
+                        response.close()
+                    return buffer, found
+                searched = len(buffer)
+                if response is not None:
+                    response.feed(buffer[fed:])
+                    fed = searched
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.shell.closed or self.shell.eof_received:
+                if response is not None:
+                    response.close()
+                return buffer, None
+            # A shell closed from another thread (see SshSession.cancel) does not wake
+            # the selector, so it is checked every AT_SELECT_INTERVAL
+            self.selector.select(min(remaining, AT_SELECT_INTERVAL))
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+from typing import Dict, List, Optional, Union
+import re
+from enum import Enum
+
+"""
+Streaming parser for the radio's AT command replies.
+
+Bytes are fed as they arrive. Each read is searched for its last newline only, and the
+lines it completed are decoded in one go, so a multibyte character split across two
+reads is decoded whole. The AT engine feeds every reply into its `AtResponse` from its
+read loop.
+
+The reply is sorted on first use. "+KEY: value" lines are found with one regex search
+over the reply after the command echo, the OK or ERROR status is read back from its end,
+and the lines are only split for bare values and status listings. Typed values:
+
+    +MWTXPOWER: 30 dBm  ->  response.number("MWTXPOWER") == 30
+    +MWFREQ: 2310 MHz   ->  response.number("MWFREQ") == 2310
+"""
+
+NUMBER = re.compile(r"[-+]?\d+(?:\.\d+)?")
+# Searched for anywhere, since a regex anchored to line starts is tried at every offset
+VALUE = re.compile(r"\+([^:\n]*):([^\n]*)")
+
+
+class ReplyStatus(Enum):
+    OK = "ok"
+    ERROR = "error"
+
+
+def parse_number(text: Optional[str]) -> Optional[float]:
+    """
+    The first number in text, e.g. -65.0 for "-65 dBm".
+    """
+    if not text:
+        return None
+    match = NUMBER.search(text)
+    return float(match.group()) if match else None
+
+
+class AtResponse:
+    """
+    The parsed reply to one AT command.
+    """
+
+    def __init__(self, command: str = "", prompt: str = ">") -> None:
+        """
+        command is the AT command the reply belongs to, used to recognize its echo.
+        """
+        self.command = command
+        self.prompt = prompt
+        self.buffer = bytearray()  # received after the last complete line
+        self.parts: List[str] = []  # the complete lines, decoded as they arrive
+        self.text = ""  # the parts joined, once sorted
+        self.start = 0  # the offset of the line after the echo in text
+        self._is_sorted = False
+        self._values: Dict[str, str] = {}
+        self._lines: Optional[List[str]] = None
+        self._status: Optional[ReplyStatus] = None
+        self._error = ""
+
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        """
+        Adds the next bytes of the reply as they are received.
+        """
+        searched = len(self.buffer)
+        self.buffer += data
+        # Only the new data can hold the newline which completes lines
+        end = self.buffer.rfind(b"\n", searched)
+        if end != -1:
+            self.parts.append(self.buffer[: end + 1].decode(errors="replace"))
+            del self.buffer[: end + 1]
+            self._is_sorted = False
+
+    def close(self) -> None:
+        """
+        Adds the rest of the reply after its last newline (usually the prompt).
+        """
+        if self.buffer:
+            self.parts.append(self.buffer.decode(errors="replace"))
+            self.buffer = bytearray()
+            self._is_sorted = False
+
+    @property
+    def values(self) -> Dict[str, str]:
+        if not self._is_sorted:
+            self._sort()
+        return self._values
+
+    @property
+    def lines(self) -> List[str]:
+        """
+        Value and text lines, in order.
+        """
+        if not self._is_sorted:
+            self._sort()
+        if self._lines is None:
+            self._lines = self._split_lines()
+        return self._lines
+
+    @property
+    def status(self) -> Optional[ReplyStatus]:
+        """
+        OK, ERROR, or None while incomplete.
+        """
+        if not self._is_sorted:
+            self._sort()
+        return self._status
+
+    @property
+    def error(self) -> str:
+        if not self._is_sorted:
+            self._sort()
+        return self._error
+
+    @property
+    def is_ok(self) -> bool:
+        return self.status == ReplyStatus.OK
+
+    @property
+    def is_error(self) -> bool:
+        return self.status == ReplyStatus.ERROR
+
+    def _sort(self) -> None:
+        # Anything before the echo (e.g. the end of an earlier reply) is not ours
+        self.text = text = "".join(self.parts)
+        self.parts = [text]
+        self.start = start = self._after_echo(text)
+        self._is_sorted = True
+        self._lines = None
+        self._values = {}
+        command = self.command
+        for match in VALUE.finditer(text, start):
+            # Only "+KEY: value" lines count, not a "+" later in some other line
+            offset = match.start()
+            if offset > start and text[offset - 1] != "\n":
+                line_start = max(text.rfind("\n", start, offset) + 1, start)
+                if text[line_start:offset].strip():
+                    continue
+            key, value = match.groups()
+            value = value.strip()
+            if "> AT" not in value and not (command and value.endswith(command)):
+                self._values.setdefault(key.strip(), value)
+
+        # The status is the last OK or ERROR line, which is at the end of a reply
+        self._status = None
+        self._error = ""
+        end = len(text)
+        while end > start:
+            line_start = max(text.rfind("\n", start, end) + 1, start)
+            line = text[line_start:end].strip()
+            if line == "OK":
+                self._status = ReplyStatus.OK
+                break
+            if line.startswith("ERROR"):
+                self._status = ReplyStatus.ERROR
+                self._error = line
+                break
+            end = line_start - 1
+
+    def _after_echo(self, text: str) -> int:
+        """
+        The offset after the last line which ends with the command's echo, or 0.
+        """
+        command = self.command
+        index = text.rfind(command) if command else -1
+        while index != -1:
+            end = text.find("\n", index)
+            rest = text[index + len(command) : end if end != -1 else len(text)]
+            if not rest.strip():
+                return end + 1 if end != -1 else len(text)
+            index = text.rfind(command, 0, index)
+        return 0
+
+    def _ends_with_command(self, text: str) -> bool:
+        return bool(self.command) and text.rstrip().endswith(self.command)
+
+    def _split_lines(self) -> List[str]:
+        lines = []
+        for line in self.text[self.start :].split("\n"):
+            text = line.strip()
+            if not text or text == "OK" or text.startswith("ERROR"):
+                continue
+            # The echo may come after a prompt, e.g. "UserDevice> AT+MWFREQ"
+            if text.startswith("AT") or "> AT" in text or self._ends_with_command(text):
+                continue
+            if not (text[0] == "+" and ":" in text) and text.endswith(self.prompt):
+                continue
+            lines.append(text)
+        return lines
+
+    def value(self, key: str = "") -> Optional[str]:
+        """
+        The value of "+KEY: value" (or "KEY: value"). Without a key, or if the radio
+        answered with a bare value, the first value or text line is used.
+        """
+        if not self._is_sorted:
+            self._sort()
+        if self._status == ReplyStatus.ERROR:
+            return None
+        if key in self._values:
+            return self._values[key]
+        marker = f"{key}:"
+        for line in self.lines:
+            if key and marker in line:
+                return line.split(marker, 1)[1].strip() or None
+        if not key or not self.values:
+            return self.lines[0] if self.lines else None
+        return None
+
+    def labelled(self, label: str) -> Optional[str]:
+        """
+        The value of a "+LABEL: value" or "Label : value" line, as in status listings.
+        The label matches case-insensitively and may be followed by a unit in
+        parentheses, e.g. "SNR" matches "SNR (dB)   : 32".
+        """
+        if self.is_error:
+            return None
+        if label in self.values:
+            return self.values[label]
+        # The label's words, then an optional unit in parentheses, before the first ":"
+        name = r"[ \t]+".join(re.escape(word) for word in label.split())
+        pattern = rf"^[ \t\r]*\+?{name}(?:[ \t]+\([^:\n]*)?[ \t]*:([^\n]*)$"
+        for match in re.finditer(pattern, self.text[self.start :], re.I | re.M):
+            line = match.group(0).strip()
+            if not (line.startswith("AT") or "> AT" in line):
+                return match.group(1).strip() or None
+        return None
+
+    def number(self, key: str = "") -> Optional[float]:
+        """
+        The first number in the value, e.g. -65.0 for "+MWRSSI: -65 dBm".
+        """
+        return parse_number(self.value(key))
+
+
+def parse_response(data: Union[str, bytes, bytearray], command: str = "") -> AtResponse:
+    """
+    Parses one complete reply.
+    """
+    response = AtResponse(command=command)
+    response.parts.append(
+        data if isinstance(data, str) else data.decode(errors="replace")
+    )
+    return response
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+from typing import Any, Deque, List, Optional, Tuple
+from collections import deque
+import heapq
+import itertools
+import os
+import threading
+import time
+from constants import (
+    BUZZER_BACKEND_ENV,
+    BUZZER_NOTE_DURATION,
+    BUZZER_NULL_EVENTS,
+    BUZZER_PIN,
+    BUZZER_QUEUE_SIZE,
+    BUZZER_QUICK_BEEP_DURATION,
+)
+
+"""
+Non-blocking buzzer pattern player.
+
+Patterns are small descriptions of (on, off) steps in note units (a sixteenth note,
+see BUZZER_NOTE_DURATION) and are played by a worker thread, so an action can print its
+result right away while its beeps keep playing. Patterns wait in a small priority queue:
+a higher priority pattern cuts off the one playing (a failure cuts off a heartbeat), and a
+preempted repeating pattern resumes once the queue is empty.
+
+buzzer_service.py is shared with other packages and left as it is; this module only
+reuses its timings.
+"""
+
+PRIORITY_LOW = 0  # heartbeats
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2  # failures
+
+QUICK = BUZZER_QUICK_BEEP_DURATION / BUZZER_NOTE_DURATION  # a quick beep in notes
+MEASURE = 16  # notes per heartbeat measure
+
+# Interrupt reasons for the pattern playing
+_PREEMPTED = "preempted"
+_CANCELLED = "cancelled"
+
+
+class BuzzerPattern:
+    def __init__(
+        self,
+        name: str,
+        steps: List[Tuple[float, float]],
+        priority: int = PRIORITY_NORMAL,
+        repeat: bool = False,
+    ) -> None:
+        """
+        steps are (on, off) durations in notes, played in order.
+        A repeating pattern plays until it is stopped or replaced by another repeating one.
+        """
+        self.name = name
+        self.steps = steps
+        self.priority = priority
+        self.repeat = repeat
+
+    @property
+    def notes(self) -> float:
+        return sum(on + off for on, off in self.steps)
+
+    def __repr__(self) -> str:
+        return f"BuzzerPattern({self.name})"
+
+
+def _quick_beeps(count: int, rest: float = 0.0) -> List[Tuple[float, float]]:
+    """
+    count quick beeps one note apart, the last one followed by `rest` extra notes.
+    """
+    steps = [(QUICK, 1.0 - QUICK) for _ in range(count)]
+    steps[-1] = (QUICK, 1.0 - QUICK + rest)
+    return steps
+
+
+# The patterns of BuzzerService
+SUCCESS = BuzzerPattern("success", _quick_beeps(2, rest=2.0) + [(4.0, 0.0)])
+TWO_LONG_FAILURE = BuzzerPattern(
+    "two_long_failure", [(8.0, 2.0), (8.0, 0.0)], priority=PRIORITY_HIGH
+)
+THREE_LONG_FAILURE = BuzzerPattern(
+    "three_long_failure", [(8.0, 2.0), (8.0, 2.0), (8.0, 0.0)], priority=PRIORITY_HIGH
+)
+FOUR_QUICK = BuzzerPattern("four_quick", _quick_beeps(4))
+FIVE_SPACED_OUT = BuzzerPattern(
+    "five_spaced_out", [(QUICK, 2.0 - QUICK) for _ in range(5)]
+)
+SINGLE_HEARTBEAT = BuzzerPattern(
+    "single_heartbeat", _quick_beeps(1, rest=MEASURE - 1), PRIORITY_LOW, repeat=True
+)
+DOUBLE_HEARTBEAT = BuzzerPattern(
+    "double_heartbeat", _quick_beeps(2, rest=MEASURE - 2), PRIORITY_LOW, repeat=True
+)
+TRIPLE_HEARTBEAT = BuzzerPattern(
+    "triple_heartbeat", _quick_beeps(3, rest=MEASURE - 3), PRIORITY_LOW, repeat=True
+)
+
+
+class GpioBuzzerBackend:
+    def __init__(self, pin: int = BUZZER_PIN) -> None:
+        # Imported here so RPi.GPIO is only needed when the buzzer is used
+        import RPi.GPIO as GPIO
+
+        self.gpio = GPIO
+        self.pin = pin
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setwarnings(False)
+        GPIO.setup(pin, GPIO.OUT)
+
+    def set(self, is_on: bool) -> None:
+        # The SBX board inverts the logic, low is on
+        self.gpio.output(self.pin, 0 if is_on else 1)
+
+
+class NullBuzzerBackend:
+    """
+    Records the buzzer state changes instead of driving a pin, for boards without a
+    buzzer and for tests. Only the latest max_events are kept, since the daemon and the
+    RSSI service run on it for good on boards without a buzzer.
+    """
+
+    def __init__(self, max_events: int = BUZZER_NULL_EVENTS) -> None:
+        self.events: Deque[Tuple[float, bool]] = deque(maxlen=max_events)
+
+    def set(self, is_on: bool) -> None:
+        self.events.append((time.monotonic(), is_on))
+
+
+class BuzzerPlayer:
+    def __init__(
+        self,
+        backend: Optional[Any] = None,
+        note_duration: float = BUZZER_NOTE_DURATION,
+        max_queue: int = BUZZER_QUEUE_SIZE,
+        daemon: bool = False,
+        verbose: bool = False,
+    ) -> None:
+        """
+        The backend is created on the worker thread when not given, so GPIO set up
+        does not delay the caller. With daemon=False (the CLI) the interpreter waits for
+        the patterns queued before it exits.
+        """
+        self.backend = backend
+        self.note_duration = note_duration
+        self.max_queue = max_queue
+        self.daemon = daemon
+        self.verbose = verbose
+        self.current: Optional[BuzzerPattern] = None
+        # (-priority, sequence, pattern), so equal priorities play in order
+        self._queue: List[Tuple[int, int, BuzzerPattern]] = []
+        self._sequence = itertools.count()
+        self._interrupt: Optional[str] = None
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def play(self, pattern: BuzzerPattern) -> bool:
+        """
+        Queues pattern and returns right away. Returns False if the queue is full.
+        """
+        with self._condition:
+            if pattern.repeat:
+                # Only one repeating pattern at a time, the new one replaces the old
+                self._queue = [item for item in self._queue if not item[2].repeat]
+                heapq.heapify(self._queue)
+                if self.current is not None and self.current.repeat:
+                    self._interrupt = _CANCELLED
+
+            if len(self._queue) >= self.max_queue:
+                if self.verbose:
+                    print(f"Buzzer queue is full, dropping {pattern.name}")
+                return False
+
+            heapq.heappush(
+                self._queue, (-pattern.priority, next(self._sequence), pattern)
+            )
+            if (
+                self.current is not None
+                and self._interrupt is None
+                and pattern.priority > self.current.priority
+            ):
+                self._interrupt = _PREEMPTED
+            self._condition.notify_all()
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=self.daemon)
+                self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """
+        Silences the buzzer and drops everything queued.
+        """
+        with self._condition:
+            self._queue.clear()
+            if self.current is not None:
+                self._interrupt = _CANCELLED
+            self._condition.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until nothing is playing or queued. Returns False on timeout, which is
+        always the case while a repeating pattern plays.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._thread is None, timeout=timeout
+            )
+
+    def _run(self) -> None:
+        if self.backend is None:
+            try:
+                self.backend = GpioBuzzerBackend()
+            except Exception as e:
+                print(f"Buzzer unavailable: {e}")
+                self.backend = NullBuzzerBackend()
+
+        while True:
+            with self._condition:
+                if not self._queue:
+                    self.current = None
+                    self._thread = None
+                    self._condition.notify_all()
+                    return
+                _, _, pattern = heapq.heappop(self._queue)
+                self.current = pattern
+                self._interrupt = None
+
+            if self.verbose:
+                print(f"Buzzer playing {pattern.name}")
+            is_complete = self._play_once(pattern)
+
+            with self._condition:
+                # A repeating pattern goes back in line behind anything queued meanwhile
+                # and resumes after a preemption, but not after stop() or a replacement.
+                if pattern.repeat and self._interrupt != _CANCELLED:
+                    heapq.heappush(
+                        self._queue,
+                        (-pattern.priority, next(self._sequence), pattern),
+                    )
+                if not is_complete and self.verbose:
+                    print(f"Buzzer {pattern.name} {self._interrupt}")
+
+    def _play_once(self, pattern: BuzzerPattern) -> bool:
+        """
+        Returns False if the pattern was interrupted.
+        """
+        # Set up by the worker before the first pattern is played
+        backend = self.backend
+        assert backend is not None
+        try:
+            for on, off in pattern.steps:
+                if on:
+                    backend.set(True)
+                    is_complete = self._sleep(on * self.note_duration)
+                    backend.set(False)
+                    if not is_complete:
+                        return False
+                if off and not self._sleep(off * self.note_duration):
+                    return False
+            return True
+        except Exception as e:
+            print(f"Buzzer error: {e}")
+            return False
+        finally:
+            try:
+                backend.set(False)
+            except Exception:
+                pass
+
+    def _sleep(self, seconds: float) -> bool:
+        deadline = time.monotonic() + seconds
+        with self._condition:
+            while self._interrupt is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return True
+                self._condition.wait(remaining)
+        return False
+
+
+_player: Optional[BuzzerPlayer] = None
+_player_lock = threading.Lock()
+
+
+def get_player(verbose: bool = False) -> BuzzerPlayer:
+    """
+    The process wide player. Set MICROHARD_BUZZER_BACKEND=null to play without a buzzer.
+    """
+    global _player
+    with _player_lock:
+        if _player is None:
+            backend = (
+                NullBuzzerBackend()
+                if os.environ.get(BUZZER_BACKEND_ENV) == "null"
+                else None
+            )
+            _player = BuzzerPlayer(backend=backend, verbose=verbose)
+        return _player
+
+
+def _reset_after_fork() -> None:
+    # The worker thread does not exist in a forked child, start over with a new player
+    global _player, _player_lock
+    _player = None
+    _player_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+from typing import Any, Callable, Dict, List, Optional
+import statistics
+import subprocess
+import time
+from constants import (
+    DAEMON_REQUEST_TIMEOUT,
+    DAEMON_SOCKET_PATH,
+    SURVEY_DWELL,
+    SURVEY_SAMPLE_INTERVAL,
+    SURVEY_SAMPLES,
+    SURVEY_TELEMETRY,
+)
+from at_parser import parse_response
+from control_socket import ControlClient
+from fleet_discovery import print_json
+from link_telemetry import LinkTelemetry
+from microhard_service import MicrohardService
+
+"""
+Survey of candidate frequencies, to find a clean channel at a new site.
+
+In one SSH session the radio is tuned to each candidate with AT+MWFREQ (without AT&W,
+so nothing is written to flash), left to settle for `dwell` seconds and sampled
+`samples` times; RSSI and noise floor are read in one pipelined round trip per sample.
+Channels are scored on their interference level, the median noise floor (or RSSI when
+the radio reports no noise floor) plus its standard deviation, so a quiet and steady
+channel beats one that is quiet only on average. Afterwards the radio goes back to its
+previous frequency, or the best channel is applied and saved like `update --frequency`.
+
+Tuning away from the network's frequency drops the link, so survey before flight.
+The survey talks to the radio directly, so it refuses to run while rssi.service (which
+may also be changing the TX power) or the microhard daemon could use the radio.
+"""
+
+
+def radio_users(daemon_socket_path: str = DAEMON_SOCKET_PATH) -> List[str]:
+    """
+    The services which currently poll or configure the radio on their own.
+    """
+    users = []
+    try:
+        result = subprocess.run(
+            ["systemctl", "is-active", "--quiet", "rssi.service"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        if result.returncode == 0:
+            users.append("rssi.service")
+    except OSError:
+        pass  # no systemd, e.g. on a bench machine
+    if ControlClient(
+        socket_path=daemon_socket_path, timeout=DAEMON_REQUEST_TIMEOUT
+    ).is_listening():
+        users.append("the microhard daemon")
+    return users
+
+
+class ChannelSurvey:
+    def __init__(
+        self,
+        service: MicrohardService,
+        ek: str,
+        dwell: float = SURVEY_DWELL,
+        samples: int = SURVEY_SAMPLES,
+        sample_interval: float = SURVEY_SAMPLE_INTERVAL,
+        verbose: bool = False,
+    ) -> None:
+        self.service = service
+        self.ek = ek
+        self.dwell = dwell
+        self.samples = samples
+        self.sample_interval = sample_interval
+        self.verbose = verbose
+        self.telemetry = LinkTelemetry(SURVEY_TELEMETRY)
+
+    def run(
+        self,
+        frequencies: List[int],
+        apply: bool = False,
+        on_result: Callable[[Dict[str, Any]], None] = print_json,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the score of each frequency, best first, also passing each to on_result
+        as soon as it is measured. With apply the best frequency is saved to the radio.
+        Raises if another service is using the radio (see `radio_users`).
+        """
+        users = radio_users()
+        if users:
+            raise Exception(f"Stop {' and '.join(users)} before surveying")
+        original = self._current_frequency()
+        results = []
+        try:
+            for frequency in frequencies:
+                result = self._measure(frequency)
+                on_result(result)
+                results.append(result)
+        finally:
+            if original is not None:
+                # Back to where the radio was, also if the survey was interrupted
+                self._tune(original)
+
+        ranked = sorted(
+            results,
+            key=lambda r: r["score"] if r["score"] is not None else float("-inf"),
+            reverse=True,
+        )
+        if apply and ranked and ranked[0]["score"] is not None:
+            best = ranked[0]["frequency"]
+            if self.verbose:
+                print(f"Applying {best} MHz")
+            is_success, _ = self.service.apply_config(
+                ek=self.ek, at_commands=[f"AT+MWFREQ={best}"]
+            )
+            if not is_success:
+                raise Exception(f"Unable to apply {best} MHz")
+        return ranked
+
+    def _current_frequency(self) -> Optional[int]:
+        is_success, responses = self.service.send_commands(
+            ek=self.ek, at_commands=["AT+MWFREQ"], beep=False
+        )
+        if not is_success:
+            raise Exception("Unable to read the current frequency")
+        frequency = parse_response(responses[0], command="AT+MWFREQ").number("MWFREQ")
+        return int(frequency) if frequency is not None else None
+
+    def _tune(self, frequency: int) -> bool:
+        is_success, _ = self.service.send_commands(
+            ek=self.ek, at_commands=[f"AT+MWFREQ={frequency}"], beep=False
+        )
+        return is_success
+
+    def _measure(self, frequency: int) -> Dict[str, Any]:
+        start = time.monotonic()
+        result: Dict[str, Any] = {"frequency": frequency, "score": None}
+        if not self._tune(frequency):
+            result["error"] = "Frequency rejected by the radio"
+            return result
+        time.sleep(self.dwell)
+
+        rssi: List[float] = []
+        noise: List[float] = []
+        snr: List[float] = []
+        failures = 0
+        for i in range(self.samples):
+            if i:
+                time.sleep(self.sample_interval)
+            _, responses = self.service.send_commands(
+                ek=self.ek,
+                at_commands=self.telemetry.commands,
+                pipelined=True,
+                beep=False,
+            )
+            sample = self.telemetry.parse(self.service.monark_id, responses)
+            if sample.rssi is None and sample.noise is None:
+                failures += 1
+                continue
+            for values, value in [
+                (rssi, sample.rssi),
+                (noise, sample.noise),
+                (snr, sample.snr),
+            ]:
+                if value is not None:
+                    values.append(value)
+
+        result.update(
+            {
+                "samples": self.samples - failures,
+                "failures": failures,
+                "rssi_median": statistics.median(rssi) if rssi else None,
+                "noise_median": statistics.median(noise) if noise else None,
+                "snr_median": statistics.median(snr) if snr else None,
+            }
+        )
+        # In-channel energy: the noise floor, or RSSI when the radio has no noise figure
+        levels = noise or rssi
+        if levels:
+            interference = statistics.median(levels) + statistics.pstdev(levels)
+            result["interference_dbm"] = round(interference, 1)
+            result["score"] = round(-interference, 1)
+        result["seconds"] = round(time.monotonic() - start, 2)
+        return result
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+from typing import Dict, List, Optional, Tuple
+import re
+from constants import AT_SAVE_COMMAND
+from at_parser import parse_number, parse_response
+
+"""
+Plans the minimal set of AT write commands for a desired radio configuration.
+
+The current value of each setting is read back with its query form (e.g. AT+MWFREQ for
+AT+MWFREQ=2310) and only the settings which differ are written. Settings that cannot be
+read back are decided from what is known instead:
+    - AT+MSPWD is skipped when we already logged in with the requested password.
+    - AT+MWVENCRYPT is skipped when the mode matches and the key is the login password
+      (pairing always sets the key and the password together).
+    - AT+MNLANDHCP is only sent together with a change to AT+MNLAN.
+Anything that can not be parsed is treated as changed, so the planner never skips a
+write it is unsure about.
+"""
+
+# Settings whose value is compared as a number (the reply carries a unit, e.g. "30 dBm")
+NUMERIC_KEYS = ["MWTXPOWER", "MWFREQ", "MWDISTANCE"]
+# Settings which are compared by plain value
+VALUE_KEYS = ["MWRADIO", "MWVMODE", "MWNETWORKID"] + NUMERIC_KEYS
+
+
+def split_command(at_command: str) -> Tuple[str, List[str]]:
+    """
+    "AT+MWFREQ=2310" -> ("MWFREQ", ["2310"])
+    """
+    body = at_command.split("AT+", 1)[-1]
+    key, _, args = body.partition("=")
+    return key, args.split(",") if args else []
+
+
+def reply_value(reply: str, key: str) -> Optional[str]:
+    """
+    Returns the text after "KEY:" on its line, e.g. "30 dBm" for "+MWTXPOWER: 30 dBm".
+    """
+    return parse_response(reply, command=f"AT+{key}").value(key)
+
+
+def reply_fields(reply: str, key: str) -> List[str]:
+    """
+    Every field of the reply, split on commas, colons and whitespace, e.g.
+    ["MNLAN", "LAN", "192.168.168.1", "255.255.255.0"] for
+    "+MNLAN: LAN,192.168.168.1,255.255.255.0". Empty for an error reply.
+    """
+    response = parse_response(reply, command=f"AT+{key}")
+    if response.is_error:
+        return []
+    return [
+        field
+        for line in response.lines
+        for field in re.split(r"[\s,:]+", line.lstrip("+"))
+        if field
+    ]
+
+
+class ConfigPlanner:
+    def __init__(self, verbose: bool = False) -> None:
+        self.verbose = verbose
+
+    def queries(self, at_commands: List[str]) -> List[str]:
+        """
+        The read commands needed to plan at_commands.
+        """
+        queries = []
+        for at_command in at_commands:
+            key, _ = split_command(at_command)
+            if key in VALUE_KEYS or key in ["MWVENCRYPT", "MNLAN"]:
+                queries.append(f"AT+{key}")
+        return queries
+
+    def plan(
+        self, at_commands: List[str], current: Dict[str, str], login_password: str
+    ) -> List[str]:
+        """
+        Returns the subset of at_commands which would change the radio, in their original
+        order. `current` maps each query (see `queries`) to its raw reply.
+        """
+        changes = []
+        is_lan_changed = False
+        for at_command in at_commands:
+            if at_command == AT_SAVE_COMMAND:
+                continue
+            key, args = split_command(at_command)
+            if key == "MNLANDHCP":
+                is_changed = is_lan_changed
+            else:
+                is_changed = self._is_changed(key, args, current, login_password)
+            if key == "MNLAN":
+                is_lan_changed = is_changed
+
+            if is_changed:
+                changes.append(at_command)
+            elif self.verbose:
+                print(f"Skipping unchanged setting {at_command}")
+
+        return changes
+
+    def _is_changed(
+        self, key: str, args: List[str], current: Dict[str, str], login_password: str
+    ) -> bool:
+        if key == "MSPWD":
+            return not args or args[0] != login_password
+
+        value = reply_value(current.get(f"AT+{key}", ""), key)
+        if value is None:
+            # Either the setting can not be read back or the reply was not understood
+            return True
+
+        if key in NUMERIC_KEYS:
+            desired = parse_number(args[0]) if args else None
+            return desired is None or parse_number(value) != desired
+        if key in VALUE_KEYS:
+            return not args or value != args[0]
+        if key == "MWVENCRYPT":
+            return len(args) < 2 or args[1] != login_password or value[:1] != args[0]
+        if key == "MNLAN":
+            # AT+MNLAN=LAN,EDIT,0,<ip>,<netmask>,0
+            # The address and netmask must be whole fields, 172.20.2.1 is not 172.20.2.12
+            fields = reply_fields(current.get(f"AT+{key}", ""), key)
+            return len(args) < 5 or not all(arg in fields for arg in args[3:5])
+        return True
@@ -8,6 +8,17 @@ NO: Final = "NO"
 FAILURE: Final = "FAILURE"
 MONARK_ID_FILE_NAME: Final = "/home/monark/monark_id.txt"
 CHECKSUM_FILE_NAME: Final = "/home/monark/.checksum"
+RADIO_STATE_FILE_NAME: Final = "/home/monark/.microhard_state.json"
+LINK_STATUS_FILE_NAME: Final = "/dev/shm/microhard_link_status"
+FLIGHT_LOG_DIR: Final = "/home/monark/flight_logs"
+FLIGHT_LOG_MAX_BYTES: Final = 1024 * 1024  # a new file is started past this size
+FLIGHT_LOG_MAX_AGE: Final = 3600.0  # or after this many seconds
+FLIGHT_LOG_MAX_FILES: Final = 240  # the oldest files are removed past this count
+FLIGHT_LOG_SYNC_INTERVAL: Final = (
+    10.0  # at most this many seconds of samples lost on power loss
+)
+FLIGHT_LOG_GAP: Final = 60.0  # seconds without samples that separate two flights
+IMPORT_TIMING_FILE_NAME: Final = "/tmp/microhard_import_timing.jsonl"
 NAMESPACE_URI = "http://pix4d.com/camera/1.0/"
 MICROHARD_USER: Final = "admin"
 MICROHARD_DEFAULT_IP: Final = "192.168.168.1"
@@ -15,8 +26,94 @@ MICROHARD_IP_PREFIX: Final = "172.20.2"
 MAX_MONARK_ID: Final = 255
 NEWEK: Final = "NEWEK"
 RSSI_DELAY: Final = 5
+RSSI_FAST_DELAY: Final = 1.0
+RSSI_ADAPTIVE_THRESHOLD_DBM: Final = -85
+RSSI_ADAPTIVE_DROP_DB: Final = 6
+RSSI_ADAPTIVE_HOLD_SAMPLES: Final = 5
+RSSI_HISTORY_SIZE: Final = 3600
+RSSI_EMA_ALPHA: Final = 0.2
+RSSI_STATS_WINDOW: Final = 60.0
+# Only root and the service's group may use the control sockets
+MICROHARD_RUN_DIR: Final = "/run/microhard"
+CONTROL_SOCKET_MODE: Final = 0o660
+RSSI_STATS_SOCKET_PATH: Final = f"{MICROHARD_RUN_DIR}/microhard_rssi.sock"
 RSSI_SOCKET_HOST = "localhost"
 RSSI_SOCKET_PORT = 54323
+RSSI_SOCKET_TIMEOUT: Final = 2.0
+RSSI_QUEUE_SIZE: Final = 120
+RSSI_BATCH_SIZE: Final = 20
+RSSI_RECONNECT_MIN_DELAY: Final = 0.5
+RSSI_RECONNECT_MAX_DELAY: Final = 30.0
+LINK_FAILURES_BEFORE_RECONNECT: Final = (
+    2  # failed RSSI polls before the IP is resolved again
+)
+LINK_RECONNECT_MIN_DELAY: Final = 0.5
+LINK_RECONNECT_MAX_DELAY: Final = 4.0
+KNOWN_HOSTS_FILE_NAME: Final = "/home/echopilot/.ssh/known_hosts"
+SSH_CONNECT_TIMEOUT: Final = 10
+SSH_KEEPALIVE_INTERVAL: Final = 5
+SSH_SHELL_OPEN_TIMEOUT: Final = 2
+MICROHARD_PROMPT: Final = b">"
+AT_COMMAND_TIMEOUT: Final = 15
+AT_SELECT_INTERVAL: Final = 0.5  # longest wait without checking for a closed shell
+AT_OK_TERMINATOR: Final = b"\nOK\r"
+AT_ERROR_TERMINATOR: Final = b"ERROR"
+MAVLINK_SYSTEM_ID: Final = 1
+MAVLINK_COMPONENT_ID: Final = 68  # MAV_COMP_ID_TELEMETRY_RADIO
+MAVLINK_RADIO_STATUS_MSG_ID: Final = 109
+MAVLINK_RADIO_STATUS_CRC_EXTRA: Final = 185
+MAVLINK_UNKNOWN: Final = 255  # UINT8_MAX means invalid/unknown in RADIO_STATUS
+MAVLINK_RADIO_STATUS_ENDPOINTS: Final = "127.0.0.1:14550"
+SSH_PORT: Final = 22
+PROBE_TIMEOUT: Final = 0.3
+PROBE_CACHE_TTL: Final = 5.0
+PROBE_MAX_PARALLEL: Final = (
+    256  # connects in flight at once (each is a file descriptor)
+)
+DISCOVER_WORKERS: Final = 8  # concurrent SSH sessions when discover fetches info
+FLEET_CONCURRENCY: Final = 8  # radios provisioned at once by the fleet action
+FLEET_RADIO_TIMEOUT: Final = 120.0  # seconds per radio
+AT_SAVE_COMMAND: Final = "AT&W"
+# Telemetry metric -> (AT query, label of its line in the reply), see link_telemetry.py
+TELEMETRY_METRICS: Final = {
+    "rssi": ("AT+MWRSSI", "MWRSSI"),
+    "snr": ("AT+MWSTATUS", "SNR"),
+    "noise": ("AT+MWSTATUS", "Noise Floor"),
+    "remote_rssi": ("AT+MWSTATUS", "Remote RSSI"),
+    "remote_noise": ("AT+MWSTATUS", "Remote Noise Floor"),
+    "tx_rate": ("AT+MWSTATUS", "Tx Rate"),
+    "rx_rate": ("AT+MWSTATUS", "Rx Rate"),
+    "tx_power": ("AT+MWTXPOWER", "MWTXPOWER"),
+}
+TELEMETRY_DEFAULT: Final = "rssi"
+TX_POWER_CONTROL_MIN_DBM: Final = 7
+TX_POWER_CONTROL_MAX_DBM: Final = 30
+TX_POWER_TARGET_RSSI: Final = -70  # received level the controller aims for
+TX_POWER_HYSTERESIS_DB: Final = 5  # no change while within this of the target
+TX_POWER_STEP_DB: Final = 3  # largest change at once
+TX_POWER_MIN_INTERVAL: Final = 10.0  # seconds between changes
+TX_POWER_LOSS_SAMPLES: Final = 3  # samples without a level before going to full power
+SURVEY_TELEMETRY: Final = "rssi,noise,snr"  # read at each surveyed frequency
+SURVEY_DWELL: Final = 2.0  # seconds to settle after tuning to a frequency
+SURVEY_SAMPLES: Final = 5  # samples per frequency
+SURVEY_SAMPLE_INTERVAL: Final = 0.5
+DAEMON_SOCKET_PATH: Final = f"{MICROHARD_RUN_DIR}/microhard.sock"
+DAEMON_REQUEST_TIMEOUT: Final = 300
+
+# Same timings as buzzer_service.py, which is shared with other packages
+BUZZER_PIN: Final = 6
+BUZZER_QUICK_BEEP_DURATION: Final = 0.08
+BUZZER_NOTE_DURATION: Final = 0.145  # quick beep + spacing, a sixteenth note
+BUZZER_QUEUE_SIZE: Final = 8
+BUZZER_NULL_EVENTS: Final = 64  # state changes kept by a buzzer-less backend
+BUZZER_BACKEND_ENV: Final = "MICROHARD_BUZZER_BACKEND"
+TRACE_ENV: Final = "MICROHARD_TRACE"
+TRACE_FILE_NAME: Final = "/tmp/microhard_trace.jsonl"
+TRACE_MAX_BYTES: Final = 1024 * 1024  # rotated to TRACE_FILE_NAME.1 past this size
+TRACE_METRICS_FILE_NAME: Final = "/tmp/microhard_metrics.prom"
+TRACE_FLUSH_SAMPLES: Final = 60  # the RSSI loop flushes the metrics every N samples
+# Upper bounds (seconds) of the phase duration histogram buckets
+TRACE_BUCKETS: Final = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
 
 
 class ActionTypes(Enum):
@@ -30,7 +127,42 @@ class ActionTypes(Enum):
     UPDATE_ENCRYPTION_KEY = "update_encryption_key"
     IS_FACTORY = "is_factory"
     RSSI = "rssi"
+    DAEMON = "daemon"
+    RSSI_STATS = "rssi_stats"
+    DISCOVER = "discover"
+    FLEET = "fleet"
+    SURVEY = "survey"
+
+
+# Actions which are forwarded to the resident daemon when it is running
+DAEMON_ACTIONS: Final = [
+    ActionTypes.PAIR.value,
+    ActionTypes.INFO.value,
+    ActionTypes.UPDATE.value,
+    ActionTypes.UPDATE_ENCRYPTION_KEY.value,
+    ActionTypes.IS_FACTORY.value,
+]
+
+
+class RssiOutputTypes(Enum):
+    """
+    Where the RSSI service sends its samples.
+    """
+
+    SOCKET = "socket"  # "RSSI <value> <monark_id>" text lines to mavproxy
+    MAVLINK = "mavlink"  # RADIO_STATUS frames over UDP
+    BOTH = "both"
+
+
+class RssiSocketModes(Enum):
+    """
+    How the socket output delivers samples to mavproxy.
+    """
+
+    STREAM = "stream"  # newline terminated samples on one persistent connection
+    LEGACY = "legacy"  # one unterminated sample per connection, for older consumers
 
 
 class SocketCommandType(Enum):
     RSSI = "RSSI"
+    LINK = "LINK"
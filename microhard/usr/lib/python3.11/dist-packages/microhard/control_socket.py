@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+from typing import Any, Callable, Dict, Optional, Tuple
+import json
+import os
+import socket
+import socketserver
+import struct
+from constants import CONTROL_SOCKET_MODE
+
+"""
+Newline delimited JSON request/response over a local Unix socket.
+
+Only the standard library is used here so that thin clients (e.g. the microhard CLI)
+can talk to a resident service without importing paramiko.
+
+Requests can re-key or re-pair the radio, so the socket is only open to its owner and
+group (mode CONTROL_SOCKET_MODE, in a directory other users cannot write to) and the
+server also checks each peer's credentials.
+"""
+
+
+def peer_credentials(connection: socket.socket) -> Tuple[int, int, int]:
+    """
+    (pid, uid, gid) of the process on the other end of a Unix socket.
+    """
+    credentials = connection.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    pid, uid, gid = struct.unpack("3i", credentials)
+    return pid, uid, gid
+
+
+class _ControlRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.handler(json.loads(line))  # type: ignore[attr-defined]
+            except Exception as e:
+                response = {"is_success": False, "message": str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode())
+            self.wfile.flush()
+
+
+class ControlServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(
+        self, socket_path: str, handler: Callable[[Dict[str, Any]], Dict[str, Any]]
+    ) -> None:
+        directory = os.path.dirname(socket_path)
+        if directory:
+            os.makedirs(directory, mode=0o750, exist_ok=True)
+        # A stale socket file from a previous run would make bind() fail
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.socket_path = socket_path
+        self.handler = handler
+        super().__init__(socket_path, _ControlRequestHandler)
+        os.chmod(socket_path, CONTROL_SOCKET_MODE)
+
+    def verify_request(self, request: Any, client_address: Any) -> bool:
+        """
+        Accepts root, the server's own user and members of its group.
+        """
+        try:
+            _, uid, gid = peer_credentials(request)
+        except OSError as e:
+            print(f"Unable to read the control client's credentials: {e}")
+            return False
+        if uid in [0, os.geteuid()] or gid == os.getegid():
+            return True
+        print(f"Refused a control request from uid {uid}")
+        return False
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class ControlClient:
+    def __init__(self, socket_path: str, timeout: float) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def is_listening(self) -> bool:
+        """
+        True if a server is running on the socket, without sending it a request.
+        """
+        client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client_socket.settimeout(self.timeout)
+            client_socket.connect(self.socket_path)
+            return True
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+        except OSError:
+            # e.g. not allowed to use the socket, but something is serving it
+            return True
+        finally:
+            client_socket.close()
+
+    def request(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Sends one request and waits for its response.
+        Returns None if nothing is listening on the socket so callers can fall back.
+        Once the request is sent a failure is returned as an error response instead,
+        since the server may still act on it.
+        """
+        if not os.path.exists(self.socket_path):
+            return None
+
+        client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client_socket.settimeout(self.timeout)
+            try:
+                client_socket.connect(self.socket_path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                return None
+            except OSError as e:
+                # e.g. not allowed to use the socket, which running locally won't fix
+                return {"is_success": False, "message": f"Unable to connect: {e}"}
+            try:
+                client_socket.sendall((json.dumps(request) + "\n").encode())
+                with client_socket.makefile("rb") as f:
+                    line = f.readline()
+                if not line:
+                    raise ConnectionError("Connection closed without a response")
+                return json.loads(line)
+            except Exception as e:
+                return {"is_success": False, "message": f"No response: {e}"}
+        finally:
+            client_socket.close()
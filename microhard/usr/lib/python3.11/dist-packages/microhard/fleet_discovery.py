@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import time
+from constants import (
+    DISCOVER_WORKERS,
+    MAX_MONARK_ID,
+    MICROHARD_DEFAULT_IP,
+    MICROHARD_IP_PREFIX,
+    MICROHARD_USER,
+    PROBE_MAX_PARALLEL,
+    SSH_PORT,
+    ActionTypes,
+)
+from probe_service import ReachabilityProbe
+from ssh_session import SshSession
+
+"""
+Discovery of every radio on the MONARK subnet.
+
+All paired radio IPs (MICROHARD_IP_PREFIX.1-MAX_MONARK_ID) and the factory default IP
+are probed in one concurrent sweep, which takes about one probe timeout. Each radio is
+reported as soon as it answers; with fetch_info its tx power and frequency are read
+first by a small pool of workers, and the SSH sessions are kept for the next sweep.
+"""
+
+
+def print_json(result: Dict[str, Any]) -> None:
+    print(json.dumps(result), flush=True)
+
+
+class FleetDiscovery:
+    def __init__(
+        self,
+        probe: Optional[ReachabilityProbe] = None,
+        workers: int = DISCOVER_WORKERS,
+        max_parallel: int = PROBE_MAX_PARALLEL,
+        port: int = SSH_PORT,
+        verbose: bool = False,
+    ) -> None:
+        self.probe = probe or ReachabilityProbe(port=port, verbose=verbose)
+        self.workers = workers
+        self.max_parallel = max_parallel
+        self.port = port
+        self.verbose = verbose
+        # Connection pool: one session per radio IP, reused between sweeps
+        self.sessions: Dict[str, SshSession] = {}
+        self._lock = threading.Lock()
+
+    def candidates(self) -> List[Tuple[str, int]]:
+        """
+        (ip, monark_id) of every address a radio can have, 0 for the factory default.
+        """
+        return [(MICROHARD_DEFAULT_IP, 0)] + [
+            (f"{MICROHARD_IP_PREFIX}.{monark_id}", monark_id)
+            for monark_id in range(1, MAX_MONARK_ID + 1)
+        ]
+
+    def discover(
+        self,
+        ek: str,
+        fetch_info: bool = False,
+        on_result: Callable[[Dict[str, Any]], None] = print_json,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns one result per radio found, also passing each to on_result as it arrives.
+        ek is the password of the paired radios; the factory default radio uses the
+        default one.
+        """
+        monark_ids = dict(self.candidates())
+        found: List[Dict[str, Any]] = []
+        start = time.monotonic()
+
+        def _report(result: Dict[str, Any]) -> None:
+            with self._lock:
+                found.append(result)
+                on_result(result)
+
+        def _fetch_and_report(result: Dict[str, Any]) -> None:
+            _report(self._fetch_info(result, ek))
+
+        # Leaving the with block waits for the info of every radio found
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+
+            def _on_probe(ip: str, is_reachable: bool, seconds: float) -> None:
+                if not is_reachable:
+                    return
+                result = {
+                    "ip": ip,
+                    "monark_id": monark_ids[ip],
+                    "is_factory": ip == MICROHARD_DEFAULT_IP,
+                    "probe_ms": round(1000 * seconds, 1),
+                }
+                if fetch_info:
+                    # Reading the info overlaps with the rest of the sweep
+                    executor.submit(_fetch_and_report, result)
+                else:
+                    _report(result)
+
+            self.probe.probe(
+                list(monark_ids),
+                max_parallel=self.max_parallel,
+                on_result=_on_probe,
+            )
+
+        if self.verbose:
+            print(f"Found {len(found)} radio(s) in {time.monotonic() - start:.2f}s")
+        return found
+
+    def _fetch_info(self, result: Dict[str, Any], ek: str) -> Dict[str, Any]:
+        # Imported here so the probe only sweep does not need the service's dependencies
+        from microhard_service import MicrohardService
+
+        ip = result["ip"]
+        start = time.monotonic()
+        try:
+            service = MicrohardService(
+                action=ActionTypes.INFO.value,
+                monark_id=result["monark_id"],
+                verbose=self.verbose,
+                session=self._session(ip),
+                probe=self.probe,
+            )
+            info = service.get_info(
+                ek=MICROHARD_USER if result["is_factory"] else ek, ip_address=ip
+            )
+        except Exception as e:
+            info = {}
+            result["error"] = str(e)
+        result["info"] = info
+        result["info_ms"] = round(1000 * (time.monotonic() - start), 1)
+        return result
+
+    def _session(self, ip: str) -> SshSession:
+        with self._lock:
+            if ip not in self.sessions:
+                self.sessions[ip] = SshSession(port=self.port, verbose=self.verbose)
+            return self.sessions[ip]
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import time
+from constants import (
+    FLEET_CONCURRENCY,
+    FLEET_RADIO_TIMEOUT,
+    MICROHARD_DEFAULT_IP,
+    ActionTypes,
+)
+from fleet_discovery import print_json
+from microhard_service import MicrohardService
+from probe_service import ReachabilityProbe
+from radio_state import MemoryRadioState
+
+"""
+Pairing or updating many radios at once from a manifest.
+
+The manifest is a JSON list (or JSON lines) of radios:
+
+    {"monark_id": 7, "network_id": "MONARK", "tx_power": 20, "frequency": 2310}
+    {"monark_id": 8, "action": "update", "tx_power": 24}
+
+"action" is pair (the default) or update. Each radio gets its own SSH session and runs
+on a worker thread (paramiko is synchronous), scheduled by asyncio with at most
+`concurrency` radios in flight and a timeout per radio, so the whole run takes about as
+long as the slowest radio. Each result is printed as a JSON line as soon as that radio
+is done. The radios don't beep on their own; the run ends with one success or failure
+pattern for the whole fleet.
+
+Radios still at the factory default IP all share that address, so those are provisioned
+one at a time; radios at their paired IPs run in parallel. Each radio's address, and so
+its admin password, comes from probing that radio's own paired IP first.
+"""
+
+FLEET_ACTIONS = [ActionTypes.PAIR.value, ActionTypes.UPDATE.value]
+
+
+class FleetTask:
+    def __init__(
+        self,
+        monark_id: int,
+        action: str = ActionTypes.PAIR.value,
+        network_id: str = "",
+        tx_power: int = 0,
+        frequency: int = 0,
+    ) -> None:
+        self.monark_id = int(monark_id)
+        self.action = action
+        self.network_id = str(network_id)
+        self.tx_power = int(tx_power)
+        self.frequency = int(frequency)
+        self.validate()
+
+    def validate(self) -> None:
+        if not 1 <= self.monark_id <= 255:
+            raise ValueError(f"Monark ID must be between 1 and 255: {self.monark_id}")
+        if self.action not in FLEET_ACTIONS:
+            raise ValueError(f"{self.action} not in {FLEET_ACTIONS}")
+        if self.action == ActionTypes.PAIR.value and not (
+            self.network_id and self.tx_power and self.frequency
+        ):
+            raise ValueError(
+                f"MONARK {self.monark_id}: pair needs network_id, tx_power and frequency"
+            )
+        if self.action == ActionTypes.UPDATE.value and not (
+            self.network_id or self.tx_power or self.frequency
+        ):
+            raise ValueError(f"MONARK {self.monark_id}: nothing to update")
+
+
+def load_manifest(path: str) -> List[FleetTask]:
+    with open(path, "r") as f:
+        text = f.read()
+    try:
+        entries = json.loads(text)
+    except ValueError:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if not isinstance(entries, list):
+        entries = [entries]
+
+    tasks = [FleetTask(**entry) for entry in entries]
+    monark_ids = [task.monark_id for task in tasks]
+    if len(set(monark_ids)) != len(monark_ids):
+        raise ValueError("Each MONARK ID may only appear once in the manifest")
+    return tasks
+
+
+class FleetProvisioner:
+    def __init__(
+        self,
+        ek: str,
+        concurrency: int = FLEET_CONCURRENCY,
+        timeout: float = FLEET_RADIO_TIMEOUT,
+        probe: Optional[ReachabilityProbe] = None,
+        verbose: bool = False,
+    ) -> None:
+        """
+        ek is the password of the paired radios; factory default radios use the default one.
+        """
+        self.ek = ek
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.probe = probe or ReachabilityProbe(verbose=verbose)
+        self.verbose = verbose
+
+    def run(
+        self,
+        tasks: List[FleetTask],
+        on_result: Callable[[Dict[str, Any]], None] = print_json,
+    ) -> List[Dict[str, Any]]:
+        """
+        Provisions every radio of tasks and returns their results in manifest order,
+        also passing each to on_result as soon as it is done.
+        """
+        return asyncio.run(self.provision(tasks, on_result=on_result))
+
+    async def provision(
+        self,
+        tasks: List[FleetTask],
+        on_result: Callable[[Dict[str, Any]], None] = print_json,
+    ) -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # One radio per IP at a time (every factory default radio is at the same IP)
+        ip_locks: Dict[str, asyncio.Lock] = {}
+        start = time.monotonic()
+
+        # Not the default executor, which is smaller than a large concurrency limit
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+
+            async def _provision_one(task: FleetTask) -> Dict[str, Any]:
+                async with semaphore:
+                    result = await self._provision(task, executor, ip_locks)
+                on_result(result)
+                return result
+
+            results = await asyncio.gather(*[_provision_one(task) for task in tasks])
+
+        succeeded = sum(result["is_success"] for result in results)
+        # One pattern for the run, one per radio would overflow the player's queue
+        import buzzer_player
+
+        buzzer_player.get_player(verbose=self.verbose).play(
+            buzzer_player.SUCCESS
+            if succeeded == len(results)
+            else buzzer_player.THREE_LONG_FAILURE
+        )
+        if self.verbose:
+            print(
+                f"Provisioned {succeeded}/{len(results)} radio(s) "
+                f"in {time.monotonic() - start:.1f}s"
+            )
+        return list(results)
+
+    async def _provision(
+        self,
+        task: FleetTask,
+        executor: ThreadPoolExecutor,
+        ip_locks: Dict[str, asyncio.Lock],
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        service = self._service(task)
+        result: Dict[str, Any] = {
+            "monark_id": task.monark_id,
+            "action": task.action,
+            "is_success": False,
+        }
+        start = time.monotonic()
+        try:
+            ip = await loop.run_in_executor(executor, self._resolve, service, task)
+            if ip is None:
+                result["message"] = "No active microhard radio found"
+                return result
+            result["ip"] = ip
+
+            async with ip_locks.setdefault(ip, asyncio.Lock()):
+                future = loop.run_in_executor(executor, self._apply, service, task, ip)
+                try:
+                    is_success, responses = await asyncio.wait_for(
+                        asyncio.shield(future),
+                        timeout=max(0.0, self.timeout - (time.monotonic() - start)),
+                    )
+                except asyncio.TimeoutError:
+                    # The worker is still on the radio: cut its session and keep the
+                    # IP locked until it has given up
+                    service.session.cancel()
+                    await asyncio.gather(future, return_exceptions=True)
+                    raise
+            result["is_success"] = is_success
+            result["message"] = "Done" if is_success else responses
+        except asyncio.TimeoutError:
+            result["message"] = f"Timed out after {self.timeout:g}s"
+        except Exception as e:
+            result["message"] = str(e)
+        finally:
+            # Also unblocks a worker still waiting on the radio after a timeout
+            service.close()
+            result["seconds"] = round(time.monotonic() - start, 3)
+        return result
+
+    def _service(self, task: FleetTask) -> MicrohardService:
+        service = MicrohardService(
+            action=task.action,
+            monark_id=task.monark_id,
+            verbose=self.verbose,
+            probe=self.probe,
+        )
+        # Not the snapshot of this MONARK's own radio, and nothing reads it back
+        service.state = MemoryRadioState(verbose=self.verbose)
+        return service
+
+    def _resolve(self, service: MicrohardService, task: FleetTask) -> Optional[str]:
+        """
+        Runs on a worker thread. The radio's own paired IP comes first; the default IP is
+        answered by any factory default radio on the bench, so it is only used to pair.
+        """
+        if self.probe.is_reachable(service.paired_microhard_ip):
+            return service.paired_microhard_ip
+        if task.action == ActionTypes.PAIR.value and self.probe.is_reachable(
+            MICROHARD_DEFAULT_IP
+        ):
+            return MICROHARD_DEFAULT_IP
+        return None
+
+    def _apply(self, service: MicrohardService, task: FleetTask, ip: str) -> Any:
+        """
+        Runs on a worker thread.
+        """
+        # Pinned, so the radio is not probed again and its password follows from ip
+        service.__dict__["active_microhard_ip"] = ip
+        if task.action == ActionTypes.PAIR.value:
+            return service.pair_monark(
+                network_id=task.network_id,
+                ek=self.ek,
+                tx_power=task.tx_power,
+                frequency=task.frequency,
+                manage_rssi_service=False,
+                beep=False,
+            )
+        return service.apply_config(
+            ip_address=ip,
+            ek=service.admin_ek(self.ek, ip_address=ip),
+            at_commands=service.update_commands(
+                network_id=task.network_id,
+                tx_power=task.tx_power,
+                frequency=task.frequency,
+            ),
+            beep=False,
+        )
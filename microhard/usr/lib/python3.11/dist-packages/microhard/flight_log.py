@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import argparse
+import bisect
+import csv
+import glob
+import json
+import math
+import mmap
+import os
+import statistics
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime
+from constants import (
+    FLIGHT_LOG_DIR,
+    FLIGHT_LOG_GAP,
+    FLIGHT_LOG_MAX_AGE,
+    FLIGHT_LOG_MAX_BYTES,
+    FLIGHT_LOG_MAX_FILES,
+    FLIGHT_LOG_SYNC_INTERVAL,
+)
+from link_monitor import LinkState
+from link_telemetry import SAMPLE_FIELDS, TelemetrySample
+
+"""
+Append-only binary log of every telemetry sample, for after-flight analysis.
+
+Each sample is one fixed-size record (see RECORD) appended to the current file in
+FLIGHT_LOG_DIR with a single write. A new file is started when the current one gets
+older than FLIGHT_LOG_MAX_AGE or larger than FLIGHT_LOG_MAX_BYTES, and the oldest files
+are removed past FLIGHT_LOG_MAX_FILES. Files are synced every FLIGHT_LOG_SYNC_INTERVAL
+seconds; after a crash or power loss a torn last record is ignored and each record's
+CRC32 rejects anything written only partly.
+
+The logs are read by mapping them, without parsing text. Samples further apart than
+FLIGHT_LOG_GAP seconds start a new flight:
+
+    python3 flight_log.py summary
+    python3 flight_log.py extract --start 2026-06-01T14:00 --end 2026-06-01T14:30 --format csv
+"""
+
+MAGIC = b"MHFL"
+VERSION = 1
+# magic, version, record size, created, monark id
+HEADER = struct.Struct("<4sHHdB15x")
+# timestamp, sample sequence, monark id, link state, then the metrics of SAMPLE_FIELDS
+# as float32 (NaN when missing); the CRC32 of these bytes follows
+RECORD = struct.Struct("<dIBBxx7f")
+CRC = struct.Struct("<I")
+RECORD_SIZE = RECORD.size + CRC.size
+LINK_STATES = list(LinkState)
+FILE_PATTERN = "flight_*.bin"
+
+
+def _float(value: Optional[float]) -> float:
+    return math.nan if value is None else value
+
+
+def _optional(value: float) -> Optional[float]:
+    # float32 keeps about 7 digits, more would only show rounding noise
+    return None if math.isnan(value) else round(value, 2)
+
+
+class FlightLogWriter:
+    def __init__(
+        self,
+        directory: str = FLIGHT_LOG_DIR,
+        max_bytes: int = FLIGHT_LOG_MAX_BYTES,
+        max_age: float = FLIGHT_LOG_MAX_AGE,
+        max_files: int = FLIGHT_LOG_MAX_FILES,
+        sync_interval: float = FLIGHT_LOG_SYNC_INTERVAL,
+        verbose: bool = False,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_files = max_files
+        self.sync_interval = sync_interval
+        self.verbose = verbose
+        self.path = ""
+        self._fd: Optional[int] = None
+        self._size = 0
+        self._opened = 0.0
+        self._synced = 0.0
+        self._last_timestamp = 0.0
+        self._record = bytearray(RECORD_SIZE)
+        os.makedirs(directory, exist_ok=True)
+
+    def append(
+        self,
+        sample: TelemetrySample,
+        sequence: int,
+        link_state: LinkState = LinkState.CONNECTED,
+    ) -> None:
+        now = time.monotonic()
+        if (
+            self._fd is None
+            or self._size + RECORD_SIZE > self.max_bytes
+            or now - self._opened > self.max_age
+            # Records stay in time order within a file (e.g. across an NTP step)
+            or sample.timestamp < self._last_timestamp
+        ):
+            self._rotate(sample.monark_id)
+        assert self._fd is not None
+
+        RECORD.pack_into(
+            self._record,
+            0,
+            sample.timestamp,
+            sequence & 0xFFFFFFFF,
+            sample.monark_id,
+            LINK_STATES.index(link_state),
+            *[_float(getattr(sample, field)) for field in SAMPLE_FIELDS],
+        )
+        CRC.pack_into(
+            self._record, RECORD.size, zlib.crc32(self._record[: RECORD.size])
+        )
+        # One write per record, the file is opened with O_APPEND
+        os.write(self._fd, self._record)
+        self._size += RECORD_SIZE
+        self._last_timestamp = sample.timestamp
+
+        if now - self._synced >= self.sync_interval:
+            os.fdatasync(self._fd)
+            self._synced = now
+
+    def _rotate(self, monark_id: int) -> None:
+        self.close()
+        created = time.time()
+        name = time.strftime("flight_%Y%m%d_%H%M%S", time.localtime(created))
+        for suffix in range(100):
+            path = os.path.join(
+                self.directory, f"{name}{f'_{suffix}' if suffix else ''}.bin"
+            )
+            try:
+                fd = os.open(
+                    path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644
+                )
+                break
+            except FileExistsError:
+                continue
+        else:
+            raise FileExistsError(f"Unable to create a flight log named {name}")
+
+        os.write(fd, HEADER.pack(MAGIC, VERSION, RECORD_SIZE, created, monark_id))
+        os.fsync(fd)
+        # Make the new file's directory entry durable too
+        directory_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+
+        self._fd = fd
+        self.path = path
+        self._size = HEADER.size
+        self._last_timestamp = 0.0
+        self._opened = self._synced = time.monotonic()
+        if self.verbose:
+            print(f"Flight log: {path}")
+        self._remove_old_files()
+
+    def _remove_old_files(self) -> None:
+        paths = sorted(glob.glob(os.path.join(self.directory, FILE_PATTERN)))
+        for path in paths[: max(0, len(paths) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Unable to remove {path}: {e}")
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.fdatasync(self._fd)
+            os.close(self._fd)
+            self._fd = None
+
+
+class FlightRecord:
+    __slots__ = ["timestamp", "sequence", "monark_id", "link_state"] + SAMPLE_FIELDS
+    timestamp: float
+    sequence: int
+    monark_id: int
+    link_state: str
+    # One per SAMPLE_FIELDS, None when the sample had no value
+    rssi: Optional[float]
+    snr: Optional[float]
+    noise: Optional[float]
+    remote_rssi: Optional[float]
+    remote_noise: Optional[float]
+    tx_rate: Optional[float]
+    rx_rate: Optional[float]
+
+    def __init__(self, values: Tuple[Any, ...]) -> None:
+        self.timestamp, self.sequence, self.monark_id, state = values[:4]
+        self.link_state = LINK_STATES[state].value if state < len(LINK_STATES) else ""
+        for field, value in zip(SAMPLE_FIELDS, values[4:]):
+            setattr(self, field, _optional(value))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class _Timestamps:
+    """
+    The record timestamps of a mapped file, read on demand (for bisect).
+    """
+
+    def __init__(self, data: mmap.mmap, count: int) -> None:
+        self.data = data
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: Any) -> float:
+        return struct.unpack_from("<d", self.data, HEADER.size + index * RECORD_SIZE)[0]
+
+
+class FlightLogReader:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"{path} is not a flight log")
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, self.created, self.monark_id = HEADER.unpack_from(
+            self.data, 0
+        )
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} flight log")
+        # A torn last record (crash while writing) is left out
+        self.count = (size - HEADER.size) // RECORD_SIZE
+        self.corrupt = 0
+
+    def records(
+        self, start: float = 0, end: float = math.inf
+    ) -> Iterator[FlightRecord]:
+        """
+        The records with start <= timestamp < end, skipping those failing their CRC.
+        """
+        timestamps = _Timestamps(self.data, self.count)
+        first = bisect.bisect_left(timestamps, start) if start else 0
+        last = bisect.bisect_left(timestamps, end) if end != math.inf else self.count
+        view = memoryview(self.data)
+        try:
+            for i in range(first, last):
+                offset = HEADER.size + i * RECORD_SIZE
+                body = view[offset : offset + RECORD.size]
+                if zlib.crc32(body) != CRC.unpack_from(view, offset + RECORD.size)[0]:
+                    self.corrupt += 1
+                    continue
+                yield FlightRecord(RECORD.unpack(body))
+        finally:
+            view.release()
+
+    def close(self) -> None:
+        self.data.close()
+
+
+def log_files(paths: List[str], directory: str = FLIGHT_LOG_DIR) -> List[str]:
+    """
+    The given files (or directories), by default every log in directory, oldest first.
+    """
+    files: List[str] = []
+    for path in paths or [directory]:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, FILE_PATTERN)))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def read_records(
+    files: List[str], start: float = 0, end: float = math.inf
+) -> Iterator[FlightRecord]:
+    for path in files:
+        try:
+            reader = FlightLogReader(path)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {path}: {e}", file=sys.stderr)
+            continue
+        try:
+            yield from reader.records(start=start, end=end)
+            if reader.corrupt:
+                print(f"{path}: {reader.corrupt} corrupt record(s)", file=sys.stderr)
+        finally:
+            reader.close()
+
+
+def summarize(records: List[FlightRecord]) -> Dict[str, Any]:
+    rssi = [r.rssi for r in records if r.rssi is not None]
+    # Longest run of samples without RSSI, in seconds
+    longest_outage = 0.0
+    outage_start: Optional[float] = None
+    for record in records:
+        if record.rssi is None:
+            if outage_start is None:
+                outage_start = record.timestamp
+            longest_outage = max(longest_outage, record.timestamp - outage_start)
+        else:
+            if outage_start is not None:
+                longest_outage = max(longest_outage, record.timestamp - outage_start)
+            outage_start = None
+
+    summary: Dict[str, Any] = {
+        "start": datetime.fromtimestamp(records[0].timestamp).isoformat(),
+        "end": datetime.fromtimestamp(records[-1].timestamp).isoformat(),
+        "duration": round(records[-1].timestamp - records[0].timestamp, 1),
+        "monark_id": records[-1].monark_id,
+        "samples": len(records),
+        "link_loss_rate": round(1 - len(rssi) / len(records), 4),
+        "longest_outage": round(longest_outage, 1),
+        "rssi_min": min(rssi) if rssi else None,
+        "rssi_mean": round(statistics.fmean(rssi), 1) if rssi else None,
+        "rssi_max": max(rssi) if rssi else None,
+        "rssi_p10": (statistics.quantiles(rssi, n=10)[0] if len(rssi) > 1 else None),
+    }
+    for field in ["snr", "noise", "remote_rssi"]:
+        values = [getattr(r, field) for r in records if getattr(r, field) is not None]
+        summary[f"{field}_mean"] = (
+            round(statistics.fmean(values), 1) if values else None
+        )
+    return summary
+
+
+def flights(
+    records: Iterator[FlightRecord], gap: float = FLIGHT_LOG_GAP
+) -> Iterator[List[FlightRecord]]:
+    """
+    Splits the records into flights wherever samples are more than gap seconds apart.
+    """
+    flight: List[FlightRecord] = []
+    for record in records:
+        if flight and record.timestamp - flight[-1].timestamp > gap:
+            yield flight
+            flight = []
+        flight.append(record)
+    if flight:
+        yield flight
+
+
+def parse_time(value: str) -> float:
+    """
+    Unix seconds or an ISO 8601 local time such as 2026-06-01T14:00.
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarize or extract the RSSI service's binary flight logs."
+    )
+    parser.add_argument("command", choices=["summary", "extract"])
+    parser.add_argument(
+        "paths", nargs="*", help=f"Log files or directories (default {FLIGHT_LOG_DIR})."
+    )
+    parser.add_argument("--start", type=str, default="", help="Unix time or ISO 8601.")
+    parser.add_argument("--end", type=str, default="", help="Unix time or ISO 8601.")
+    parser.add_argument(
+        "--gap",
+        type=float,
+        default=FLIGHT_LOG_GAP,
+        help="Seconds without samples that separate two flights (summary).",
+    )
+    parser.add_argument(
+        "--format", choices=["jsonl", "csv"], default="jsonl", help="extract output."
+    )
+    args = parser.parse_args()
+
+    records = read_records(
+        log_files(args.paths),
+        start=parse_time(args.start) if args.start else 0,
+        end=parse_time(args.end) if args.end else math.inf,
+    )
+    if args.command == "summary":
+        for flight in flights(records, gap=args.gap):
+            print(json.dumps(summarize(flight)))
+    elif args.format == "csv":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(FlightRecord.__slots__)
+        for record in records:
+            writer.writerow(record.to_dict().values())
+    else:
+        for record in records:
+            print(json.dumps(record.to_dict()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+from typing import Any, Callable, Dict, Optional
+import time
+from enum import Enum
+from constants import (
+    LINK_FAILURES_BEFORE_RECONNECT,
+    LINK_RECONNECT_MAX_DELAY,
+    LINK_RECONNECT_MIN_DELAY,
+)
+from tracer import get_tracer
+
+"""
+Connection state of the RSSI loop's radio.
+
+    PROBING       no IP yet, looking for the radio at its default and paired IPs
+    CONNECTED     the last poll succeeded
+    DEGRADED      one or more polls failed, still polling the same IP
+    RECONNECTING  too many failures (or a configuration change), the IP is dropped and
+                  resolved again with bounded exponential backoff
+
+The radio may come back at another IP than it left (e.g. rebooted to the factory default
+or just paired), so every reconnect probes all candidate IPs again instead of reusing
+the old one. The outage length (first failure until the next successful poll) is
+recorded as the "link_recover" phase of the tracer.
+"""
+
+
+class LinkState(Enum):
+    PROBING = "probing"
+    CONNECTED = "connected"
+    DEGRADED = "degraded"
+    RECONNECTING = "reconnecting"
+
+
+class LinkMonitor:
+    def __init__(
+        self,
+        resolve: Callable[[], Optional[str]],
+        failures_before_reconnect: int = LINK_FAILURES_BEFORE_RECONNECT,
+        min_delay: float = LINK_RECONNECT_MIN_DELAY,
+        max_delay: float = LINK_RECONNECT_MAX_DELAY,
+        verbose: bool = False,
+    ) -> None:
+        """
+        resolve probes the candidate IPs afresh and returns the one that answers, or None.
+        """
+        self.resolve_ip = resolve
+        self.failures_before_reconnect = failures_before_reconnect
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.verbose = verbose
+        self.state = LinkState.PROBING
+        self.active_ip: Optional[str] = None
+        self.failures = 0  # consecutive failed polls
+        self.reconnects = 0
+        self.last_recover_seconds: Optional[float] = None
+        self._delay = min_delay
+        self._next_attempt = 0.0  # monotonic time of the next resolve attempt
+        self._outage_start: Optional[float] = None
+
+    def resolve(self) -> Optional[str]:
+        """
+        The IP to poll, or None while the radio has not been found again. Without an IP
+        this probes for one, unless the backoff delay since the last attempt is running.
+        """
+        if self.active_ip is not None:
+            return self.active_ip
+
+        now = time.monotonic()
+        if now < self._next_attempt:
+            return None
+
+        self.active_ip = self.resolve_ip()
+        if self.active_ip is None:
+            self._next_attempt = now + self._delay
+            self._delay = min(2 * self._delay, self.max_delay)
+            if self.verbose:
+                print(
+                    f"Radio not found, next attempt in {self._next_attempt - now:.1f}s"
+                )
+        elif self.verbose:
+            print(f"Radio found at {self.active_ip}")
+        return self.active_ip
+
+    def wait_for_radio(self, deadline: float) -> bool:
+        """
+        While there is no IP, keeps resolving (with backoff) until deadline, so the radio
+        is picked up as soon as it answers instead of at the next poll.
+        Returns True if an IP was found before the deadline.
+        """
+        while self.active_ip is None:
+            now = time.monotonic()
+            if now >= deadline:
+                return False
+            if now < self._next_attempt:
+                time.sleep(min(self._next_attempt, deadline) - now)
+                continue
+            if self.resolve() is not None:
+                return True
+        return False
+
+    def report(self, is_success: bool) -> None:
+        """
+        Feeds the outcome of one poll to the state machine.
+        """
+        now = time.monotonic()
+        if is_success:
+            if self._outage_start is not None:
+                self.last_recover_seconds = now - self._outage_start
+                get_tracer().record(
+                    "link_recover",
+                    self.last_recover_seconds,
+                    ip=self.active_ip,
+                    reconnects=self.reconnects,
+                )
+                if self.verbose:
+                    print(f"Link recovered in {self.last_recover_seconds:.1f}s")
+            self._outage_start = None
+            self.failures = 0
+            self._delay = self.min_delay
+            self._set_state(LinkState.CONNECTED)
+            return
+
+        self.failures += 1
+        if self.state == LinkState.CONNECTED:
+            self._outage_start = now
+        if self.active_ip is None:
+            return  # still probing or reconnecting
+        if self.failures >= self.failures_before_reconnect:
+            # Backed off, a radio still booting answers the probe before its SSH server
+            self.reconnect(immediate=False)
+        else:
+            self._set_state(LinkState.DEGRADED)
+
+    def reconnect(self, immediate: bool = True) -> None:
+        """
+        Drops the IP so it is resolved again, right away or after the backoff delay.
+        """
+        now = time.monotonic()
+        if self.state != LinkState.PROBING and self._outage_start is None:
+            self._outage_start = now
+        self.active_ip = None
+        if immediate:
+            self._next_attempt = 0.0
+        else:
+            self._next_attempt = now + self._delay
+            self._delay = min(2 * self._delay, self.max_delay)
+        self.reconnects += 1
+        if self.state != LinkState.PROBING:
+            self._set_state(LinkState.RECONNECTING)
+
+    def _set_state(self, state: LinkState) -> None:
+        if state != self.state and self.verbose:
+            print(f"Link {self.state.value} -> {state.value}")
+        self.state = state
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "active_ip": self.active_ip,
+            "failures": self.failures,
+            "reconnects": self.reconnects,
+            "last_recover_seconds": self.last_recover_seconds,
+        }
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+from typing import Optional
+import ipaddress
+import mmap
+import os
+import struct
+import tempfile
+import time
+from constants import LINK_STATUS_FILE_NAME, RSSI_DELAY
+
+"""
+The latest radio link status in a small memory-mapped file.
+
+The RSSI service writes every sample to LINK_STATUS_FILE_NAME (on /dev/shm, so it never
+touches the SD card) and any number of local processes can read it with `read_link_status`
+or a `LinkStatusReader`, without sockets or text parsing:
+
+    from link_status import LinkStatusReader
+    status = LinkStatusReader().read()
+    if status is not None and not status.is_stale:
+        print(status.rssi)
+
+The file has a fixed layout (see LAYOUT). Consistency uses a seqlock: the writer makes
+the counter odd, writes the fields and makes it even again, and a reader retries until
+it reads the same even counter before and after the fields.
+
+The writer also publishes how old a sample may get before it is stale, from the RSSI
+period it samples at, so readers need not know the period (which may change while it
+runs).
+"""
+
+MAGIC = b"MHLS"
+VERSION = 2
+# magic, version, counter, sample sequence, timestamp, rssi, has rssi, monark id, ipv4,
+# stale after (seconds)
+LAYOUT = struct.Struct("<4sHxxQQdhBxH4s6xd")
+COUNTER = struct.Struct("<Q")
+COUNTER_OFFSET = 8
+FIELDS_OFFSET = COUNTER_OFFSET + COUNTER.size
+READ_RETRIES = 100
+STALE_PERIODS = 2  # a sample is stale once this many RSSI periods have passed
+
+
+class LinkStatus:
+    def __init__(
+        self,
+        sequence: int,
+        timestamp: float,
+        rssi: Optional[int],
+        monark_id: int,
+        active_ip: str,
+        stale_after: float = STALE_PERIODS * RSSI_DELAY,
+    ) -> None:
+        self.sequence = sequence  # number of samples taken by the RSSI service
+        self.timestamp = timestamp  # wall clock time of the sample
+        self.rssi = rssi  # dBm, None if the sample failed
+        self.monark_id = monark_id
+        self.active_ip = active_ip
+        self.stale_after = stale_after  # seconds, see STALE_PERIODS
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.timestamp
+
+    @property
+    def is_stale(self) -> bool:
+        """
+        True once the next sample is overdue, e.g. when the RSSI service stopped.
+        """
+        return self.age > self.stale_after
+
+    def to_dict(self) -> dict:
+        return {
+            "sequence": self.sequence,
+            "timestamp": self.timestamp,
+            "rssi": self.rssi,
+            "monark_id": self.monark_id,
+            "active_ip": self.active_ip,
+            "stale_after": self.stale_after,
+        }
+
+    def __repr__(self) -> str:
+        return f"LinkStatus({self.to_dict()})"
+
+
+class LinkStatusWriter:
+    def __init__(self, path: str = LINK_STATUS_FILE_NAME) -> None:
+        self.path = path
+        self.counter = 0
+        # The file is prepared under a temporary name and renamed into place, so a
+        # reader never maps a file of the wrong size
+        directory = os.path.dirname(path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".link_status.")
+        try:
+            os.write(fd, LAYOUT.pack(MAGIC, VERSION, 0, 0, 0.0, 0, 0, 0, bytes(4), 0.0))
+            os.fchmod(fd, 0o644)
+            self.mmap = mmap.mmap(fd, LAYOUT.size)
+            self._retire(path)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        finally:
+            os.close(fd)
+
+    def _retire(self, path: str) -> None:
+        """
+        Clears the magic of a previous file, so readers still mapping it move on to
+        the new one instead of reading it until it looks stale.
+        """
+        try:
+            with open(path, "r+b") as f:
+                f.write(bytes(len(MAGIC)))
+        except OSError:
+            pass
+
+    def publish(
+        self,
+        sequence: int,
+        rssi: Optional[float],
+        monark_id: int,
+        active_ip: str = "",
+        timestamp: Optional[float] = None,
+        period: float = RSSI_DELAY,
+    ) -> None:
+        """
+        period is the time until the next sample, which readers use to tell a stale
+        status apart.
+        """
+        packed_ip = ipaddress.IPv4Address(active_ip).packed if active_ip else bytes(4)
+        fields = LAYOUT.pack(
+            MAGIC,
+            VERSION,
+            0,
+            sequence,
+            timestamp if timestamp is not None else time.time(),
+            int(round(rssi)) if rssi is not None else 0,
+            rssi is not None,
+            monark_id,
+            packed_ip,
+            STALE_PERIODS * period,
+        )[FIELDS_OFFSET:]
+
+        # Odd while writing, even when the fields are consistent again
+        self.counter += 1
+        COUNTER.pack_into(self.mmap, COUNTER_OFFSET, self.counter)
+        self.mmap[FIELDS_OFFSET : LAYOUT.size] = fields
+        self.counter += 1
+        COUNTER.pack_into(self.mmap, COUNTER_OFFSET, self.counter)
+
+    def close(self) -> None:
+        self.mmap.close()
+
+
+class LinkStatusReader:
+    def __init__(self, path: str = LINK_STATUS_FILE_NAME) -> None:
+        self.path = path
+        self.mmap: Optional[mmap.mmap] = None
+        self.inode = 0
+
+    def read(self) -> Optional[LinkStatus]:
+        """
+        The latest status, or None if the RSSI service has not published one.
+        A read is plain memory access; the file is only checked again (in case the RSSI
+        service restarted and replaced it) when the status is stale.
+        """
+        if self.mmap is None and not self._map():
+            return None
+        status = self._read()
+        if (status is None or status.is_stale) and self._map():
+            status = self._read()
+        return status
+
+    def _read(self) -> Optional[LinkStatus]:
+        if self.mmap is None:
+            return None
+        for _ in range(READ_RETRIES):
+            before = COUNTER.unpack_from(self.mmap, COUNTER_OFFSET)[0]
+            if before & 1:
+                continue
+            fields = self.mmap[: LAYOUT.size]
+            after = COUNTER.unpack_from(self.mmap, COUNTER_OFFSET)[0]
+            if before != after:
+                continue
+            if before == 0:
+                return None  # created but nothing published yet
+            (
+                magic,
+                version,
+                _,
+                sequence,
+                timestamp,
+                rssi,
+                has_rssi,
+                monark_id,
+                ip,
+                stale_after,
+            ) = LAYOUT.unpack(fields)
+            if magic != MAGIC or version != VERSION:
+                return None
+            return LinkStatus(
+                sequence=sequence,
+                timestamp=timestamp,
+                rssi=rssi if has_rssi else None,
+                monark_id=monark_id,
+                active_ip=str(ipaddress.IPv4Address(ip)) if any(ip) else "",
+                stale_after=stale_after,
+            )
+        return None
+
+    def _map(self) -> bool:
+        """
+        Maps the file, again if the RSSI service restarted and replaced it.
+        """
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            self.close()
+            return False
+        if self.mmap is not None and inode == self.inode:
+            return True
+
+        self.close()
+        try:
+            with open(self.path, "rb") as f:
+                self.mmap = mmap.mmap(f.fileno(), LAYOUT.size, access=mmap.ACCESS_READ)
+            self.inode = inode
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def close(self) -> None:
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+
+
+def read_link_status(path: str = LINK_STATUS_FILE_NAME) -> Optional[LinkStatus]:
+    """
+    One-off read; keep a `LinkStatusReader` to read repeatedly.
+    """
+    reader = LinkStatusReader(path)
+    try:
+        return reader.read()
+    finally:
+        reader.close()
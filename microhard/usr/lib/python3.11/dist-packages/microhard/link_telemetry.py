@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import time
+from constants import TELEMETRY_DEFAULT, TELEMETRY_METRICS, SocketCommandType
+from at_parser import AtResponse, parse_number, parse_response
+
+"""
+Link telemetry beyond RSSI, gathered in one round trip per sample.
+
+Each metric is read from the reply to an AT status query, e.g. the SNR from the
+"SNR (dB) : 32" line of AT+MWSTATUS. The metrics of the RSSI service are chosen with
+--telemetry, either by name from TELEMETRY_METRICS or as name=COMMAND:Label for other
+lines of the radio's status output:
+
+    --telemetry=rssi,snr,noise,remote_rssi,temperature=AT+MSTEMP:Temperature
+
+Every distinct command is sent once per sample, pipelined on the open session, and the
+replies are parsed into one `TelemetrySample`.
+"""
+
+# Metrics with a field of their own in `TelemetrySample`, the rest go to extra
+SAMPLE_FIELDS = [
+    "rssi",
+    "snr",
+    "noise",
+    "remote_rssi",
+    "remote_noise",
+    "tx_rate",
+    "rx_rate",
+]
+
+
+def parse_metrics(spec: str) -> Dict[str, Tuple[str, str]]:
+    """
+    "rssi,snr,temp=AT+MSTEMP:Temperature" -> {name: (command, label)}
+    """
+    metrics: Dict[str, Tuple[str, str]] = {}
+    for item in [i.strip() for i in spec.split(",") if i.strip()]:
+        name, is_custom, query = item.partition("=")
+        if not is_custom:
+            if name not in TELEMETRY_METRICS:
+                raise ValueError(
+                    f"Unknown telemetry metric {name}, "
+                    f"expected one of {list(TELEMETRY_METRICS)} or name=COMMAND:Label"
+                )
+            metrics[name] = TELEMETRY_METRICS[name]
+            continue
+        command, _, label = query.partition(":")
+        if not command.startswith("AT+") or not label:
+            raise ValueError(
+                f"Invalid telemetry metric {item}, expected name=COMMAND:Label"
+            )
+        metrics[name] = (command, label)
+    return metrics
+
+
+class TelemetrySample:
+    def __init__(
+        self,
+        monark_id: int,
+        timestamp: Optional[float] = None,
+        rssi: Optional[float] = None,
+        snr: Optional[float] = None,
+        noise: Optional[float] = None,
+        remote_rssi: Optional[float] = None,
+        remote_noise: Optional[float] = None,
+        tx_rate: Optional[float] = None,
+        rx_rate: Optional[float] = None,
+        extra: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """
+        Levels are in dBm, SNR in dB and rates in the radio's unit. None means the metric
+        is not polled or the radio did not report it.
+        """
+        self.monark_id = monark_id
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.rssi = rssi
+        self.snr = snr
+        self.noise = noise
+        self.remote_rssi = remote_rssi
+        self.remote_noise = remote_noise
+        self.tx_rate = tx_rate
+        self.rx_rate = rx_rate
+        self.extra = extra or {}
+
+    @property
+    def rssi_dbm(self) -> Optional[int]:
+        return int(round(self.rssi)) if self.rssi is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        sample = {"timestamp": self.timestamp, "monark_id": self.monark_id}
+        for field in SAMPLE_FIELDS:
+            sample[field] = getattr(self, field)
+        sample.update(self.extra)
+        return sample
+
+    def rssi_line(self) -> str:
+        """
+        The "RSSI <dBm> <monark_id>" line mavproxy has always received.
+        """
+        value = self.rssi_dbm if self.rssi_dbm is not None else "FAILURE"
+        return f"{SocketCommandType.RSSI.value} {value} {self.monark_id}"
+
+    def link_line(self) -> str:
+        """
+        "LINK <json> <monark_id>" with every metric, the JSON has no spaces.
+        """
+        metrics = self.to_dict()
+        del metrics["monark_id"]
+        return (
+            f"{SocketCommandType.LINK.value} "
+            f"{json.dumps(metrics, separators=(',', ':'))} {self.monark_id}"
+        )
+
+    def __repr__(self) -> str:
+        return f"TelemetrySample({self.to_dict()})"
+
+
+class LinkTelemetry:
+    def __init__(self, spec: str = TELEMETRY_DEFAULT) -> None:
+        self.metrics = parse_metrics(spec)
+        if "rssi" not in self.metrics:
+            # RSSI drives the scheduler, history and the RSSI line, so it is always read
+            self.metrics = {"rssi": TELEMETRY_METRICS["rssi"], **self.metrics}
+        # Each command once, in the order the metrics were given
+        self.commands = list(
+            dict.fromkeys(command for command, _ in self.metrics.values())
+        )
+        self.metrics_per_command = {
+            command: sum(c == command for c, _ in self.metrics.values())
+            for command in self.commands
+        }
+
+    @property
+    def is_rssi_only(self) -> bool:
+        return len(self.metrics) == 1
+
+    def parse(
+        self, monark_id: int, responses: List[str], timestamp: Optional[float] = None
+    ) -> TelemetrySample:
+        """
+        Builds the sample from the replies to `commands` (missing replies, or ones not
+        answered with OK, leave their metrics unset).
+        """
+        parsed: Dict[str, AtResponse] = {}
+        for command, data in zip(self.commands, responses):
+            reply = parse_response(data, command=command)
+            if reply.is_ok:
+                parsed[command] = reply
+        sample = TelemetrySample(monark_id=monark_id, timestamp=timestamp)
+        for name, (command, label) in self.metrics.items():
+            response = parsed.get(command)
+            if response is None:
+                continue
+            text = response.labelled(label)
+            if text is None and self.metrics_per_command[command] == 1:
+                # Only one metric comes from this command, so a bare value is unambiguous
+                text = response.value(label)
+            value = parse_number(text)
+            if name in SAMPLE_FIELDS:
+                setattr(sample, name, value)
+            elif value is not None:
+                sample.extra[name] = value
+        return sample
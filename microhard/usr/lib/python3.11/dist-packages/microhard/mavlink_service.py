@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+from typing import List, Optional, Tuple
+import socket
+import struct
+from constants import (
+    MAVLINK_COMPONENT_ID,
+    MAVLINK_RADIO_STATUS_CRC_EXTRA,
+    MAVLINK_RADIO_STATUS_MSG_ID,
+    MAVLINK_SYSTEM_ID,
+    MAVLINK_UNKNOWN,
+)
+
+"""
+Minimal MAVLink RADIO_STATUS (#109) encoder and UDP emitter.
+
+This lets the RSSI service send RADIO_STATUS straight to GCS endpoints instead of going
+through the text protocol and a separate mavproxy re-encode. Frames are packed into one
+reusable buffer, so encoding a sample does not allocate beyond the returned view.
+"""
+
+# RADIO_STATUS payload in MAVLink wire order (largest fields first)
+# rxerrors, fixed, rssi, remrssi, txbuf, noise, remnoise
+RADIO_STATUS_PAYLOAD = struct.Struct("<HHBBBBB")
+MAVLINK_V1_STX = 0xFE
+MAVLINK_V2_STX = 0xFD
+MAVLINK_V1_HEADER = struct.Struct("<BBBBBB")  # stx, len, seq, sysid, compid, msgid
+MAVLINK_V2_HEADER = struct.Struct(
+    "<BBBBBBBH"
+)  # stx, len, incompat, compat, seq, sysid, compid, msgid (low 16 bits)
+MAVLINK_CRC = struct.Struct("<H")
+
+
+def dbm_to_radio_status(dbm: Optional[float]) -> int:
+    """
+    Converts dBm to the SiK RADIO_STATUS scale (dBm = value / 1.9 - 127) which GCSs
+    already know how to display. None maps to UINT8_MAX (unknown).
+    """
+    if dbm is None:
+        return MAVLINK_UNKNOWN
+    return max(0, min(254, int(round((dbm + 127.0) * 1.9))))
+
+
+def _crc_accumulate(byte: int, crc: int) -> int:
+    """
+    One step of CRC-16/MCRF4XX (X.25) as used by MAVLink.
+    """
+    tmp = byte ^ (crc & 0xFF)
+    tmp = (tmp ^ (tmp << 4)) & 0xFF
+    return ((crc >> 8) ^ (tmp << 8) ^ (tmp << 3) ^ (tmp >> 4)) & 0xFFFF
+
+
+class RadioStatusEncoder:
+    def __init__(
+        self,
+        version: int = 2,
+        system_id: int = MAVLINK_SYSTEM_ID,
+        component_id: int = MAVLINK_COMPONENT_ID,
+    ) -> None:
+        if version not in (1, 2):
+            raise ValueError(f"Unsupported MAVLink version {version}")
+        self.version = version
+        self.system_id = system_id
+        self.component_id = component_id
+        self.sequence = 0
+        header = MAVLINK_V1_HEADER if version == 1 else MAVLINK_V2_HEADER
+        # v2 msgid is 24 bits, the struct covers the low 16 and the third byte follows
+        self.header_size = header.size + (1 if version == 2 else 0)
+        self.buffer = bytearray(
+            self.header_size + RADIO_STATUS_PAYLOAD.size + MAVLINK_CRC.size
+        )
+
+    def encode(
+        self,
+        rssi: int,
+        remrssi: int = MAVLINK_UNKNOWN,
+        noise: int = MAVLINK_UNKNOWN,
+        remnoise: int = MAVLINK_UNKNOWN,
+        txbuf: int = 100,
+        rxerrors: int = 0,
+        fixed: int = 0,
+    ) -> memoryview:
+        """
+        Packs one RADIO_STATUS frame (values already in RADIO_STATUS units) and returns a
+        view of the internal buffer. The view is only valid until the next call.
+        """
+        buffer = self.buffer
+        RADIO_STATUS_PAYLOAD.pack_into(
+            buffer,
+            self.header_size,
+            rxerrors,
+            fixed,
+            rssi,
+            remrssi,
+            txbuf,
+            noise,
+            remnoise,
+        )
+        payload_size = RADIO_STATUS_PAYLOAD.size
+
+        if self.version == 1:
+            MAVLINK_V1_HEADER.pack_into(
+                buffer,
+                0,
+                MAVLINK_V1_STX,
+                payload_size,
+                self.sequence,
+                self.system_id,
+                self.component_id,
+                MAVLINK_RADIO_STATUS_MSG_ID,
+            )
+        else:
+            # MAVLink 2 truncates trailing zero bytes of the payload (at least one is kept)
+            end = self.header_size + payload_size
+            while payload_size > 1 and buffer[end - 1] == 0:
+                payload_size -= 1
+                end -= 1
+            MAVLINK_V2_HEADER.pack_into(
+                buffer,
+                0,
+                MAVLINK_V2_STX,
+                payload_size,
+                0,
+                0,
+                self.sequence,
+                self.system_id,
+                self.component_id,
+                MAVLINK_RADIO_STATUS_MSG_ID & 0xFFFF,
+            )
+            buffer[MAVLINK_V2_HEADER.size] = MAVLINK_RADIO_STATUS_MSG_ID >> 16
+
+        end = self.header_size + payload_size
+        crc = 0xFFFF
+        for i in range(1, end):
+            crc = _crc_accumulate(buffer[i], crc)
+        crc = _crc_accumulate(MAVLINK_RADIO_STATUS_CRC_EXTRA, crc)
+        MAVLINK_CRC.pack_into(buffer, end, crc)
+
+        self.sequence = (self.sequence + 1) & 0xFF
+        return memoryview(buffer)[: end + MAVLINK_CRC.size]
+
+
+class RadioStatusEmitter:
+    """
+    Sends RADIO_STATUS frames over UDP to each configured endpoint.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Tuple[str, int]],
+        version: int = 2,
+        verbose: bool = False,
+    ) -> None:
+        self.endpoints = endpoints
+        self.verbose = verbose
+        self.encoder = RadioStatusEncoder(version=version)
+        self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp_socket.setblocking(False)
+
+    def send(
+        self,
+        rssi_dbm: Optional[float],
+        remrssi_dbm: Optional[float] = None,
+        noise_dbm: Optional[float] = None,
+        remnoise_dbm: Optional[float] = None,
+    ) -> bool:
+        frame = self.encoder.encode(
+            rssi=dbm_to_radio_status(rssi_dbm),
+            remrssi=dbm_to_radio_status(remrssi_dbm),
+            noise=dbm_to_radio_status(noise_dbm),
+            remnoise=dbm_to_radio_status(remnoise_dbm),
+        )
+        is_success = True
+        for endpoint in self.endpoints:
+            try:
+                self.udp_socket.sendto(frame, endpoint)
+            except Exception as e:
+                is_success = False
+                if self.verbose:
+                    print(f"{endpoint[0]}:{endpoint[1]} {e}")
+        return is_success
+
+    def close(self) -> None:
+        self.udp_socket.close()
+
+
+def parse_endpoints(endpoints: str) -> List[Tuple[str, int]]:
+    """
+    Parses "host:port,host:port" into a list of (host, port).
+    """
+    parsed = []
+    for endpoint in endpoints.split(","):
+        if not endpoint.strip():
+            continue
+        host, port = endpoint.strip().rsplit(":", 1)
+        parsed.append((host, int(port)))
+    return parsed
@@ -1,9 +1,16 @@
 #!/usr/bin/env python3
 
-import subprocess
+import time
+
+# Taken first so --import_timing covers every import below
+PROCESS_START: float = time.perf_counter()
+
+import importlib
+import json
 import sys
 import os
-from typing import Any, Final, List
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Final, List, Optional
 
 INSTALL_PATH: Final = "/usr/lib/python3.11/dist-packages/microhard/"
 sys.path.insert(0, INSTALL_PATH)
@@ -11,16 +18,58 @@ sys.path.insert(0, INSTALL_PATH)
 import argparse
 from constants import (
     CHECKSUM_FILE_NAME,
+    DAEMON_ACTIONS,
+    DAEMON_REQUEST_TIMEOUT,
+    DAEMON_SOCKET_PATH,
+    FLIGHT_LOG_DIR,
+    FLEET_CONCURRENCY,
+    FLEET_RADIO_TIMEOUT,
+    IMPORT_TIMING_FILE_NAME,
+    MICROHARD_USER,
+    TRACE_ENV,
     MONARK_ID_FILE_NAME,
     NAMESPACE_URI,
     NEWEK,
     NO,
+    RSSI_DELAY,
+    RSSI_STATS_SOCKET_PATH,
+    RSSI_STATS_WINDOW,
+    SURVEY_DWELL,
+    TELEMETRY_DEFAULT,
+    TX_POWER_CONTROL_MAX_DBM,
+    TX_POWER_CONTROL_MIN_DBM,
+    TX_POWER_TARGET_RSSI,
     YES,
     ActionTypes,
+    RssiOutputTypes,
+    RssiSocketModes,
 )
-from microhard_service import MicrohardService
+from control_socket import ControlClient
 from validator import Validator
 
+# The heavy modules (paramiko via the SSH session, RPi.GPIO via the buzzer) are only
+# imported by the actions that need them, see `lazy_import`.
+if TYPE_CHECKING:
+    from microhard_service import MicrohardService
+    from probe_service import ReachabilityProbe
+    from radio_arbiter import RadioArbiter
+    from ssh_session import SshSession
+    from tx_power_controller import TxPowerController
+
+# module name -> seconds spent importing it (first import only)
+IMPORT_TIMES: Dict[str, float] = {}
+
+
+def lazy_import(module_name: str) -> Any:
+    """
+    Imports module_name on first use and records how long that took.
+    """
+    if module_name not in sys.modules:
+        start = time.perf_counter()
+        importlib.import_module(module_name)
+        IMPORT_TIMES[module_name] = time.perf_counter() - start
+    return sys.modules[module_name]
+
 
 class Microhard:
     def __init__(
@@ -31,6 +80,28 @@ class Microhard:
         frequency: int,
         monark_id: int,
         verbose: bool,
+        nek: Optional[str] = None,
+        session: Optional["SshSession"] = None,
+        probe: Optional["ReachabilityProbe"] = None,
+        arbiter: Optional["RadioArbiter"] = None,
+        use_daemon: bool = True,
+        rssi_output: str = RssiOutputTypes.SOCKET.value,
+        rssi_socket_mode: str = RssiSocketModes.STREAM.value,
+        mavlink_endpoints: str = "",
+        rssi_period: float = RSSI_DELAY,
+        rssi_adaptive: bool = False,
+        telemetry: str = TELEMETRY_DEFAULT,
+        flight_log_dir: str = FLIGHT_LOG_DIR,
+        tx_power_controller: Optional["TxPowerController"] = None,
+        window: float = RSSI_STATS_WINDOW,
+        max_age: float = 0,
+        fetch_info: bool = False,
+        frequencies: str = "",
+        dwell: float = SURVEY_DWELL,
+        apply: bool = False,
+        manifest: str = "",
+        concurrency: int = FLEET_CONCURRENCY,
+        radio_timeout: float = FLEET_RADIO_TIMEOUT,
     ) -> None:
         self.action = action
         self.network_id = network_id
@@ -39,11 +110,33 @@ class Microhard:
                 chr(b ^ ord(NAMESPACE_URI[i % len(NAMESPACE_URI)]))
                 for i, b in enumerate(bytes.fromhex(f.read().strip()))
             )
-        self.nek = os.environ.get(NEWEK, "").strip()
+        self.nek = nek if nek is not None else os.environ.get(NEWEK, "").strip()
         self.tx_power = tx_power
         self.frequency = frequency
         self.monark_id = monark_id
         self.verbose = verbose
+        # When running inside the daemon the radio session and probe cache are shared between requests
+        self.session = session
+        self.probe = probe
+        self.arbiter = arbiter
+        self.use_daemon = use_daemon
+        self.rssi_output = rssi_output
+        self.rssi_socket_mode = rssi_socket_mode
+        self.mavlink_endpoints = mavlink_endpoints
+        self.rssi_period = rssi_period
+        self.rssi_adaptive = rssi_adaptive
+        self.telemetry = telemetry
+        self.flight_log_dir = flight_log_dir
+        self.tx_power_controller = tx_power_controller
+        self.window = window
+        self.max_age = max_age
+        self.fetch_info = fetch_info
+        self.frequencies = frequencies
+        self.dwell = dwell
+        self.apply = apply
+        self.manifest = manifest
+        self.concurrency = concurrency
+        self.radio_timeout = radio_timeout
 
         # The MONARK ID is saved every time this service is invoked. It's value is 1-255.
         if not os.path.exists(MONARK_ID_FILE_NAME):
@@ -53,34 +146,115 @@ class Microhard:
             os.makedirs(os.path.dirname(MONARK_ID_FILE_NAME), exist_ok=True)
 
         os.chmod(MONARK_ID_FILE_NAME, 0o777)
-        if self.action != ActionTypes.RSSI.value:
+        if self.action not in [
+            ActionTypes.RSSI.value,
+            ActionTypes.RSSI_STATS.value,
+            ActionTypes.DISCOVER.value,
+            ActionTypes.FLEET.value,
+        ]:
             with open(MONARK_ID_FILE_NAME, "w") as file:
                 file.write(str(self.monark_id))
 
         if self.verbose:
             print(f"MONARK ID: {self.monark_id}")
 
-    def _get_background_update_command(self, _at_commands: List[Any]) -> List[Any]:
-        return [
-            "/usr/bin/python3",
-            "-c",
-            (
-                "import sys; "
-                f"sys.path.insert(0, '{INSTALL_PATH}'); "
-                "from microhard_service import MicrohardService; "
-                f"microhard_service = MicrohardService(action='{self.action}', verbose={self.verbose}, monark_id={self.monark_id}); "
-                f"microhard_service.send_commands(ek='{self.ek}', at_commands={_at_commands}); "
-            ),
-        ]
+    def _service(self) -> "MicrohardService":
+        return lazy_import("microhard_service").MicrohardService(
+            action=self.action,
+            monark_id=self.monark_id,
+            verbose=self.verbose,
+            session=self.session,
+            probe=self.probe,
+            arbiter=self.arbiter,
+        )
+
+    def _to_request(self) -> Dict[str, Any]:
+        return {
+            "action": self.action,
+            "network_id": self.network_id,
+            "tx_power": self.tx_power,
+            "frequency": self.frequency,
+            "monark_id": self.monark_id,
+            "verbose": self.verbose,
+            "nek": self.nek,
+            "max_age": self.max_age,
+        }
+
+    def _forward_to_daemon(self) -> Optional[Dict[str, Any]]:
+        """
+        Returns the daemon's response, or None if the daemon is not running.
+        Only then is the action run here, once the daemon has the request it may be
+        changing the radio and running it again would race it.
+        """
+        if not self.use_daemon or self.action not in DAEMON_ACTIONS:
+            return None
+        response = ControlClient(
+            socket_path=DAEMON_SOCKET_PATH, timeout=DAEMON_REQUEST_TIMEOUT
+        ).request(self._to_request())
+        if response is None and self.verbose:
+            print("The microhard daemon is not running")
+        return response
+
+    def _send_update_commands(
+        self, _at_commands: List[Any], wait: bool, only_changes: bool = False
+    ) -> None:
+        """
+        Runs the update in this process when waiting. Otherwise it runs in the background:
+        on a thread against the shared session inside the daemon, or in a forked child
+        (instead of starting a second interpreter) for a one-shot CLI call.
+        With only_changes the settings are diffed against the radio first (see `apply_config`).
+        """
+
+        def _send() -> None:
+            service = self._service()
+            if only_changes:
+                service.apply_config(ek=self.ek, at_commands=_at_commands)
+            else:
+                # A temporary TX power (see tx_power_controller.py) must not be saved
+                service.send_commands(
+                    ek=self.ek, at_commands=service.with_configured_power(_at_commands)
+                )
+
+        if wait:
+            _send()
+        elif self.session is not None:
+            threading.Thread(target=_send, daemon=True).start()
+        else:
+            self._fork(_send)
+
+    def _fork(self, target: Any) -> None:
+        """
+        Runs target in a detached child so this process can print its result and exit.
+        The child does not keep the caller's stdout open, like the old background interpreter.
+        """
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if os.fork() != 0:
+            return
+
+        try:
+            os.setsid()
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(devnull, fd)
+            target()
+            # Let the result beeps finish before the child exits
+            if "buzzer_player" in sys.modules:
+                sys.modules["buzzer_player"].get_player().wait()
+        finally:
+            os._exit(0)
 
     def run(self):
         ret_msg = "Error."
         ret_status = False
 
+        response = self._forward_to_daemon()
+        if response is not None:
+            print(response)
+            return response["is_success"], response["message"]
+
         if self.action == ActionTypes.PAIR.value:
-            ret_status, responses = MicrohardService(
-                action="pair", monark_id=self.monark_id, verbose=self.verbose
-            ).pair_monark(
+            ret_status, responses = self._service().pair_monark(
                 network_id=self.network_id,
                 ek=self.ek,
                 tx_power=self.tx_power,
@@ -90,43 +264,93 @@ class Microhard:
                 print(f"Microhard pair responses: {responses}")
             ret_msg = "Pairing is successful." if ret_status else "Pairing failed."
         elif self.action == ActionTypes.INFO.value:
-            ret_msg = MicrohardService(
-                action=self.action, verbose=self.verbose, monark_id=self.monark_id
-            ).get_info(ek=self.ek)
+            ret_msg = self._service().get_info(ek=self.ek, max_age=self.max_age)
             ret_status = bool(ret_msg)
         elif self.action == ActionTypes.RSSI.value:
             # this is an infinite loop
-            MicrohardService(
-                action=self.action, verbose=self.verbose, monark_id=self.monark_id
-            ).rssi_loop()
+            self._service().rssi_loop(
+                output=self.rssi_output,
+                mavlink_endpoints=lazy_import("mavlink_service").parse_endpoints(
+                    self.mavlink_endpoints
+                ),
+                period=self.rssi_period,
+                adaptive=self.rssi_adaptive,
+                telemetry=self.telemetry,
+                flight_log_dir=self.flight_log_dir,
+                tx_power_controller=self.tx_power_controller,
+                socket_mode=self.rssi_socket_mode,
+            )
+        elif self.action == ActionTypes.RSSI_STATS.value:
+            response = ControlClient(
+                socket_path=RSSI_STATS_SOCKET_PATH, timeout=DAEMON_REQUEST_TIMEOUT
+            ).request({"action": self.action, "window": self.window})
+            if response is None:
+                ret_msg = "RSSI service is not running."
+            else:
+                ret_status, ret_msg = response["is_success"], response["message"]
+        elif self.action == ActionTypes.DISCOVER.value:
+            # Each radio is printed as a JSON line as soon as it is found
+            discovery = lazy_import("fleet_discovery").FleetDiscovery(
+                probe=self.probe, verbose=self.verbose
+            )
+            try:
+                radios = discovery.discover(ek=self.ek, fetch_info=self.fetch_info)
+            finally:
+                discovery.close()
+            ret_status = bool(radios)
+            ret_msg = f"Found {len(radios)} radio(s)."
+        elif self.action == ActionTypes.SURVEY.value:
+            # Each frequency is printed as a JSON line as soon as it is measured
+            service = self._service()
+            ranked = (
+                lazy_import("channel_survey")
+                .ChannelSurvey(
+                    service=service,
+                    ek=MICROHARD_USER if service.is_default_microhard else self.ek,
+                    dwell=self.dwell,
+                    verbose=self.verbose,
+                )
+                .run(
+                    [int(f) for f in self.frequencies.split(",") if f.strip()],
+                    apply=self.apply,
+                )
+            )
+            ret_status = bool(ranked) and ranked[0]["score"] is not None
+            if not ret_status:
+                ret_msg = "No frequency could be measured."
+            else:
+                ret_msg = {
+                    "best_frequency": ranked[0]["frequency"],
+                    "interference_dbm": ranked[0]["interference_dbm"],
+                    "applied": self.apply,
+                }
+        elif self.action == ActionTypes.FLEET.value:
+            # Each radio is printed as a JSON line as soon as it is done
+            fleet_provisioning = lazy_import("fleet_provisioning")
+            results = fleet_provisioning.FleetProvisioner(
+                ek=self.ek,
+                concurrency=self.concurrency,
+                timeout=self.radio_timeout,
+                probe=self.probe,
+                verbose=self.verbose,
+            ).run(fleet_provisioning.load_manifest(self.manifest))
+            succeeded = sum(result["is_success"] for result in results)
+            ret_status = succeeded == len(results)
+            ret_msg = f"Provisioned {succeeded}/{len(results)} radio(s)."
         elif self.action == ActionTypes.IS_FACTORY.value:
-            ret_status = MicrohardService(
-                action=self.action, verbose=self.verbose, monark_id=self.monark_id
-            ).is_default_microhard
+            ret_status = self._service().is_default_microhard
             ret_msg = YES if ret_status else NO
         elif self.action == ActionTypes.UPDATE.value:
-            _at_commands = []
-            ret_status = True
-
-            if self.tx_power:
-                _at_commands.append(f"AT+MWTXPOWER={self.tx_power}")
-            if self.frequency:
-                _at_commands.append(f"AT+MWFREQ={self.frequency}")
-            if self.network_id:
-                _at_commands.append(f"AT+MWNETWORKID={self.network_id}")
-
-            if _at_commands:
-                _at_commands.append("AT&W")
+            _at_commands = self._service().update_commands(
+                network_id=self.network_id,
+                tx_power=self.tx_power,
+                frequency=self.frequency,
+            )
 
-            # frequency is done async the others are sync
-            if self.frequency:
-                subprocess_func = subprocess.Popen
-            else:
-                subprocess_func = subprocess.run
-            subprocess_func(
-                self._get_background_update_command(_at_commands),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+            # frequency is done async the others are sync.
+            # Unchanged settings are skipped and AT&W is only sent when something changed.
+            self._send_update_commands(
+                _at_commands, wait=not self.frequency, only_changes=True
             )
             ret_status = True
             ret_msg = "Update in progress..." if self.frequency else "Done"
@@ -140,11 +364,7 @@ class Microhard:
                     f"AT+MWVENCRYPT=2,{self.nek}",
                     "AT&W",
                 ]
-                subprocess.Popen(
-                    self._get_background_update_command(_at_commands),
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                )
+                self._send_update_commands(_at_commands, wait=False)
                 _checksum = "".join(
                     f"{b:02x}"
                     for b in [
@@ -163,6 +383,33 @@ class Microhard:
         return ret_status, ret_msg
 
 
+def report_import_timing(action: str, action_start: float) -> None:
+    """
+    Writes one JSON line with the cold start cost of this run, so the cost of each
+    action can be tracked over time (e.g. after a dependency upgrade on the Pi).
+    """
+    now = time.perf_counter()
+    record = {
+        "timestamp": time.time(),
+        "action": action,
+        "startup_ms": round(1000 * (action_start - PROCESS_START), 2),
+        "action_ms": round(1000 * (now - action_start), 2),
+        "total_ms": round(1000 * (now - PROCESS_START), 2),
+        "lazy_imports_ms": {
+            name: round(1000 * seconds, 2) for name, seconds in IMPORT_TIMES.items()
+        },
+        "modules_loaded": len(sys.modules),
+        "paramiko_loaded": "paramiko" in sys.modules,
+    }
+    line = json.dumps(record)
+    print(line, file=sys.stderr)
+    try:
+        with open(IMPORT_TIMING_FILE_NAME, "a") as f:
+            f.write(line + "\n")
+    except Exception as e:
+        print(f"Unable to save import timing: {e}", file=sys.stderr)
+
+
 def main():
     try:
         # Argument parsing
@@ -200,14 +447,179 @@ def main():
             default=0,
             help="The frequency (in MHz) for the Microhard radio.",
         )
+        parser.add_argument(
+            "--rssi_output",
+            type=str,
+            default=RssiOutputTypes.SOCKET.value,
+            help="Where the rssi action sends samples. See `RssiOutputTypes` in constants.py.",
+        )
+        parser.add_argument(
+            "--rssi_socket_mode",
+            type=str,
+            default=RssiSocketModes.STREAM.value,
+            help="stream (one persistent connection) or legacy (one connection per sample, for older mavproxy consumers) socket output. See `RssiSocketModes` in constants.py.",
+        )
+        parser.add_argument(
+            "--mavlink_endpoints",
+            type=str,
+            default="",
+            help="Comma separated host:port UDP endpoints for RADIO_STATUS (rssi action).",
+        )
+        parser.add_argument(
+            "--rssi_period",
+            type=float,
+            default=RSSI_DELAY,
+            help="Seconds between RSSI samples (rssi action).",
+        )
+        parser.add_argument(
+            "--rssi_adaptive",
+            action="store_true",
+            help="Sample RSSI faster while it is falling or below the threshold (rssi action).",
+        )
+        parser.add_argument(
+            "--telemetry",
+            type=str,
+            default=TELEMETRY_DEFAULT,
+            help="Comma separated link metrics read every RSSI sample, e.g. rssi,snr,noise,remote_rssi. See TELEMETRY_METRICS in constants.py.",
+        )
+        parser.add_argument(
+            "--flight_log_dir",
+            type=str,
+            default=FLIGHT_LOG_DIR,
+            help="Where the rssi action logs every sample for after-flight analysis, empty to disable. See flight_log.py.",
+        )
+        parser.add_argument(
+            "--tx_power_control",
+            action="store_true",
+            help="Adjust the TX power (without saving it) to hold --rssi_target (rssi action).",
+        )
+        parser.add_argument(
+            "--tx_power_min",
+            type=int,
+            default=TX_POWER_CONTROL_MIN_DBM,
+            help="Lowest TX power in dBm the controller may set (rssi action).",
+        )
+        parser.add_argument(
+            "--tx_power_max",
+            type=int,
+            default=TX_POWER_CONTROL_MAX_DBM,
+            help="Highest TX power in dBm the controller may set (rssi action).",
+        )
+        parser.add_argument(
+            "--rssi_target",
+            type=float,
+            default=TX_POWER_TARGET_RSSI,
+            help="Received level in dBm the TX power controller aims for (rssi action).",
+        )
+        parser.add_argument(
+            "--window",
+            type=float,
+            default=RSSI_STATS_WINDOW,
+            help="Seconds of RSSI history to summarize (rssi_stats action), 0 for the whole buffer.",
+        )
+        parser.add_argument(
+            "--max_age",
+            type=float,
+            default=0,
+            help="Answer info from the saved radio state if it is at most this many seconds old.",
+        )
+        parser.add_argument(
+            "--daemon_rssi",
+            action="store_true",
+            help="Run the RSSI loop inside the daemon (daemon action), instead of rssi.service.",
+        )
+        parser.add_argument(
+            "--fetch_info",
+            action="store_true",
+            help="Also read tx power and frequency of each radio found (discover action).",
+        )
+        parser.add_argument(
+            "--frequencies",
+            type=str,
+            default="",
+            help="Comma separated candidate frequencies in MHz (survey action).",
+        )
+        parser.add_argument(
+            "--dwell",
+            type=float,
+            default=SURVEY_DWELL,
+            help="Seconds to settle on each frequency before sampling (survey action).",
+        )
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Save the best frequency to the radio (survey action).",
+        )
+        parser.add_argument(
+            "--manifest",
+            type=str,
+            default="",
+            help="JSON file of the radios to pair or update (fleet action).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=FLEET_CONCURRENCY,
+            help="Radios provisioned at once (fleet action).",
+        )
+        parser.add_argument(
+            "--radio_timeout",
+            type=float,
+            default=FLEET_RADIO_TIMEOUT,
+            help="Seconds allowed per radio (fleet action).",
+        )
         parser.add_argument(
             "--verbose",
             action="store_true",
             help="Enable verbose output.",
         )
+        parser.add_argument(
+            "--trace",
+            action="store_true",
+            help=f"Record per-phase timings (also enabled by {TRACE_ENV}=1).",
+        )
+        parser.add_argument(
+            "--import_timing",
+            action="store_true",
+            help=f"Report start up and import times of this run on stderr and to {IMPORT_TIMING_FILE_NAME}.",
+        )
 
         args = parser.parse_args()
         Validator(args)
+        action_start = time.perf_counter()
+        if args.trace:
+            lazy_import("tracer").enable(verbose=args.verbose)
+
+        tx_power_controller = None
+        if args.tx_power_control:
+            tx_power_controller = lazy_import("tx_power_controller").TxPowerController(
+                min_dbm=args.tx_power_min,
+                max_dbm=args.tx_power_max,
+                target_dbm=args.rssi_target,
+                verbose=args.verbose,
+            )
+
+        if args.action == ActionTypes.DAEMON.value:
+            # this is an infinite loop
+            daemon = lazy_import("microhard_daemon").MicrohardDaemon(
+                microhard_factory=Microhard, verbose=args.verbose
+            )
+            if args.daemon_rssi:
+                daemon.start_rssi(
+                    monark_id=args.monark_id,
+                    output=args.rssi_output,
+                    mavlink_endpoints=lazy_import("mavlink_service").parse_endpoints(
+                        args.mavlink_endpoints
+                    ),
+                    period=args.rssi_period,
+                    adaptive=args.rssi_adaptive,
+                    telemetry=args.telemetry,
+                    flight_log_dir=args.flight_log_dir,
+                    tx_power_controller=tx_power_controller,
+                    socket_mode=args.rssi_socket_mode,
+                )
+            daemon.serve_forever()
+            return
 
         monark = Microhard(
             action=args.action,
@@ -216,9 +628,36 @@ def main():
             frequency=args.frequency,
             monark_id=args.monark_id,
             verbose=args.verbose,
+            rssi_output=args.rssi_output,
+            rssi_socket_mode=args.rssi_socket_mode,
+            mavlink_endpoints=args.mavlink_endpoints,
+            rssi_period=args.rssi_period,
+            rssi_adaptive=args.rssi_adaptive,
+            telemetry=args.telemetry,
+            flight_log_dir=args.flight_log_dir,
+            tx_power_controller=tx_power_controller,
+            window=args.window,
+            max_age=args.max_age,
+            fetch_info=args.fetch_info,
+            frequencies=args.frequencies,
+            dwell=args.dwell,
+            apply=args.apply,
+            manifest=args.manifest,
+            concurrency=args.concurrency,
+            radio_timeout=args.radio_timeout,
         )
 
-        monark.run()
+        tracer = lazy_import("tracer").get_tracer()
+        try:
+            with tracer.span("action", action=args.action) as span:
+                ret_status, _ = monark.run()
+                if not ret_status:
+                    span.outcome = "error"
+        finally:
+            tracer.flush()
+
+        if args.import_timing:
+            report_import_timing(args.action, action_start)
 
     except Exception as e:
         print(e)
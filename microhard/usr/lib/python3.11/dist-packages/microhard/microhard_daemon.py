@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+from typing import Any, Callable, Dict, Optional, Tuple
+import threading
+from constants import (
+    DAEMON_ACTIONS,
+    DAEMON_SOCKET_PATH,
+    MONARK_ID_FILE_NAME,
+    ActionTypes,
+)
+from control_socket import ControlServer
+from probe_service import ReachabilityProbe
+from ssh_session import SshSession
+from radio_arbiter import RadioArbiter, priority_for
+from tracer import get_tracer
+
+"""
+Resident microhard service.
+
+It owns the SSH session to the radio and the reachability cache, and serves the GCS
+actions as JSON requests over a Unix socket, so each action no longer needs a new
+interpreter, paramiko import and SSH handshake. The microhard CLI forwards to it when it is running.
+"""
+
+
+class MicrohardDaemon:
+    def __init__(
+        self,
+        microhard_factory: Callable[..., Any],
+        verbose: bool = False,
+        socket_path: str = DAEMON_SOCKET_PATH,
+    ) -> None:
+        """
+        microhard_factory builds a `Microhard` for one request (injected to avoid
+        importing the CLI module from here).
+        """
+        self.microhard_factory = microhard_factory
+        self.verbose = verbose
+        self.socket_path = socket_path
+        self.sessions: Dict[int, SshSession] = {}
+        self.sessions_lock = threading.Lock()
+        self.probe = ReachabilityProbe(verbose=verbose)
+        # Every request and the RSSI loop use the radio through this, one at a time
+        self.arbiter = RadioArbiter(verbose=verbose)
+        self.rssi_service: Optional[Any] = None
+
+    def session(self, monark_id: int) -> SshSession:
+        with self.sessions_lock:
+            if monark_id not in self.sessions:
+                self.sessions[monark_id] = SshSession(verbose=self.verbose)
+            return self.sessions[monark_id]
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        action = str(request.get("action", ""))
+        # Anything else (e.g. rssi or fleet) would hold the arbiter for its whole run
+        if action not in DAEMON_ACTIONS:
+            return {
+                "is_success": False,
+                "message": f"The daemon does not run {action or 'unnamed'} actions",
+            }
+        monark_id = int(request.get("monark_id", 0))
+        monark = self.microhard_factory(
+            action=action,
+            network_id=str(request.get("network_id", "")),
+            tx_power=int(request.get("tx_power", 0)),
+            frequency=int(request.get("frequency", 0)),
+            monark_id=monark_id,
+            verbose=self.verbose or bool(request.get("verbose", False)),
+            nek=str(request.get("nek", "")),
+            max_age=float(request.get("max_age", 0)),
+            session=self.session(monark_id),
+            probe=self.probe,
+            arbiter=self.arbiter,
+            use_daemon=False,
+        )
+
+        def _run() -> Tuple[bool, Any]:
+            ret_status, ret_msg = monark.run()
+            self._follow_pairing(monark.action, monark_id, ret_status)
+            return ret_status, ret_msg
+
+        tracer = get_tracer()
+        try:
+            with tracer.span("action", action=monark.action) as span:
+                # Configuration actions go ahead of queued RSSI polls
+                ret_status, ret_msg = self.arbiter.run(
+                    _run, priority_for(monark.action)
+                )
+                if not ret_status:
+                    span.outcome = "error"
+        finally:
+            tracer.flush()
+        return {"is_success": ret_status, "message": ret_msg}
+
+    def start_rssi(self, monark_id: int = 0, **rssi_options: Any) -> None:
+        """
+        Runs the RSSI loop on a thread of the daemon. Its polls share the arbiter with
+        the GCS actions, so pairing no longer has to stop rssi.service.
+        rssi_options are passed to `MicrohardService.rssi_loop`.
+        """
+        from microhard_service import MicrohardService
+
+        if not monark_id:
+            with open(MONARK_ID_FILE_NAME, "r") as f:
+                monark_id = int(f.read().strip())
+
+        self.rssi_service = MicrohardService(
+            action=ActionTypes.RSSI.value,
+            monark_id=monark_id,
+            verbose=self.verbose,
+            # Its own session, so polls don't re-authenticate after every GCS action
+            session=SshSession(verbose=self.verbose),
+            probe=self.probe,
+            arbiter=self.arbiter,
+        )
+        threading.Thread(
+            target=self.rssi_service.rssi_loop, kwargs=rssi_options, daemon=True
+        ).start()
+
+    def _follow_pairing(self, action: str, monark_id: int, is_success: bool) -> None:
+        """
+        After pairing to another MONARK ID the RSSI loop polls that radio from now on,
+        as a restarted rssi.service would after reading the new ID.
+        """
+        rssi_service = self.rssi_service
+        if (
+            rssi_service is None
+            or action != ActionTypes.PAIR.value
+            or not is_success
+            or rssi_service.monark_id == monark_id
+        ):
+            return
+        rssi_service.monark_id = monark_id
+        rssi_service.__dict__.pop("paired_microhard_ip", None)
+        rssi_service.__dict__.pop("active_microhard_ip", None)
+
+    def serve_forever(self) -> None:
+        with ControlServer(socket_path=self.socket_path, handler=self.handle) as server:
+            if self.verbose:
+                print(f"Listening on {self.socket_path}")
+            try:
+                server.serve_forever()
+            finally:
+                for session in self.sessions.values():
+                    session.close()
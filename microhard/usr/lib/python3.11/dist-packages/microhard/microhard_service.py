@@ -1,31 +1,69 @@
 #!/usr/bin/env python3
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+import threading
 import time
 from constants import (
+    AT_SAVE_COMMAND,
+    FLIGHT_LOG_DIR,
+    MAVLINK_RADIO_STATUS_ENDPOINTS,
     MICROHARD_DEFAULT_IP,
     MICROHARD_IP_PREFIX,
     MICROHARD_USER,
     RSSI_DELAY,
+    RSSI_STATS_SOCKET_PATH,
+    TELEMETRY_DEFAULT,
+    TRACE_FLUSH_SAMPLES,
     ActionTypes,
-    SocketCommandType,
+    RssiOutputTypes,
+    RssiSocketModes,
 )
-from buzzer_service import BuzzerService
-import paramiko
 import subprocess
 from functools import cached_property
-import os
-from socket_service import SocketService
+from socket_service import SocketPublisher
+from rssi_scheduler import RssiScheduler
+from rssi_history import RssiHistory
+from link_status import LinkStatusWriter
+from link_monitor import LinkMonitor
+from link_telemetry import LinkTelemetry, TelemetrySample
+from tx_power_controller import TxPowerController
+from flight_log import FlightLogWriter
+from control_socket import ControlServer
+from config_planner import ConfigPlanner, split_command
+from radio_state import RadioState
+from mavlink_service import RadioStatusEmitter, parse_endpoints
+from ssh_session import SshSession
+from at_engine import AtCommandEngine
+from at_parser import parse_response
+from probe_service import ReachabilityProbe
+from radio_arbiter import PRIORITY_TELEMETRY, RadioArbiter, priority_for
+from tracer import get_tracer
 
 
 class MicrohardService:
-    def __init__(self, action: str, monark_id: int, verbose: bool = False) -> None:
-        # Set up the SSH client
-        self.client = paramiko.SSHClient()
-        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    def __init__(
+        self,
+        action: str,
+        monark_id: int,
+        verbose: bool = False,
+        session: Optional[SshSession] = None,
+        probe: Optional[ReachabilityProbe] = None,
+        arbiter: Optional[RadioArbiter] = None,
+    ) -> None:
+        # The SSH session is kept open between calls and reconnects on demand.
+        # A resident daemon passes in its own session so it outlives this object.
+        self.session = session or SshSession(verbose=verbose)
+        self.probe = probe or ReachabilityProbe(verbose=verbose)
+        self.state = RadioState(verbose=verbose)
+        self.tracer = get_tracer()
+        # When set, every use of the radio is queued on it by priority (see radio_arbiter.py)
+        self.arbiter = arbiter
         self.monark_id = int(monark_id)
         self.action = action
         self.verbose = verbose
 
+    def close(self) -> None:
+        self.session.close()
+
     @cached_property
     def paired_microhard_ip(self) -> str:
         """
@@ -33,87 +71,294 @@ class MicrohardService:
         """
         return f"{MICROHARD_IP_PREFIX}.{self.monark_id}"
 
+    @property
+    def candidate_ips(self) -> List[str]:
+        """
+        The IPs the radio can be at, default first
+        """
+        return [MICROHARD_DEFAULT_IP, self.paired_microhard_ip]
+
     @cached_property
     def active_microhard_ip(self) -> str:
         """
         The current microhard radio IP (i.e. default or provisioned)
         """
-        if self.is_default_microhard:
-            ip = MICROHARD_DEFAULT_IP
-        elif self.is_paired_microhard:
-            ip = self.paired_microhard_ip
-        else:
+        ip = self.find_active_ip()
+        if ip is None:
             raise Exception("No active microhard radio found")
+        return ip
 
-        if self.verbose:
-            print(f"Active MONARK IP: {ip}")
+    def find_active_ip(self, fresh: bool = False) -> Optional[str]:
+        """
+        Probes the candidate IPs and returns the one that answers, or None.
+        fresh ignores cached probe results, e.g. after the radio stopped answering.
+        """
+        if fresh:
+            for ip in self.candidate_ips:
+                self.probe.invalidate(ip)
+        found = self.probe.first_reachable(self.candidate_ips)
+        if found is None:
+            return None
 
-        return ip
+        # A snapshot taken while the radio was at another IP no longer describes it
+        snapshot_ip = self.state.load().get("active_ip")
+        if snapshot_ip and snapshot_ip != found:
+            self.state.invalidate()
 
-    def _is_active_ip(self, ip: str) -> bool:
-        try:
-            # Ping the IP address and check for response within 200 ms
-            output = subprocess.run(
-                ["ping", "-c", "1", "-W", "200", ip],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=0.75,
-            )
-            # Check if the ping was successful
-            return output.returncode == 0
-        except Exception as e:
-            if self.verbose:
-                print(f"Error: {e}")
-        return False
+        if self.verbose:
+            print(f"Active MONARK IP: {found}")
 
-    @cached_property
+        return found
+
+    @property
     def is_paired_microhard(self) -> bool:
         """
-        Return True if 172.20.2.MONARK_ID can be pinged
+        Return True if 172.20.2.MONARK_ID answers
         """
-        return self._is_active_ip(self.paired_microhard_ip)
+        return self.probe.is_reachable(self.paired_microhard_ip)
 
-    @cached_property
+    @property
     def is_default_microhard(self) -> bool:
         """
-        Return True if 192.168.168.1 can be pinged
+        Return True if 192.168.168.1 answers
         """
-        return self._is_active_ip(MICROHARD_DEFAULT_IP)
+        return self.probe.is_reachable(MICROHARD_DEFAULT_IP)
 
-    def rssi_loop(self) -> None:
-        while True:
-            at_commands = [
-                f"AT+MWRSSI",
-            ]
-            is_success, responses = self.send_commands(
-                ip_address=self.active_microhard_ip,
+    def admin_ek(self, ek: str, ip_address: str = "") -> str:
+        """
+        The admin password of the radio at ip_address (the active IP by default): the
+        factory one at the default IP, ek once paired.
+        """
+        ip_address = ip_address or self.active_microhard_ip
+        return MICROHARD_USER if ip_address == MICROHARD_DEFAULT_IP else ek
+
+    def rssi_loop(
+        self,
+        output: str = RssiOutputTypes.SOCKET.value,
+        mavlink_endpoints: Optional[List[Tuple[str, int]]] = None,
+        period: float = RSSI_DELAY,
+        adaptive: bool = False,
+        telemetry: str = TELEMETRY_DEFAULT,
+        flight_log_dir: str = FLIGHT_LOG_DIR,
+        tx_power_controller: Optional[TxPowerController] = None,
+        socket_mode: str = RssiSocketModes.STREAM.value,
+    ) -> None:
+        """
+        telemetry lists the metrics read every sample besides RSSI (see link_telemetry.py).
+        socket_mode picks how the socket output talks to mavproxy (see `RssiSocketModes`).
+        Every sample is also logged to flight_log_dir (see flight_log.py), "" to disable.
+        With tx_power_controller the TX power follows the link (see tx_power_controller.py).
+        """
+        scheduler = RssiScheduler(period=period, adaptive=adaptive)
+        if tx_power_controller is not None:
+            # The controller needs the radio's current power with every sample
+            telemetry = f"{telemetry},tx_power"
+        link_telemetry = LinkTelemetry(telemetry)
+        history = RssiHistory()
+        # Finds the radio again when it stops answering, see link_monitor.py
+        monitor = LinkMonitor(
+            resolve=lambda: self.find_active_ip(fresh=True), verbose=self.verbose
+        )
+        self._serve_rssi_stats(history, monitor, tx_power_controller)
+        publisher = None
+        emitter = None
+        if output in [RssiOutputTypes.SOCKET.value, RssiOutputTypes.BOTH.value]:
+            publisher = SocketPublisher(
+                legacy=socket_mode == RssiSocketModes.LEGACY.value,
+                verbose=self.verbose,
+            )
+        if output in [RssiOutputTypes.MAVLINK.value, RssiOutputTypes.BOTH.value]:
+            emitter = RadioStatusEmitter(
+                endpoints=mavlink_endpoints
+                or parse_endpoints(MAVLINK_RADIO_STATUS_ENDPOINTS),
+                verbose=self.verbose,
+            )
+        if self.arbiter is not None:
+            self.arbiter.has_telemetry = True
+        generation = self.arbiter.generation if self.arbiter is not None else 0
+
+        def _poll() -> Tuple[bool, List[str]]:
+            nonlocal generation
+            if self.arbiter is not None and self.arbiter.generation != generation:
+                # A configuration change (e.g. pairing) may have moved the radio
+                generation = self.arbiter.generation
+                self.__dict__.pop("paired_microhard_ip", None)
+                monitor.reconnect()
+            ip = monitor.resolve()
+            if ip is None:
+                return False, []
+            # All status queries in one round trip
+            return self.send_commands(
+                ip_address=ip,
                 ek=MICROHARD_USER,
-                at_commands=at_commands,
+                at_commands=link_telemetry.commands,
+                pipelined=not link_telemetry.is_rssi_only,
             )
-            data = f"{SocketCommandType.RSSI.value} FAILURE {self.monark_id}"
+
+        link_status = None
+        try:
+            # The latest sample for any number of local readers, see link_status.py
+            link_status = LinkStatusWriter()
+        except Exception as e:
+            print(f"Unable to publish link status: {e}")
+        flight_log = None
+        if flight_log_dir:
             try:
-                if is_success:
-                    rssi = responses[0].split(" ")[1].split("OK")[0].strip()
-                    data = f"{SocketCommandType.RSSI.value} {rssi} {self.monark_id}"
-                SocketService.send_data_out(data=data)
+                flight_log = FlightLogWriter(
+                    directory=flight_log_dir, verbose=self.verbose
+                )
+            except Exception as e:
+                print(f"Unable to log flights to {flight_log_dir}: {e}")
+        # Logged once per outage rather than on every sample
+        is_flight_log_failing = False
+
+        while True:
+            if monitor.active_ip is None and monitor.wait_for_radio(
+                deadline=scheduler.next_deadline
+            ):
+                # The radio is back, poll it now rather than at the next tick
+                scheduler.resync()
+            skipped = scheduler.wait()
+            if skipped and self.verbose:
+                print(f"Skipped {skipped} RSSI sample(s)")
+
+            try:
+                if self.arbiter is not None:
+                    # Waits behind any configuration change queued on the arbiter
+                    is_success, responses = self.arbiter.run(_poll, PRIORITY_TELEMETRY)
+                else:
+                    is_success, responses = _poll()
+            except Exception as e:
+                print(f"Unable to poll RSSI: {e}")
+                is_success, responses = False, []
+            monitor.report(is_success)
+            sample: Optional[TelemetrySample] = None
+            try:
+                # On failure responses may hold a connect error rather than replies,
+                # which is published as FAILURE
+                sample = link_telemetry.parse(
+                    self.monark_id, responses if is_success else []
+                )
+                rssi_dbm = sample.rssi_dbm
+                if publisher is not None:
+                    publisher.publish(data=sample.rssi_line())
+                    if not link_telemetry.is_rssi_only:
+                        publisher.publish(data=sample.link_line())
+                history.add(rssi_dbm)
+                # Sets the period until the next sample, which the link status carries
+                scheduler.update(rssi_dbm)
+                if link_status is not None:
+                    link_status.publish(
+                        sequence=history.sequence,
+                        rssi=rssi_dbm,
+                        monark_id=self.monark_id,
+                        active_ip=monitor.active_ip or "",
+                        period=scheduler.period,
+                    )
+                if emitter is not None:
+                    emitter.send(
+                        rssi_dbm=rssi_dbm,
+                        remrssi_dbm=sample.remote_rssi,
+                        noise_dbm=sample.noise,
+                        remnoise_dbm=sample.remote_noise,
+                    )
+                if tx_power_controller is not None:
+                    self._control_tx_power(tx_power_controller, sample, monitor)
             except Exception as e:
                 print(f"Error parsing RSSI: {e}")
-            time.sleep(RSSI_DELAY)
 
-    def pair_monark(
+            if flight_log is not None and sample is not None:
+                # Separate, so a full disk never holds up the telemetry above
+                try:
+                    flight_log.append(
+                        sample, sequence=history.sequence, link_state=monitor.state
+                    )
+                    is_flight_log_failing = False
+                except Exception as e:
+                    if not is_flight_log_failing:
+                        print(f"Unable to log the flight: {e}")
+                    is_flight_log_failing = True
+
+            # This loop never returns, so the trace metrics are flushed as it goes
+            if history.sequence % TRACE_FLUSH_SAMPLES == 0:
+                self.tracer.flush()
+
+    def _control_tx_power(
+        self,
+        controller: TxPowerController,
+        sample: TelemetrySample,
+        monitor: LinkMonitor,
+    ) -> None:
+        power = controller.update(sample)
+        if power is None or monitor.active_ip is None:
+            return
+        # Not saved with AT&W. The operator's power is kept so that any later AT&W
+        # writes it back first (see `with_configured_power`), and a reboot restores it.
+        if (
+            self.state.load().get("configured_tx_power") is None
+            and controller.power is not None
+        ):
+            self.state.save(configured_tx_power=str(controller.power))
+        start = time.monotonic()
+        is_success, _ = self.send_commands(
+            ip_address=monitor.active_ip,
+            ek=MICROHARD_USER,
+            at_commands=[f"AT+MWTXPOWER={power}"],
+            beep=False,
+        )
+        if is_success:
+            controller.applied(power)
+            # So `info --max_age` reports what the radio transmits at
+            self.state.save(tx_power=str(power), active_ip=monitor.active_ip)
+            self.tracer.record(
+                "tx_power",
+                time.monotonic() - start,
+                power=power,
+                level=controller.level,
+            )
+        else:
+            print(f"Unable to set the TX power to {power} dBm")
+
+    def _serve_rssi_stats(
+        self,
+        history: RssiHistory,
+        monitor: LinkMonitor,
+        tx_power_controller: Optional[TxPowerController] = None,
+    ) -> None:
+        """
+        Answers `rssi_stats` queries from local processes on a Unix socket.
+        """
+
+        def _handle(request: Dict[str, Any]) -> Dict[str, Any]:
+            window = request.get("window")
+            stats = history.stats(window=float(window) if window else None)
+            stats["link"] = monitor.to_dict()
+            if tx_power_controller is not None:
+                stats["tx_power"] = {
+                    "power": tx_power_controller.power,
+                    "level": tx_power_controller.level,
+                    "uses_remote_rssi": tx_power_controller.uses_remote,
+                    "changes": tx_power_controller.changes,
+                }
+            return {"is_success": True, "message": stats}
+
+        try:
+            server = ControlServer(socket_path=RSSI_STATS_SOCKET_PATH, handler=_handle)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        except Exception as e:
+            print(f"Unable to serve RSSI stats on {RSSI_STATS_SOCKET_PATH}: {e}")
+
+    def pair_commands(
         self,
         network_id: str,
         ek: str,
         tx_power: int,
         frequency: int,
-    ) -> Tuple[bool, List[str]]:
-        subprocess.run(
-            ["sudo", "systemctl", "stop", "rssi.service"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-
-        at_commands = [
+    ) -> List[str]:
+        """
+        The AT commands which provision the radio as this MONARK's paired slave radio.
+        """
+        return [
             f"AT+MWRADIO=1",  # turn on radio
             f"AT+MWVMODE=1",  # slave mode
             f"AT+MWTXPOWER={tx_power}",
@@ -124,47 +369,201 @@ class MicrohardService:
             f"AT+MSPWD={ek},{ek}",
             f"AT+MNLAN=LAN,EDIT,0,{self.paired_microhard_ip},255.255.0.0,0",  # the target paired IP
             f"AT+MNLANDHCP=LAN,0",  # disable DHCP server
-            "AT&W",  # save and write
         ]
 
-        _ek = MICROHARD_USER if self.is_default_microhard else ek
+    def update_commands(
+        self, network_id: str = "", tx_power: int = 0, frequency: int = 0
+    ) -> List[str]:
+        """
+        The AT commands which set the given (non empty) settings.
+        """
+        at_commands = []
+        if tx_power:
+            at_commands.append(f"AT+MWTXPOWER={tx_power}")
+        if frequency:
+            at_commands.append(f"AT+MWFREQ={frequency}")
+        if network_id:
+            at_commands.append(f"AT+MWNETWORKID={network_id}")
+        return at_commands
 
-        is_success, responses = self.send_commands(
-            ip_address=self.active_microhard_ip,  # send to active microhard IP
-            ek=_ek,
-            at_commands=at_commands,
+    def pair_monark(
+        self,
+        network_id: str,
+        ek: str,
+        tx_power: int,
+        frequency: int,
+        manage_rssi_service: bool = True,
+        beep: bool = True,
+    ) -> Tuple[bool, List[str]]:
+        """
+        manage_rssi_service=False leaves rssi.service alone, e.g. when pairing other
+        MONARKs' radios from a bench. beep=False plays no result beeps.
+        """
+        # An RSSI loop on the same arbiter simply waits for the pairing, only a separate
+        # rssi.service has to be stopped to keep it off the radio
+        stop_rssi_service = manage_rssi_service and (
+            self.arbiter is None or not self.arbiter.has_telemetry
         )
+        if stop_rssi_service:
+            subprocess.run(
+                ["sudo", "systemctl", "stop", "rssi.service"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
 
-        subprocess.run(
-            ["sudo", "systemctl", "start", "rssi.service"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+        try:
+            at_commands = self.pair_commands(
+                network_id=network_id, ek=ek, tx_power=tx_power, frequency=frequency
+            )
+
+            _ek = self.admin_ek(ek)
+
+            # Only the settings which differ are written (followed by AT&W)
+            is_success, responses = self.apply_config(
+                ip_address=self.active_microhard_ip,  # send to active microhard IP
+                ek=_ek,
+                at_commands=at_commands,
+                beep=beep,
+            )
+        finally:
+            # RSSI monitoring comes back even if the pairing failed with an exception
+            if stop_rssi_service:
+                subprocess.run(
+                    ["sudo", "systemctl", "start", "rssi.service"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                )
+
+        # The radio moves to the paired IP, so the current session and probes are no longer valid
+        self.close()
+        self.probe.invalidate()
+        if is_success:
+            self.state.save(active_ip=self.paired_microhard_ip)
+
+        return is_success, responses
+
+    def apply_config(
+        self, ek: str, at_commands: List[str], ip_address: str = "", beep: bool = True
+    ) -> Tuple[bool, List[str]]:
+        """
+        Reads the current settings in one pipelined batch and then writes only the at_commands
+        which would change the radio, followed by AT&W.
+        When the radio already matches nothing is written and there are no beeps.
+        """
+        at_commands = self.with_configured_power(at_commands)
+        planner = ConfigPlanner(verbose=self.verbose)
+        queries = planner.queries(at_commands)
+        current: Dict[str, str] = {}
+        if queries:
+            # Replies to queries the radio rejects are ignored, those settings are just written
+            _, replies = self.send_commands(
+                ip_address=ip_address,
+                ek=ek,
+                at_commands=queries,
+                pipelined=True,
+                beep=False,
+            )
+            current = dict(zip(queries, replies))
+
+        changes = planner.plan(at_commands, current=current, login_password=ek)
+        if not changes:
+            if self.verbose:
+                print("Radio settings are already up to date.")
+            is_success = True
+            responses: List[str] = []
+        else:
+            is_success, responses = self.send_commands(
+                ip_address=ip_address,
+                ek=ek,
+                at_commands=changes + [AT_SAVE_COMMAND],
+                beep=beep,
+            )
+
+        if is_success:
+            self.state.record_commands(
+                at_commands,
+                monark_id=self.monark_id,
+                active_ip=ip_address or self.active_microhard_ip,
+            )
+            # Saved, so the radio holds no temporary TX power any more
+            self.state.save(configured_tx_power=None)
+        else:
+            self.state.invalidate()
 
         return is_success, responses
 
-    def get_info(self, ek: str) -> dict:
+    def with_configured_power(self, at_commands: List[str]) -> List[str]:
+        """
+        at_commands plus the operator's TX power, when the TX power controller (see
+        tx_power_controller.py) left a temporary one on the radio which AT&W would save.
+        """
+        configured = self.state.load().get("configured_tx_power")
+        if configured is None or any(
+            split_command(at_command)[0] == "MWTXPOWER" for at_command in at_commands
+        ):
+            return at_commands
+        restore = f"AT+MWTXPOWER={configured}"
+        if AT_SAVE_COMMAND in at_commands:
+            index = at_commands.index(AT_SAVE_COMMAND)
+            return at_commands[:index] + [restore] + at_commands[index:]
+        return [restore] + at_commands
+
+    def get_info(self, ek: str, max_age: float = 0, ip_address: str = "") -> dict:
         """
         Returns tx_power, frequency, and monark_id in json format.
         If any of the AT commands fail then it will return error.
+        With max_age > 0 the on-disk snapshot is returned instead when it is at most max_age
+        seconds old and the radio is still at the recorded IP.
+        ip_address reads another radio than this MONARK's (e.g. discover), which leaves
+        the snapshot alone.
         """
+        if max_age > 0 and not ip_address:
+            snapshot = self.state.fresh(monark_id=self.monark_id, max_age=max_age)
+            if (
+                snapshot
+                and "tx_power" in snapshot
+                and "frequency" in snapshot
+                and snapshot.get("active_ip") == self.active_microhard_ip
+            ):
+                return {
+                    "tx_power": snapshot["tx_power"],
+                    "frequency": snapshot["frequency"],
+                    "monark_id": self.monark_id,
+                }
+
         at_commands = [
             f"AT+MWTXPOWER",
             f"AT+MWFREQ",
         ]
         is_success, responses = self.send_commands(
-            ip_address=self.active_microhard_ip,
+            ip_address=ip_address or self.active_microhard_ip,
             ek=ek,
             at_commands=at_commands,
+            pipelined=True,
         )
         if not is_success:
             return {}
 
         # format response to json
-        _tx_power = responses[0].split("MWTXPOWER: ")[1].strip()
-        _tx_power = _tx_power.split("dBm")[0].strip()
-        _frequency = responses[1].split("MWFREQ: ")[1].strip()
-        _frequency = _frequency.split("MHz")[0].strip()
+        tx_power = parse_response(responses[0], command=at_commands[0]).number(
+            "MWTXPOWER"
+        )
+        frequency = parse_response(responses[1], command=at_commands[1]).number(
+            "MWFREQ"
+        )
+        if tx_power is None or frequency is None:
+            print(f"Unable to parse radio info: {responses}")
+            return {}
+        # Kept as whole number strings, which is what the GCS and the snapshot expect
+        _tx_power = str(int(tx_power))
+        _frequency = str(int(frequency))
+        if not ip_address:
+            self.state.save(
+                tx_power=_tx_power,
+                frequency=_frequency,
+                monark_id=self.monark_id,
+                active_ip=self.active_microhard_ip,
+            )
         return {
             "tx_power": _tx_power,
             "frequency": _frequency,
@@ -172,85 +571,143 @@ class MicrohardService:
         }
 
     def send_commands(
-        self, ek: str, at_commands: List[str], ip_address: str = ""
+        self,
+        ek: str,
+        at_commands: List[str],
+        ip_address: str = "",
+        pipelined: bool = False,
+        beep: bool = True,
     ) -> Tuple[bool, List[str]]:
         """
         Runs at_commands one by one on the microhard radio at admin@{ip_address} using the given connection info.
+        With pipelined the commands are written back-to-back and cost about one round trip in total;
+        only use it for read-only or order independent commands.
+        beep=False keeps the buzzer quiet for actions which normally beep (e.g. read-backs).
         Returns a tuple of (success, responses) where success is a boolean and responses is a list of strings.
         """
+        if self.arbiter is not None and not self.arbiter.in_worker:
+            return self.arbiter.run(
+                lambda: self.send_commands(
+                    ek=ek,
+                    at_commands=at_commands,
+                    ip_address=ip_address,
+                    pipelined=pipelined,
+                    beep=beep,
+                ),
+                priority_for(self.action),
+            )
+
+        with self.session.lock:
+            return self._send_commands(
+                ek=ek,
+                at_commands=at_commands,
+                ip_address=ip_address,
+                pipelined=pipelined,
+                beep=beep,
+            )
+
+    def _send_commands(
+        self,
+        ek: str,
+        at_commands: List[str],
+        ip_address: str,
+        pipelined: bool,
+        beep: bool,
+    ) -> Tuple[bool, List[str]]:
         try:
             if not ip_address:
                 ip_address = self.active_microhard_ip
 
-            # Connect to the Microhard radio
+            # Connect to the Microhard radio (or reuse the open session)
             try:
-                if os.path.exists("/home/echopilot/.ssh/known_hosts"):
-                    os.remove("/home/echopilot/.ssh/known_hosts")
-                self.client.connect(ip_address, username=MICROHARD_USER, password=ek)
-                if self.verbose:
-                    print(f"Connected to {ip_address}")
+                shell = self.session.get_shell(ip_address=ip_address, ek=ek)
             except Exception as e:
+                self.session.close()
+                self.probe.invalidate(ip_address)
                 if self.verbose:
                     print(f"Unable to Connect to Radio: {e}")
                 return False, [str(e)]
 
-            # Start an interactive shell session
-            shell = self.client.invoke_shell()
-            time.sleep(2)  # Give some time for the shell to open
-
             responses = []
 
             # Send AT commands
             i = 0
             should_continue = True
-            for command in at_commands:
-                if should_continue == False:
-                    break
-                i += 1
-                _status = f"{i}/{len(at_commands)}"
+            with AtCommandEngine(shell=shell, verbose=self.verbose) as engine:
+                if pipelined:
+                    if self.verbose:
+                        print(f"Running {len(at_commands)} commands pipelined")
 
-                if self.verbose:
-                    print(f"Running command {_status}")
-
-                shell.send(command + "\n")
-                time.sleep(0.1)
-
-                # We wait for "OK" to be returned before sending the next command (up to limit)
-                end_time = time.time() + 15
-                response = ""
-                while time.time() < end_time:
-                    if shell.recv_ready():
-                        part = shell.recv(1024).decode()
-                        response += part
-                        # Check if the output contains a prompt or specific end marker
-                        if "\nOK\r" in part:
-                            break
-                        elif "ERROR" in part:
+                    replies = engine.execute_pipelined(at_commands)
+                    for reply in replies:
+                        self.tracer.record(
+                            "at_command",
+                            reply.latency,
+                            reply.outcome,
+                            command=reply.name,
+                            bytes=len(reply.response),
+                            pipelined=True,
+                        )
+                        if reply.is_error:
                             should_continue = False
-                            print(f"Error occurred: {part}")
+                            print(f"Error occurred: {reply.response}")
+                        responses.append(reply.response)
+                    # The last reply may have timed out or the session dropped
+                    if len(replies) < len(at_commands) or (
+                        replies and replies[-1].is_timeout
+                    ):
+                        should_continue = False
+                else:
+                    for command in at_commands:
+                        if should_continue == False:
                             break
-                    else:
-                        time.sleep(0.1)
+                        i += 1
+                        _status = f"{i}/{len(at_commands)}"
 
-                responses.append(response)
+                        if self.verbose:
+                            print(f"Running command {_status}")
 
-            shell.close()
-            self.client.close()
-            if self.verbose:
-                print("Session closed.")
+                        # We wait for "OK" to be returned before sending the next command (up to limit)
+                        reply = engine.execute(command)
+                        self.tracer.record(
+                            "at_command",
+                            reply.latency,
+                            reply.outcome,
+                            command=reply.name,
+                            bytes=len(reply.response),
+                        )
+                        if reply.is_error:
+                            should_continue = False
+                            print(f"Error occurred: {reply.response}")
+                        elif reply.is_timeout:
+                            # No reply, or the radio closed the session
+                            should_continue = False
+                            print(f"No reply to {reply.name}")
 
-            if self.action not in [
+                        responses.append(reply.response)
+
+            if not should_continue and (shell.closed or shell.eof_received):
+                # Reconnect on the next call rather than reuse a dropped session
+                self.session.close()
+
+            if beep and self.action not in [
                 ActionTypes.INFO.value,
                 ActionTypes.IS_FACTORY.value,
                 ActionTypes.RSSI.value,
             ]:
-                if should_continue:
-                    BuzzerService().success_beeps()
-                else:
-                    BuzzerService().three_long_failure_beeps()
+                # The beeps play in the background so the result is returned right away
+                import buzzer_player
+
+                buzzer_player.get_player(verbose=self.verbose).play(
+                    buzzer_player.SUCCESS
+                    if should_continue
+                    else buzzer_player.THREE_LONG_FAILURE
+                )
 
             return should_continue, responses  # should_continue correlates to success
 
         except Exception as e:
+            # The session is in an unknown state so force a reconnect on the next call
+            self.session.close()
             print(f"An error occurred: {e}")
             return False, []
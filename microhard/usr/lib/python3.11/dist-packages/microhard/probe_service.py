@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+from typing import Callable, Dict, List, Optional, Tuple
+from collections import deque
+import errno
+import selectors
+import socket
+import threading
+import time
+from constants import PROBE_CACHE_TTL, PROBE_MAX_PARALLEL, PROBE_TIMEOUT, SSH_PORT
+from tracer import get_tracer
+
+"""
+In-process reachability probing of microhard radio IPs.
+
+Candidate IPs are probed at the same time with non-blocking TCP connects to the radio's
+SSH port (a refused connection still means the host answered). Results are cached for
+`ttl` seconds and can be invalidated explicitly, e.g. after a failed SSH connect.
+"""
+
+# A refused connect means the host is up but the port is closed, which is good enough
+REACHABLE_ERRNOS = (0, errno.ECONNREFUSED)
+
+
+class ReachabilityProbe:
+    def __init__(
+        self,
+        ttl: float = PROBE_CACHE_TTL,
+        timeout: float = PROBE_TIMEOUT,
+        port: int = SSH_PORT,
+        verbose: bool = False,
+    ) -> None:
+        self.ttl = ttl
+        self.timeout = timeout
+        self.port = port
+        self.verbose = verbose
+        self._cache: Dict[str, Tuple[bool, float]] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, ip: Optional[str] = None) -> None:
+        """
+        Forget the cached result for ip, or for every IP when ip is None.
+        """
+        with self._lock:
+            if ip is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(ip, None)
+
+    def cached(self, ip: str) -> Optional[bool]:
+        with self._lock:
+            entry = self._cache.get(ip)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def is_reachable(self, ip: str) -> bool:
+        is_reachable = self.cached(ip)
+        if is_reachable is None:
+            is_reachable = self.probe([ip]).get(ip, False)
+        return is_reachable
+
+    def first_reachable(self, ips: List[str]) -> Optional[str]:
+        """
+        Returns the first of ips, in their order, that answers. The uncached IPs are
+        probed concurrently, but an IP only wins once every IP before it has failed,
+        so the answer never depends on which one happened to answer first.
+        A cached positive answer stops the search without touching the network.
+        """
+        uncached = []
+        found = None
+        for ip in ips:
+            is_reachable = self.cached(ip)
+            if is_reachable:
+                found = ip
+                break
+            if is_reachable is None:
+                uncached.append(ip)
+
+        if not uncached:
+            return found
+
+        results = self.probe(uncached, stop_on_first=True)
+        for ip in uncached:
+            if results.get(ip):
+                return ip
+        return found
+
+    def probe(
+        self,
+        ips: List[str],
+        stop_on_first: bool = False,
+        max_parallel: int = PROBE_MAX_PARALLEL,
+        on_result: Optional[Callable[[str, bool, float], None]] = None,
+    ) -> Dict[str, bool]:
+        """
+        Probes ips concurrently, at most max_parallel connects at a time, and caches the
+        answers. Each IP gets its own timeout from when its connect starts, so with
+        max_parallel >= len(ips) the whole sweep takes about one timeout.
+        With stop_on_first the remaining probes are abandoned once the first of ips
+        (in order) that answers is known.
+        on_result(ip, is_reachable, seconds) is called for each answer as it arrives.
+        """
+        start = time.monotonic()
+        results: Dict[str, bool] = {}
+        queue = deque(ips)
+        selector = selectors.DefaultSelector()
+        # socket -> (ip, connect start)
+        pending: Dict[socket.socket, Tuple[str, float]] = {}
+
+        def _is_first_known() -> bool:
+            for ip in ips:
+                if ip not in results:
+                    return False
+                if results[ip]:
+                    return True
+            return False
+
+        def _result(ip: str, is_reachable: bool, started: float) -> None:
+            results[ip] = is_reachable
+            if on_result is not None:
+                on_result(ip, is_reachable, time.monotonic() - started)
+
+        try:
+            while queue or pending:
+                if stop_on_first and _is_first_known():
+                    break
+
+                while queue and len(pending) < max_parallel:
+                    ip = queue.popleft()
+                    started = time.monotonic()
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    sock.setblocking(False)
+                    err = sock.connect_ex((ip, self.port))
+                    if err in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                        selector.register(sock, selectors.EVENT_WRITE)
+                        pending[sock] = (ip, started)
+                    else:
+                        sock.close()
+                        _result(ip, err in REACHABLE_ERRNOS, started)
+
+                if not pending:
+                    continue
+
+                # The oldest connect is the first to time out
+                remaining = min(s for _, s in pending.values()) + self.timeout
+                remaining -= time.monotonic()
+                if remaining > 0:
+                    for key, _ in selector.select(remaining):
+                        sock = key.fileobj  # type: ignore[assignment]
+                        ip, started = pending.pop(sock)
+                        err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                        selector.unregister(sock)
+                        sock.close()
+                        _result(ip, err in REACHABLE_ERRNOS, started)
+
+                # Anything pending for longer than the timeout did not answer
+                now = time.monotonic()
+                for sock, (ip, started) in list(pending.items()):
+                    if now - started >= self.timeout:
+                        del pending[sock]
+                        selector.unregister(sock)
+                        sock.close()
+                        _result(ip, False, started)
+        finally:
+            for sock in pending:
+                sock.close()
+            selector.close()
+
+        now = time.monotonic()
+        get_tracer().record(
+            "probe", now - start, ips=len(ips), reachable=sum(results.values())
+        )
+        with self._lock:
+            for ip, is_reachable in results.items():
+                self._cache[ip] = (is_reachable, now)
+
+        if self.verbose:
+            print(f"Reachability: {results}")
+        return results
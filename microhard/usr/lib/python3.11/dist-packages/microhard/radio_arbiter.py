@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+from typing import Any, Callable, List, Optional, Tuple
+from concurrent.futures import Future
+import heapq
+import itertools
+import threading
+from constants import ActionTypes
+
+"""
+Single owner of the radio's command channel.
+
+Everything that talks to the radio in one process (GCS actions and the RSSI loop when
+the daemon runs it) is queued here and executed one job at a time on the arbiter's
+thread, highest priority first. A configuration change therefore waits for at most the
+one RSSI poll in flight, RSSI polls queue behind it (the scheduler counts the missed
+ticks) and the next poll runs right after the write, without stopping rssi.service.
+"""
+
+PRIORITY_CONFIG = 0  # pair, update, update_encryption_key
+PRIORITY_QUERY = 1  # info, is_factory
+PRIORITY_TELEMETRY = 2  # RSSI polls
+
+QUERY_ACTIONS = [ActionTypes.INFO.value, ActionTypes.IS_FACTORY.value]
+TELEMETRY_ACTIONS = [ActionTypes.RSSI.value]
+
+
+def priority_for(action: str) -> int:
+    if action in TELEMETRY_ACTIONS:
+        return PRIORITY_TELEMETRY
+    if action in QUERY_ACTIONS:
+        return PRIORITY_QUERY
+    return PRIORITY_CONFIG
+
+
+class RadioArbiter:
+    def __init__(self, verbose: bool = False) -> None:
+        self.verbose = verbose
+        # Bumped after every configuration job, so the RSSI loop knows the radio may
+        # have moved to another IP or password
+        self.generation = 0
+        # Set while an RSSI loop runs on this arbiter (pairing then leaves rssi.service alone)
+        self.has_telemetry = False
+        # (priority, sequence, job, future), equal priorities run in submission order
+        self._queue: List[Tuple[int, int, Callable[[], Any], Future]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def in_worker(self) -> bool:
+        """
+        True on the arbiter's thread, where jobs call the radio directly.
+        """
+        return threading.current_thread() is self._thread
+
+    def submit(self, job: Callable[[], Any], priority: int) -> Future:
+        future: Future = Future()
+        with self._condition:
+            heapq.heappush(self._queue, (priority, next(self._sequence), job, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def run(self, job: Callable[[], Any], priority: int) -> Any:
+        """
+        Runs job on the arbiter and returns its result (or raises its exception).
+        Called from a job it runs the job directly, since the arbiter is already held.
+        """
+        if self.in_worker:
+            return job()
+        return self.submit(job, priority).result()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                priority, _, job, future = heapq.heappop(self._queue)
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(job())
+            except BaseException as e:
+                # The job's caller gets the exception, the arbiter keeps serving
+                future.set_exception(e)
+            finally:
+                if priority == PRIORITY_CONFIG:
+                    self.generation += 1
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+from typing import Any, Dict, List, Optional
+import json
+import os
+import tempfile
+import time
+from constants import RADIO_STATE_FILE_NAME
+from config_planner import split_command
+
+"""
+On-disk snapshot of the radio state this tool last wrote or read.
+
+It lets `info` answer from disk (within a --max_age bound) instead of going to the radio.
+The snapshot is written atomically (temp file + rename) so readers never see a partial
+file, and it is removed whenever a write to the radio fails or the radio shows up at a
+different IP than the one recorded.
+"""
+
+# AT write commands whose value is kept in the snapshot
+SNAPSHOT_KEYS = {
+    "MWTXPOWER": "tx_power",
+    "MWFREQ": "frequency",
+    "MWNETWORKID": "network_id",
+}
+
+
+class RadioState:
+    def __init__(
+        self, path: str = RADIO_STATE_FILE_NAME, verbose: bool = False
+    ) -> None:
+        self.path = path
+        self.verbose = verbose
+
+    def load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, **fields: Any) -> None:
+        """
+        Merges fields into the snapshot and stamps it with the current time.
+        """
+        state = self.load()
+        state.update(fields)
+        state["timestamp"] = time.time()
+
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".radio_state.")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(state, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+        except Exception as e:
+            print(f"Unable to save radio state: {e}")
+
+    def record_commands(
+        self, at_commands: List[str], monark_id: int, active_ip: str
+    ) -> None:
+        """
+        Saves the values set by successful AT write commands.
+        """
+        fields: Dict[str, Any] = {"monark_id": monark_id, "active_ip": active_ip}
+        for at_command in at_commands:
+            key, args = split_command(at_command)
+            if key in SNAPSHOT_KEYS and args:
+                fields[SNAPSHOT_KEYS[key]] = args[0]
+        self.save(**fields)
+
+    def invalidate(self) -> None:
+        try:
+            os.remove(self.path)
+            if self.verbose:
+                print("Radio state snapshot invalidated.")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Unable to invalidate radio state: {e}")
+
+    def fresh(self, monark_id: int, max_age: float) -> Optional[Dict[str, Any]]:
+        """
+        Returns the snapshot if it belongs to monark_id and is at most max_age seconds old.
+        """
+        state = self.load()
+        timestamp = state.get("timestamp")
+        if (
+            not isinstance(timestamp, (int, float))
+            or state.get("monark_id") != monark_id
+        ):
+            return None
+        age = time.time() - timestamp
+        if age < 0 or age > max_age:
+            return None
+        if self.verbose:
+            print(f"Radio state snapshot is {age:.1f}s old.")
+        return state
+
+
+class MemoryRadioState(RadioState):
+    """
+    A snapshot kept in memory only, for radios other than this MONARK's own (e.g. a
+    fleet run), which nothing reads back from disk.
+    """
+
+    def __init__(self, verbose: bool = False) -> None:
+        super().__init__(path="", verbose=verbose)
+        self.state: Dict[str, Any] = {}
+
+    def load(self) -> Dict[str, Any]:
+        return dict(self.state)
+
+    def save(self, **fields: Any) -> None:
+        self.state.update(fields)
+        self.state["timestamp"] = time.time()
+
+    def invalidate(self) -> None:
+        self.state = {}
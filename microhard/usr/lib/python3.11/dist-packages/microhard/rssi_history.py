@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from array import array
+from collections import deque
+import threading
+import time
+from constants import RSSI_EMA_ALPHA, RSSI_HISTORY_SIZE
+
+"""
+In-memory history of RSSI samples with rolling statistics.
+
+Samples live in fixed size arrays used as a ring buffer. Running min/max (monotonic
+queues), mean and EMA over the whole buffer are updated in O(1) per sample; windowed
+statistics and percentiles are computed on demand from the samples in the window.
+"""
+
+PERCENTILES = [10, 50, 90]
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """
+    Linear interpolation between the closest ranks.
+    """
+    position = (len(sorted_values) - 1) * percentile / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return (
+        sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+    )
+
+
+class RssiHistory:
+    def __init__(
+        self, capacity: int = RSSI_HISTORY_SIZE, ema_alpha: float = RSSI_EMA_ALPHA
+    ) -> None:
+        self.capacity = capacity
+        self.ema_alpha = ema_alpha
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.successes = array("b", bytes(capacity))
+        self.sequence = 0  # total number of samples ever added
+        self.ema: Optional[float] = None
+        self._sum = 0.0
+        self._success_count = 0
+        # (sequence, value) with values increasing (min) or decreasing (max)
+        self._min_queue: Deque[Tuple[int, float]] = deque()
+        self._max_queue: Deque[Tuple[int, float]] = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self.sequence, self.capacity)
+
+    def add(self, rssi: Optional[float], timestamp: Optional[float] = None) -> None:
+        """
+        Adds one sample; rssi is None for a failed sample.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._lock:
+            index = self.sequence % self.capacity
+            if self.sequence >= self.capacity and self.successes[index]:
+                # The oldest sample is overwritten
+                self._sum -= self.values[index]
+                self._success_count -= 1
+
+            self.timestamps[index] = timestamp
+            self.successes[index] = rssi is not None
+            self.values[index] = rssi if rssi is not None else 0.0
+
+            oldest = self.sequence - self.capacity
+            for queue in (self._min_queue, self._max_queue):
+                while queue and queue[0][0] <= oldest:
+                    queue.popleft()
+
+            if rssi is not None:
+                self._sum += rssi
+                self._success_count += 1
+                self.ema = (
+                    rssi
+                    if self.ema is None
+                    else self.ema_alpha * rssi + (1.0 - self.ema_alpha) * self.ema
+                )
+                while self._min_queue and self._min_queue[-1][1] >= rssi:
+                    self._min_queue.pop()
+                self._min_queue.append((self.sequence, rssi))
+                while self._max_queue and self._max_queue[-1][1] <= rssi:
+                    self._max_queue.pop()
+                self._max_queue.append((self.sequence, rssi))
+
+            self.sequence += 1
+
+    def stats(self, window: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Statistics over the whole buffer, or over the last `window` seconds when given.
+        """
+        with self._lock:
+            if window is None:
+                return self._buffer_stats()
+            return self._window_stats(window)
+
+    def _buffer_stats(self) -> Dict[str, Any]:
+        count = len(self)
+        return {
+            "samples": count,
+            "successes": self._success_count,
+            "success_rate": self._success_count / count if count else None,
+            "min": self._min_queue[0][1] if self._min_queue else None,
+            "max": self._max_queue[0][1] if self._max_queue else None,
+            "mean": self._sum / self._success_count if self._success_count else None,
+            "ema": self.ema,
+            "last": self._last(),
+        }
+
+    def _window_stats(self, window: float) -> Dict[str, Any]:
+        count = len(self)
+        if not count:
+            return self._buffer_stats()
+
+        newest = self.timestamps[(self.sequence - 1) % self.capacity]
+        values = []
+        samples = 0
+        # Walk backwards from the newest sample until the window is left
+        for offset in range(1, count + 1):
+            index = (self.sequence - offset) % self.capacity
+            if newest - self.timestamps[index] > window:
+                break
+            samples += 1
+            if self.successes[index]:
+                values.append(self.values[index])
+
+        stats: Dict[str, Any] = {
+            "window": window,
+            "samples": samples,
+            "successes": len(values),
+            "success_rate": len(values) / samples if samples else None,
+            "min": min(values) if values else None,
+            "max": max(values) if values else None,
+            "mean": sum(values) / len(values) if values else None,
+            "ema": self.ema,
+            "last": self._last(),
+        }
+        values.sort()
+        for percentile in PERCENTILES:
+            stats[f"p{percentile}"] = (
+                _percentile(values, percentile) if values else None
+            )
+        return stats
+
+    def _last(self) -> Optional[Dict[str, Any]]:
+        if not self.sequence:
+            return None
+        index = (self.sequence - 1) % self.capacity
+        return {
+            "timestamp": self.timestamps[index],
+            "rssi": self.values[index] if self.successes[index] else None,
+        }
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+from typing import Optional
+import time
+from constants import (
+    RSSI_ADAPTIVE_DROP_DB,
+    RSSI_ADAPTIVE_HOLD_SAMPLES,
+    RSSI_ADAPTIVE_THRESHOLD_DBM,
+    RSSI_DELAY,
+    RSSI_FAST_DELAY,
+)
+
+"""
+Drift-free sampling schedule for the RSSI loop.
+
+Ticks are placed on monotonic deadlines (start + n * period) rather than sleeping a fixed
+delay after each sample, so a slow sample does not push every later sample back. Ticks
+that were missed entirely are skipped instead of being run back-to-back.
+"""
+
+
+class RssiScheduler:
+    def __init__(
+        self,
+        period: float = RSSI_DELAY,
+        adaptive: bool = False,
+        fast_period: float = RSSI_FAST_DELAY,
+        threshold_dbm: float = RSSI_ADAPTIVE_THRESHOLD_DBM,
+        drop_db: float = RSSI_ADAPTIVE_DROP_DB,
+        hold_samples: int = RSSI_ADAPTIVE_HOLD_SAMPLES,
+    ) -> None:
+        """
+        With adaptive set, the scheduler switches to fast_period while RSSI is below
+        threshold_dbm or has fallen by at least drop_db since the previous sample, and goes
+        back to period after hold_samples calm samples in a row.
+        """
+        self.base_period = period
+        self.fast_period = min(fast_period, period)
+        self.adaptive = adaptive
+        self.threshold_dbm = threshold_dbm
+        self.drop_db = drop_db
+        self.hold_samples = hold_samples
+        self.period = period
+        self.skipped_ticks = 0
+        self._last_rssi: Optional[float] = None
+        self._calm_samples = 0
+        self._last_tick = time.monotonic()
+        self._next_deadline = self._last_tick
+
+    def wait(self) -> int:
+        """
+        Sleeps until the next tick and returns how many ticks were skipped to get there.
+        The first call returns immediately.
+        """
+        now = time.monotonic()
+        skipped = 0
+        if now > self._next_deadline + self.period:
+            # The previous sample overran one or more whole ticks, skip them
+            skipped = int((now - self._next_deadline) // self.period)
+            self._next_deadline += skipped * self.period
+            self.skipped_ticks += skipped
+
+        delay = self._next_deadline - now
+        if delay > 0:
+            time.sleep(delay)
+
+        self._last_tick = self._next_deadline
+        self._next_deadline += self.period
+        return skipped
+
+    @property
+    def next_deadline(self) -> float:
+        return self._next_deadline
+
+    def resync(self) -> None:
+        """
+        Makes the next wait return right away, e.g. once the radio answers again.
+        """
+        self._next_deadline = time.monotonic()
+
+    def update(self, rssi: Optional[float]) -> None:
+        """
+        Feeds the latest RSSI sample (None on failure) to the adaptive rate control.
+        """
+        if not self.adaptive or rssi is None:
+            return
+
+        is_falling = (
+            self._last_rssi is not None and self._last_rssi - rssi >= self.drop_db
+        )
+        self._last_rssi = rssi
+
+        if is_falling or rssi <= self.threshold_dbm:
+            self._calm_samples = 0
+            self._set_period(self.fast_period)
+        else:
+            self._calm_samples += 1
+            if self._calm_samples >= self.hold_samples:
+                self._set_period(self.base_period)
+
+    def _set_period(self, period: float) -> None:
+        if period == self.period:
+            return
+        self.period = period
+        # Re-anchor so the new rate applies from the next sample
+        self._next_deadline = max(self._last_tick, time.monotonic()) + period
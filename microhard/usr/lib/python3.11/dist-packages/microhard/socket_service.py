@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 
+from typing import Deque, List, Optional
+from collections import deque
 from constants import (
+    RSSI_BATCH_SIZE,
+    RSSI_QUEUE_SIZE,
+    RSSI_RECONNECT_MAX_DELAY,
+    RSSI_RECONNECT_MIN_DELAY,
     RSSI_SOCKET_HOST,
     RSSI_SOCKET_PORT,
+    RSSI_SOCKET_TIMEOUT,
 )
 import socket
+import threading
 
 """
 This service sends RSSI data over a socket connection to the mavproxy app.
@@ -18,6 +26,7 @@ class SocketService:
         Used to send data out over another host:port client socket connection.
         """
         is_success = False
+        client_socket = None
 
         try:
             print(f"Attempting to send data: {data}")
@@ -29,6 +38,128 @@ class SocketService:
         except Exception as e:
             print(f"{RSSI_SOCKET_HOST}:{RSSI_SOCKET_PORT} {e}")
         finally:
-            client_socket.close()
+            if client_socket is not None:
+                client_socket.close()
 
         return is_success
+
+
+class SocketPublisher:
+    """
+    Keeps one long-lived connection to host:port and sends newline terminated samples.
+
+    `publish` never blocks: samples go into a bounded queue which drops the oldest sample
+    when full, and a background thread flushes the queue in batches, reconnecting with
+    exponential backoff while the consumer is down.
+
+    With legacy=True each sample is sent unterminated on a connection of its own, as
+    `SocketService.send_data_out` did, for consumers which read one sample per connection.
+    """
+
+    def __init__(
+        self,
+        host: str = RSSI_SOCKET_HOST,
+        port: int = RSSI_SOCKET_PORT,
+        max_queue: int = RSSI_QUEUE_SIZE,
+        legacy: bool = False,
+        verbose: bool = False,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.legacy = legacy
+        self.verbose = verbose
+        self.queue: Deque[bytes] = deque(maxlen=max_queue)
+        self.condition = threading.Condition()
+        self.is_running = True
+        # Only set by close, so new samples don't cut a reconnect backoff short
+        self.stopped = threading.Event()
+        self.client_socket: Optional[socket.socket] = None
+        self.reconnect_delay = RSSI_RECONNECT_MIN_DELAY
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def publish(self, data: str) -> None:
+        if self.verbose:
+            print(f"Publishing data: {data}")
+        with self.condition:
+            self.queue.append(data.strip().encode() + (b"" if self.legacy else b"\n"))
+            self.condition.notify()
+
+    def close(self) -> None:
+        with self.condition:
+            self.is_running = False
+            self.condition.notify()
+        self.stopped.set()
+        self.thread.join(timeout=RSSI_SOCKET_TIMEOUT)
+        self._disconnect()
+
+    def _take_batch(self) -> List[bytes]:
+        with self.condition:
+            while self.is_running and not self.queue:
+                self.condition.wait()
+            return [
+                self.queue.popleft()
+                for _ in range(min(RSSI_BATCH_SIZE, len(self.queue)))
+            ]
+
+    def _requeue(self, batch: List[bytes]) -> None:
+        """
+        Puts an unsent batch back in front of newer samples, still dropping the oldest.
+        """
+        with self.condition:
+            samples = batch + list(self.queue)
+            self.queue.clear()
+            self.queue.extend(samples[-(self.queue.maxlen or len(samples)) :])
+
+    def _connect(self) -> socket.socket:
+        if self.client_socket is None:
+            client_socket = socket.create_connection(
+                (self.host, self.port), timeout=RSSI_SOCKET_TIMEOUT
+            )
+            if self.verbose:
+                print(f"Connected to {self.host}:{self.port}")
+            self.client_socket = client_socket
+        return self.client_socket
+
+    def _disconnect(self) -> None:
+        if self.client_socket is not None:
+            try:
+                self.client_socket.close()
+            except Exception:
+                pass
+        self.client_socket = None
+
+    def _send_each(self, batch: List[bytes]) -> None:
+        """
+        The legacy delivery: every sample on a new connection, closed after sending.
+        """
+        while batch:
+            with socket.create_connection(
+                (self.host, self.port), timeout=RSSI_SOCKET_TIMEOUT
+            ) as client_socket:
+                client_socket.sendall(batch[0])
+            batch.pop(0)
+
+    def _backoff(self) -> None:
+        self.stopped.wait(self.reconnect_delay)
+        self.reconnect_delay = min(2 * self.reconnect_delay, RSSI_RECONNECT_MAX_DELAY)
+
+    def _run(self) -> None:
+        while self.is_running:
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                if self.legacy:
+                    # Samples already sent are dropped from batch, so only the rest
+                    # are requeued on a failure
+                    self._send_each(batch)
+                else:
+                    self._connect().sendall(b"".join(batch))
+                self.reconnect_delay = RSSI_RECONNECT_MIN_DELAY
+            except Exception as e:
+                if self.verbose:
+                    print(f"{self.host}:{self.port} {e}")
+                self._disconnect()
+                self._requeue(batch)
+                self._backoff()
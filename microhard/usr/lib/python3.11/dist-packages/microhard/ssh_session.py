@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+from typing import TYPE_CHECKING, Optional
+import os
+import socket
+import threading
+import time
+from constants import (
+    KNOWN_HOSTS_FILE_NAME,
+    MICROHARD_USER,
+    SSH_CONNECT_TIMEOUT,
+    SSH_KEEPALIVE_INTERVAL,
+    SSH_PORT,
+    SSH_SHELL_OPEN_TIMEOUT,
+    MICROHARD_PROMPT,
+)
+from at_engine import AtCommandEngine
+from tracer import get_tracer
+
+if TYPE_CHECKING:
+    import paramiko
+
+"""
+A long-lived SSH session to the microhard radio.
+
+The transport and the interactive shell are kept open between calls so that
+only the first call (or the first call after the radio drops) pays for the
+key exchange, authentication and shell start up. paramiko itself is only imported
+on the first connect, so actions that never reach the radio don't pay for it.
+"""
+
+
+class SshSession:
+    def __init__(self, verbose: bool = False, port: int = SSH_PORT) -> None:
+        self.verbose = verbose
+        self.port = port
+        # Serializes use of the shell when the session is shared between requests
+        self.lock = threading.RLock()
+        self.client: Optional["paramiko.SSHClient"] = None
+        self.shell: Optional["paramiko.Channel"] = None
+        self.ip_address = ""
+        self.ek = ""
+        self.is_cancelled = False
+
+    @property
+    def is_alive(self) -> bool:
+        """
+        Return True if the transport and the shell are both still usable.
+        A keepalive style ignore message is sent so a half open TCP connection is detected.
+        """
+        if self.client is None or self.shell is None:
+            return False
+
+        transport = self.client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        if self.shell.closed or self.shell.exit_status_ready():
+            return False
+
+        try:
+            transport.send_ignore()
+        except Exception:
+            return False
+        return True
+
+    def get_shell(self, ip_address: str, ek: str) -> "paramiko.Channel":
+        """
+        Returns the open shell for admin@{ip_address}, reconnecting only when required.
+        """
+        if self.is_cancelled:
+            raise Exception("SSH session cancelled")
+        if ip_address != self.ip_address or ek != self.ek or not self.is_alive:
+            self.close()
+            self._connect(ip_address=ip_address, ek=ek)
+
+        assert self.shell is not None
+        self.drain()
+        return self.shell
+
+    def drain(self) -> bytes:
+        """
+        Discard anything left in the shell (prompts, banners, late replies) so the next
+        command only sees its own reply.
+        """
+        drained = b""
+        if self.shell is None:
+            return drained
+        while self.shell.recv_ready():
+            drained += self.shell.recv(1024)
+        return drained
+
+    def _connect(self, ip_address: str, ek: str) -> None:
+        if os.path.exists(KNOWN_HOSTS_FILE_NAME):
+            os.remove(KNOWN_HOSTS_FILE_NAME)
+
+        import paramiko
+
+        tracer = get_tracer()
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        with tracer.span("connect", ip=ip_address):
+            client.connect(
+                ip_address,
+                port=self.port,
+                username=MICROHARD_USER,
+                password=ek,
+                timeout=SSH_CONNECT_TIMEOUT,
+            )
+        transport = client.get_transport()
+        if transport is not None:
+            transport.set_keepalive(SSH_KEEPALIVE_INTERVAL)
+            # Commands are tiny writes, don't let Nagle hold them back waiting for ACKs
+            transport.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        if self.verbose:
+            print(f"Connected to {ip_address}")
+
+        # Start an interactive shell session
+        with tracer.span("shell") as span:
+            shell = client.invoke_shell()
+            # Wait for the CLI prompt instead of a fixed delay for the shell to open
+            with AtCommandEngine(shell=shell, verbose=self.verbose) as engine:
+                _, terminator = engine.expect(
+                    terminators=[MICROHARD_PROMPT],
+                    deadline=time.monotonic() + SSH_SHELL_OPEN_TIMEOUT,
+                )
+            if terminator is None:
+                span.outcome = "timeout"
+
+        self.client = client
+        self.shell = shell
+        self.ip_address = ip_address
+        self.ek = ek
+        self.drain()
+
+    def cancel(self) -> None:
+        """
+        Closes the session for good, e.g. to stop a worker thread which timed out.
+        Called from another thread, so the lock is not taken.
+        """
+        self.is_cancelled = True
+        self.close()
+
+    def close(self) -> None:
+        if self.shell is not None:
+            try:
+                self.shell.close()
+            except Exception:
+                pass
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+            if self.verbose:
+                print("Session closed.")
+
+        self.client = None
+        self.shell = None
+        self.ip_address = ""
+        self.ek = ""
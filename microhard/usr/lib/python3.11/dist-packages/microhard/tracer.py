@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+from typing import Any, Dict, List, Optional
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from constants import (
+    TRACE_BUCKETS,
+    TRACE_ENV,
+    TRACE_FILE_NAME,
+    TRACE_MAX_BYTES,
+    TRACE_METRICS_FILE_NAME,
+)
+
+"""
+Per-phase timing of the microhard service.
+
+Each phase (probe, connect, shell, every AT command, the whole action) is timed with
+the monotonic clock and written as one JSON line to TRACE_FILE_NAME. The same timings
+are added to cumulative counters and duration histograms, which are kept across runs
+in a JSON file next to TRACE_METRICS_FILE_NAME and rendered to it in the Prometheus
+text format (e.g. for the node_exporter textfile collector).
+
+Tracing is off unless MICROHARD_TRACE=1 or --trace is given; a disabled tracer only
+costs a clock read per phase.
+"""
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    """
+    {"phase": "connect"} -> 'phase="connect"'
+    """
+    return ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+
+
+class Span:
+    """
+    Times one phase; fields set on the span while it is open are recorded with it.
+    An exception leaving the span marks it as an error.
+    """
+
+    def __init__(self, tracer: "Tracer", phase: str, fields: Dict[str, Any]) -> None:
+        self.tracer = tracer
+        self.phase = phase
+        self.fields = fields
+        self.outcome = "ok"
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.outcome = "error"
+            self.fields.setdefault("error", str(exc_value))
+        self.tracer.record(
+            self.phase, time.monotonic() - self.start, self.outcome, **self.fields
+        )
+
+
+class Tracer:
+    def __init__(
+        self,
+        enabled: bool = False,
+        trace_path: str = TRACE_FILE_NAME,
+        metrics_path: str = TRACE_METRICS_FILE_NAME,
+        verbose: bool = False,
+    ) -> None:
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.verbose = verbose
+        # Lines of one run share an id, so they can be grouped per invocation
+        self.trace_id = os.urandom(6).hex()
+        self._lock = threading.Lock()
+        self._trace_file: Optional[Any] = None
+        # Not yet flushed to the metrics file: labels -> [bucket counts..., sum, count]
+        self._histograms: Dict[str, List[float]] = {}
+        # labels -> value
+        self._counters: Dict[str, Dict[str, float]] = {}
+
+    def span(self, phase: str, **fields: Any) -> Span:
+        return Span(self, phase, fields)
+
+    def record(
+        self, phase: str, seconds: float, outcome: str = "ok", **fields: Any
+    ) -> None:
+        """
+        Records one timed phase. An AT command passes command= (its query form, never
+        the value which may be a password) and bytes= (size of the reply).
+        """
+        if not self.enabled:
+            return
+
+        line = {
+            "trace": self.trace_id,
+            "pid": os.getpid(),
+            "time": time.time(),
+            "phase": phase,
+            "ms": round(1000 * seconds, 3),
+            "outcome": outcome,
+        }
+        line.update(fields)
+        if self.verbose:
+            print(f"Trace {phase}: {line['ms']} ms {outcome}")
+
+        labels = {"phase": phase}
+        if "command" in fields:
+            labels["command"] = fields["command"]
+        with self._lock:
+            self._write_line(json.dumps(line))
+
+            histogram = self._histograms.setdefault(
+                _labels(labels), [0.0] * (len(TRACE_BUCKETS) + 2)
+            )
+            for i, bound in enumerate(TRACE_BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+            self._count("phase_outcomes_total", _labels({**labels, "outcome": outcome}))
+            if "bytes" in fields:
+                self._count(
+                    "at_response_bytes_total",
+                    _labels({"command": fields.get("command", "")}),
+                    fields["bytes"],
+                )
+
+    def _count(self, name: str, labels: str, value: float = 1) -> None:
+        counter = self._counters.setdefault(name, {})
+        counter[labels] = counter.get(labels, 0) + value
+
+    def _write_line(self, line: str) -> None:
+        try:
+            if self._trace_file is None:
+                self._trace_file = open(self.trace_path, "a")
+            elif self._trace_file.tell() > TRACE_MAX_BYTES:
+                # Keep one previous file, the RSSI loop would otherwise grow it forever
+                self._trace_file.close()
+                os.replace(self.trace_path, self.trace_path + ".1")
+                self._trace_file = open(self.trace_path, "a")
+            self._trace_file.write(line + "\n")
+            self._trace_file.flush()
+        except Exception as e:
+            print(f"Unable to write trace: {e}")
+
+    def flush(self) -> None:
+        """
+        Adds the timings recorded since the last flush to the cumulative metrics file.
+        Runs may overlap (the CLI, the daemon, the RSSI service), so the update is done
+        under a file lock.
+        """
+        with self._lock:
+            if not self.enabled or not (self._histograms or self._counters):
+                return
+            histograms, self._histograms = self._histograms, {}
+            counters, self._counters = self._counters, {}
+
+        state_path = self.metrics_path + ".json"
+        try:
+            with open(state_path + ".lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                state = self._load(state_path)
+                for labels, values in histograms.items():
+                    total = state["histograms"].setdefault(labels, [0.0] * len(values))
+                    if len(total) != len(values):
+                        # The buckets changed, start this series over
+                        total[:] = [0.0] * len(values)
+                    for i, value in enumerate(values):
+                        total[i] += value
+                for name, series in counters.items():
+                    total = state["counters"].setdefault(name, {})
+                    for labels, value in series.items():
+                        total[labels] = total.get(labels, 0) + value
+
+                self._replace(state_path, json.dumps(state))
+                self._replace(self.metrics_path, self._render(state))
+        except Exception as e:
+            print(f"Unable to save metrics: {e}")
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+
+    def _load(self, path: str) -> Dict[str, Any]:
+        try:
+            with open(path, "r") as f:
+                state = json.load(f)
+            if isinstance(state, dict):
+                state.setdefault("histograms", {})
+                state.setdefault("counters", {})
+                return state
+        except (OSError, ValueError):
+            pass
+        return {"histograms": {}, "counters": {}}
+
+    def _replace(self, path: str, content: str) -> None:
+        directory = os.path.dirname(path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".microhard_metrics.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def _render(self, state: Dict[str, Any]) -> str:
+        name = "microhard_phase_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent per phase of the microhard service.",
+            f"# TYPE {name} histogram",
+        ]
+        for labels, values in sorted(state["histograms"].items()):
+            for bound, count in zip(TRACE_BUCKETS, values):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count:g}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {values[-1]:g}')
+            lines.append(f"{name}_sum{{{labels}}} {values[-2]:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {values[-1]:g}")
+
+        descriptions = {
+            "phase_outcomes_total": "Phases by outcome (ok, error, timeout).",
+            "at_response_bytes_total": "Bytes received in AT command replies.",
+        }
+        for counter, series in sorted(state["counters"].items()):
+            name = f"microhard_{counter}"
+            lines.append(f"# HELP {name} {descriptions.get(counter, counter)}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{{{labels}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """
+    The process wide tracer, enabled by MICROHARD_TRACE=1 (see `enable`).
+    """
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(enabled=os.environ.get(TRACE_ENV) == "1")
+        return _tracer
+
+
+def enable(verbose: bool = False) -> Tracer:
+    tracer = get_tracer()
+    tracer.enabled = True
+    tracer.verbose = verbose
+    return tracer
+
+
+def _reset_after_fork() -> None:
+    # A forked child gets its own trace id and pending metrics
+    global _tracer, _tracer_lock
+    if _tracer is not None:
+        _tracer = Tracer(
+            enabled=_tracer.enabled,
+            trace_path=_tracer.trace_path,
+            metrics_path=_tracer.metrics_path,
+            verbose=_tracer.verbose,
+        )
+    _tracer_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+from typing import Optional
+import time
+from constants import (
+    RSSI_EMA_ALPHA,
+    TX_POWER_CONTROL_MAX_DBM,
+    TX_POWER_CONTROL_MIN_DBM,
+    TX_POWER_HYSTERESIS_DB,
+    TX_POWER_LOSS_SAMPLES,
+    TX_POWER_MIN_INTERVAL,
+    TX_POWER_STEP_DB,
+    TX_POWER_TARGET_RSSI,
+)
+from link_telemetry import TelemetrySample
+
+"""
+Closed-loop TX power control for the RSSI service.
+
+The received level is smoothed with an EMA and compared with the target RSSI: more than
+`hysteresis_db` above it the TX power is stepped down, more than `hysteresis_db` below
+it stepped up, by at most `step_db` and no more often than every `min_interval` seconds,
+always within [min_dbm, max_dbm]. When no level is received for `loss_samples` samples
+in a row the power goes straight to max_dbm to hold on to the link.
+
+The remote RSSI (how well the other radio hears us) is the level used when the radio
+reports it, the local RSSI (an estimate of the same path loss) otherwise.
+Changes are applied with AT+MWTXPOWER alone, without AT&W, so the flash is not written
+on every step. The operator's power is kept in the radio state as configured_tx_power,
+and every path which saves with AT&W (pair, update, survey --apply, a new encryption
+key) writes it back first, so the configured power is what is saved and what the radio
+comes back with after a reboot.
+"""
+
+
+class TxPowerController:
+    def __init__(
+        self,
+        min_dbm: int = TX_POWER_CONTROL_MIN_DBM,
+        max_dbm: int = TX_POWER_CONTROL_MAX_DBM,
+        target_dbm: float = TX_POWER_TARGET_RSSI,
+        hysteresis_db: float = TX_POWER_HYSTERESIS_DB,
+        step_db: int = TX_POWER_STEP_DB,
+        min_interval: float = TX_POWER_MIN_INTERVAL,
+        loss_samples: int = TX_POWER_LOSS_SAMPLES,
+        alpha: float = RSSI_EMA_ALPHA,
+        verbose: bool = False,
+    ) -> None:
+        if min_dbm > max_dbm:
+            raise ValueError(f"TX power bounds are reversed: {min_dbm} > {max_dbm}")
+        self.min_dbm = min_dbm
+        self.max_dbm = max_dbm
+        self.target_dbm = target_dbm
+        self.hysteresis_db = hysteresis_db
+        self.step_db = step_db
+        self.min_interval = min_interval
+        self.loss_samples = loss_samples
+        self.alpha = alpha
+        self.verbose = verbose
+        self.power: Optional[int] = None  # as last read from or written to the radio
+        self.level: Optional[float] = None  # smoothed received level
+        self.uses_remote = False
+        self.changes = 0
+        self._lost_samples = 0
+        self._last_change = float("-inf")
+
+    def update(
+        self, sample: TelemetrySample, now: Optional[float] = None
+    ) -> Optional[int]:
+        """
+        Feeds one telemetry sample (with the radio's current power in extra["tx_power"])
+        and returns the TX power to apply, or None to leave it.
+        """
+        now = time.monotonic() if now is None else now
+        power = sample.extra.get("tx_power")
+        if power is not None:
+            # Follows changes made by someone else too (e.g. an update from the GCS)
+            self.power = int(round(power))
+
+        uses_remote = sample.remote_rssi is not None
+        level = sample.remote_rssi if uses_remote else sample.rssi
+        if level is None:
+            self._lost_samples += 1
+            if self._lost_samples >= self.loss_samples:
+                self.level = None
+                return self._change(self.max_dbm, now, reason="link lost")
+            return None
+
+        self._lost_samples = 0
+        if self.level is None or uses_remote != self.uses_remote:
+            self.level = level
+        else:
+            self.level = self.alpha * level + (1 - self.alpha) * self.level
+        self.uses_remote = uses_remote
+
+        error = self.level - self.target_dbm
+        if abs(error) <= self.hysteresis_db:
+            return None
+        step = min(self.step_db, int(abs(error) - self.hysteresis_db) + 1)
+        if self.power is None:
+            return None
+        target = self.power - step if error > 0 else self.power + step
+        return self._change(target, now, reason=f"level {self.level:.1f} dBm")
+
+    def _change(self, power: int, now: float, reason: str) -> Optional[int]:
+        power = max(self.min_dbm, min(self.max_dbm, power))
+        if power == self.power or now - self._last_change < self.min_interval:
+            return None
+        if self.verbose:
+            print(f"TX power {self.power} -> {power} dBm ({reason})")
+        return power
+
+    def applied(self, power: int, now: Optional[float] = None) -> None:
+        """
+        Records that the radio now transmits at power.
+        """
+        if self.uses_remote and self.level is not None and self.power is not None:
+            # The other radio hears the change right away, don't wait for the EMA
+            self.level += power - self.power
+        self.power = power
+        self.changes += 1
+        self._last_change = time.monotonic() if now is None else now
@@ -1,7 +1,13 @@
 #!/usr/bin/env python3
 from typing import Any, List, Optional
 
-from constants import ActionTypes
+from constants import (
+    TX_POWER_CONTROL_MAX_DBM,
+    ActionTypes,
+    RssiOutputTypes,
+    RssiSocketModes,
+)
+from link_telemetry import parse_metrics
 import os
 
 
@@ -24,6 +30,35 @@ class Validator:
         self.validate_action(str(self.args.action))
         self.validate_monark_id(int(self.args.monark_id))
 
+        if self.args.action == ActionTypes.RSSI.value or (
+            self.args.action == ActionTypes.DAEMON.value and self.args.daemon_rssi
+        ):
+            self.validate_rssi_output(str(self.args.rssi_output))
+            self.validate_rssi_socket_mode(str(self.args.rssi_socket_mode))
+            self.validate_endpoints(str(self.args.mavlink_endpoints))
+            self.validate_rssi_period(float(self.args.rssi_period))
+            self.validate_telemetry(str(self.args.telemetry))
+            if self.args.tx_power_control:
+                self.validate_tx_power_bounds(
+                    int(self.args.tx_power_min), int(self.args.tx_power_max)
+                )
+
+        if self.args.action == ActionTypes.FLEET.value:
+            if not os.path.isfile(str(self.args.manifest)):
+                raise ValueError(f"Manifest not found: {self.args.manifest}")
+            if self.args.concurrency < 1:
+                raise ValueError("concurrency must be at least 1")
+            if self.args.radio_timeout <= 0:
+                raise ValueError("radio_timeout must be greater than 0")
+
+        if self.args.action == ActionTypes.SURVEY.value:
+            self.validate_frequencies(str(self.args.frequencies))
+            if self.args.dwell < 0:
+                raise ValueError("dwell must not be negative")
+
+        if self.args.max_age < 0:
+            raise ValueError("max_age must not be negative")
+
         if self.args.action == ActionTypes.PAIR.value:
             return self.all_fields_truthy(
                 ["network_id", "tx_power", "frequency", "monark_id"]
@@ -43,6 +78,50 @@ class Validator:
             raise ValueError(f"{action} not in {supported_actions}")
         return True
 
+    def validate_rssi_output(self, rssi_output: str) -> bool:
+        supported_outputs = [o.value for o in RssiOutputTypes.__members__.values()]
+        if not rssi_output in supported_outputs:
+            raise ValueError(f"{rssi_output} not in {supported_outputs}")
+        return True
+
+    def validate_rssi_socket_mode(self, rssi_socket_mode: str) -> bool:
+        supported_modes = [m.value for m in RssiSocketModes.__members__.values()]
+        if not rssi_socket_mode in supported_modes:
+            raise ValueError(f"{rssi_socket_mode} not in {supported_modes}")
+        return True
+
+    def validate_endpoints(self, endpoints: str) -> bool:
+        for endpoint in [e.strip() for e in endpoints.split(",") if e.strip()]:
+            host, _, port = endpoint.rpartition(":")
+            if not host or not port.isdigit() or not 0 < int(port) < 65536:
+                raise ValueError(f"Invalid endpoint {endpoint}, expected host:port")
+        return True
+
+    def validate_rssi_period(self, rssi_period: float) -> bool:
+        if rssi_period > 0:
+            return True
+        raise ValueError(f"RSSI period must be greater than 0")
+
+    def validate_telemetry(self, telemetry: str) -> bool:
+        # Raises ValueError for an unknown or malformed metric
+        parse_metrics(telemetry)
+        return True
+
+    def validate_frequencies(self, frequencies: str) -> bool:
+        candidates = [f.strip() for f in frequencies.split(",") if f.strip()]
+        if not candidates or not all(f.isdigit() for f in candidates):
+            raise ValueError(
+                f"Expected comma separated frequencies in MHz, got {frequencies!r}"
+            )
+        return True
+
+    def validate_tx_power_bounds(self, tx_power_min: int, tx_power_max: int) -> bool:
+        if 0 <= tx_power_min <= tx_power_max <= TX_POWER_CONTROL_MAX_DBM:
+            return True
+        raise ValueError(
+            f"TX power bounds must satisfy 0 <= min <= max <= {TX_POWER_CONTROL_MAX_DBM}"
+        )
+
     def validate_monark_id(self, monark_id: int) -> bool:
         if monark_id >= 0 and monark_id <= 255:
             return True
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+"""
+End-to-end latency benchmark for the microhard service against the simulated radio.
+
+Starts `simulated_radio.SimulatedRadio` in-process (or uses --port of a running one) and
+reports p50/p99 latency per action plus the duration and rate of RSSI loop iterations:
+
+    python3 tools/benchmark.py --iterations 50 --latency 0.005 --chunk_size 16
+"""
+
+from typing import Any, Callable, Dict, List
+import argparse
+import functools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+TOOLS_PATH = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_PATH = os.path.join(
+    TOOLS_PATH,
+    "..",
+    "microhard",
+    "usr",
+    "lib",
+    "python3.11",
+    "dist-packages",
+    "microhard",
+)
+sys.path.insert(0, TOOLS_PATH)
+sys.path.insert(0, PACKAGE_PATH)
+
+from constants import MICROHARD_USER, ActionTypes, RssiOutputTypes, SocketCommandType
+from link_status import LinkStatusWriter
+from microhard_service import MicrohardService
+import microhard_service
+from probe_service import ReachabilityProbe
+from radio_state import RadioState
+from simulated_radio import RadioConfig, SimulatedRadio
+from ssh_session import SshSession
+
+# Short enough that the RSSI loop never sleeps, so each iteration is poll to publish
+BENCHMARK_RSSI_PERIOD = 0.0001
+
+
+class LocalMicrohardService(MicrohardService):
+    """
+    MicrohardService pointed at the simulated radio instead of the radio's real IPs.
+    """
+
+    def __init__(self, host: str, port: int, **kwargs: Any) -> None:
+        super().__init__(
+            session=SshSession(port=port),
+            probe=ReachabilityProbe(port=port),
+            **kwargs,
+        )
+        self.host = host
+        self.state = RadioState(
+            path=os.path.join(tempfile.mkdtemp(), "radio_state.json")
+        )
+
+    @property
+    def candidate_ips(self) -> List[str]:  # type: ignore[override]
+        return [self.host]
+
+    @property
+    def active_microhard_ip(self) -> str:  # type: ignore[override]
+        return self.host
+
+    @property
+    def is_default_microhard(self) -> bool:  # type: ignore[override]
+        return False
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    # Inclusive, so a small sample never reports a p99 above its maximum
+    quantiles = (
+        statistics.quantiles(ordered, n=100, method="inclusive")
+        if len(ordered) > 1
+        else ordered
+    )
+    return {
+        "n": len(ordered),
+        "p50_ms": 1000 * statistics.median(ordered),
+        "p99_ms": 1000 * quantiles[min(98, len(quantiles) - 1)],
+        "max_ms": 1000 * ordered[-1],
+    }
+
+
+def _time(action: Callable[[], Any], iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        action()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_benchmark(
+    host: str, port: int, password: str, iterations: int, rssi_seconds: float
+) -> Dict[str, Any]:
+    # A non-beeping action so buzzer time is not part of the measurements
+    service = LocalMicrohardService(
+        host=host, port=port, action=ActionTypes.INFO.value, monark_id=1
+    )
+    results: Dict[str, Any] = {}
+
+    def _cold_connect() -> None:
+        service.close()
+        service.session.get_shell(ip_address=host, ek=password)
+
+    results["connect"] = _percentiles(_time(_cold_connect, max(1, iterations // 5)))
+
+    results["info"] = _percentiles(
+        _time(lambda: service.get_info(ek=password), iterations)
+    )
+
+    frequencies = iter(range(2300, 2300 + 2 * iterations))
+    results["pair_changed"] = _percentiles(
+        _time(
+            lambda: service.apply_config(
+                ek=password,
+                at_commands=service.pair_commands(
+                    network_id="MONARK-BENCH",
+                    ek=password,
+                    tx_power=20,
+                    frequency=next(frequencies),
+                ),
+            ),
+            iterations,
+        )
+    )
+    pair_commands = service.pair_commands(
+        network_id="MONARK-BENCH", ek=password, tx_power=20, frequency=2310
+    )
+    service.apply_config(ek=password, at_commands=pair_commands)
+    results["pair_unchanged"] = _percentiles(
+        _time(
+            lambda: service.apply_config(ek=password, at_commands=pair_commands),
+            iterations,
+        )
+    )
+
+    service.close()
+
+    rssi_samples = _time_rssi_loop(host=host, port=port, seconds=rssi_seconds)
+    results["rssi"] = _percentiles(rssi_samples)
+    results["rssi"]["samples_per_second"] = len(rssi_samples) / rssi_seconds
+    return results
+
+
+def _time_rssi_loop(host: str, port: int, seconds: float) -> List[float]:
+    """
+    Runs the real `rssi_loop` (poll, parse, publish, link status and flight log) as fast
+    as the radio answers and returns the duration of each iteration, i.e. the time from
+    one published sample to the next.
+    """
+    published: List[float] = []
+    end = time.perf_counter() + seconds
+
+    class _Publisher:
+        def __init__(self, **kwargs: Any) -> None:
+            pass
+
+        def publish(self, data: str) -> None:
+            if not data.startswith(SocketCommandType.RSSI.value):
+                return
+            published.append(time.perf_counter())
+            if published[-1] > end:
+                # rssi_loop never returns, this ends its thread
+                raise SystemExit
+
+    # Nothing the loop sets up may replace the files of a real RSSI service
+    directory = tempfile.mkdtemp()
+    setattr(microhard_service, "SocketPublisher", _Publisher)
+    setattr(
+        microhard_service,
+        "RSSI_STATS_SOCKET_PATH",
+        os.path.join(directory, "rssi.sock"),
+    )
+    setattr(
+        microhard_service,
+        "LinkStatusWriter",
+        functools.partial(
+            LinkStatusWriter, path=os.path.join(directory, "link_status")
+        ),
+    )
+
+    service = LocalMicrohardService(
+        host=host, port=port, action=ActionTypes.RSSI.value, monark_id=1
+    )
+    thread = threading.Thread(
+        target=service.rssi_loop,
+        kwargs={
+            "output": RssiOutputTypes.SOCKET.value,
+            "period": BENCHMARK_RSSI_PERIOD,
+            "flight_log_dir": os.path.join(directory, "flights"),
+        },
+        daemon=True,
+    )
+    thread.start()
+    thread.join()
+    service.close()
+    # The first sample includes connecting to the radio
+    return [b - a for a, b in zip(published[1:], published[2:])]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the microhard service against a simulated radio."
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=0,
+        help="Port of an already running simulated radio (0 starts one in-process).",
+    )
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--rssi_seconds", type=float, default=5.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--chunk_size", type=int, default=0)
+    parser.add_argument("--chunk_delay", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    password = MICROHARD_USER
+    radio = None
+    port = args.port
+    if not port:
+        radio = SimulatedRadio(
+            host=args.host,
+            port=0,
+            config=RadioConfig(
+                password=password,
+                latency=args.latency,
+                chunk_size=args.chunk_size,
+                chunk_delay=args.chunk_delay,
+            ),
+        ).start()
+        port = radio.port
+
+    try:
+        results = run_benchmark(
+            host=args.host,
+            port=port,
+            password=password,
+            iterations=args.iterations,
+            rssi_seconds=args.rssi_seconds,
+        )
+    finally:
+        if radio is not None:
+            radio.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'action':<16}{'n':>6}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for action, result in results.items():
+        print(
+            f"{action:<16}{result['n']:>6}{result['p50_ms']:>10.1f}"
+            f"{result['p99_ms']:>10.1f}{result['max_ms']:>10.1f}"
+        )
+    print(f"RSSI samples/s: {results['rssi']['samples_per_second']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
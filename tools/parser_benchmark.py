@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+"""
+Replays the AT reply corpus in tools/transcripts through the streaming parser.
+
+Each reply is fed in chunks of several sizes (down to one byte, which splits every
+multibyte character), checked against its expected value and timed. The old
+`response += part.decode()` accumulation and split-chain RSSI parse are timed on the
+same data for comparison:
+
+    python3 tools/parser_benchmark.py --repeat 200
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import json
+import os
+import sys
+import time
+
+TOOLS_PATH = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_PATH = os.path.join(
+    TOOLS_PATH,
+    "..",
+    "microhard",
+    "usr",
+    "lib",
+    "python3.11",
+    "dist-packages",
+    "microhard",
+)
+sys.path.insert(0, PACKAGE_PATH)
+
+from at_parser import AtResponse
+
+CORPUS_FILE_NAME = os.path.join(TOOLS_PATH, "transcripts", "at_replies.jsonl")
+CHUNK_SIZES = [1, 16, 256, 0]  # 0 feeds the whole reply at once
+LONG_REPLY_SIZE = 1024  # status listings and the like, timed apart from short replies
+
+
+def load_corpus(path: str = CORPUS_FILE_NAME) -> List[Dict[str, Any]]:
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def parse_chunked(command: str, data: bytes, chunk_size: int) -> AtResponse:
+    """
+    Feeds the reply the way the AT engine does, one read at a time.
+    """
+    response = AtResponse(command=command)
+    step = chunk_size or len(data)
+    for i in range(0, len(data), step):
+        response.feed(data[i : i + step])
+    response.close()
+    return response
+
+
+def typed_value(response: AtResponse, record: Dict[str, Any]) -> Any:
+    kind = record["type"]
+    if kind == "ok":
+        return response.is_ok
+    if kind in ["dbm", "rssi", "mhz", "number"]:
+        return response.number(record["key"])
+    if kind == "label":
+        return response.labelled(record["key"])
+    return response.value(record["key"])
+
+
+def legacy_parse(data: bytes, chunk_size: int) -> Optional[str]:
+    """
+    The parsing this module replaced: per chunk decode and the RSSI split chain.
+    """
+    response = ""
+    step = chunk_size or len(data)
+    for i in range(0, len(data), step):
+        response += data[i : i + step].decode(errors="replace")
+    try:
+        return response.split(" ")[1].split("OK")[0].strip()
+    except IndexError:
+        return None
+
+
+def check(corpus: List[Dict[str, Any]]) -> List[str]:
+    failures = []
+    for record in corpus:
+        data = record["reply"].encode()
+        for chunk_size in CHUNK_SIZES:
+            response = parse_chunked(record["command"], data, chunk_size)
+            value = typed_value(response, record)
+            if value != record["expected"]:
+                failures.append(
+                    f"{record['command']} chunk {chunk_size}: "
+                    f"{value!r} != {record['expected']!r}"
+                )
+    return failures
+
+
+def _time(action: Callable[[], Any], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        action()
+    return time.perf_counter() - start
+
+
+def run_benchmark(corpus: List[Dict[str, Any]], repeat: int) -> Dict[str, Any]:
+    """
+    Times short replies and long listings apart, since the parser's cost per reply
+    dominates on the first and its cost per byte on the second.
+    """
+    results: Dict[str, Any] = {}
+    for group, records in [
+        ("short", [r for r in corpus if len(r["reply"]) < LONG_REPLY_SIZE]),
+        ("long", [r for r in corpus if len(r["reply"]) >= LONG_REPLY_SIZE]),
+    ]:
+        if not records:
+            continue
+        replies = [(record, record["reply"].encode()) for record in records]
+        total_bytes = sum(len(data) for _, data in replies)
+        for chunk_size in CHUNK_SIZES:
+            seconds = _time(
+                # The typed value is looked up too, as the legacy parse extracts one
+                lambda: [
+                    typed_value(
+                        parse_chunked(record["command"], data, chunk_size), record
+                    )
+                    for record, data in replies
+                ],
+                repeat,
+            )
+            legacy_seconds = _time(
+                lambda: [legacy_parse(data, chunk_size) for _, data in replies], repeat
+            )
+            results[f"{group} {chunk_size or 'whole'}"] = {
+                "replies_per_second": repeat * len(replies) / seconds,
+                "mb_per_second": repeat * total_bytes / seconds / 1e6,
+                "legacy_replies_per_second": repeat * len(replies) / legacy_seconds,
+                "legacy_mb_per_second": repeat * total_bytes / legacy_seconds / 1e6,
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check and benchmark the AT reply parser against the corpus."
+    )
+    parser.add_argument("--corpus", type=str, default=CORPUS_FILE_NAME)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    failures = check(corpus)
+    for failure in failures:
+        print(f"MISMATCH {failure}")
+    results = run_benchmark(corpus, args.repeat)
+
+    if args.json:
+        print(json.dumps({"failures": failures, "results": results}, indent=2))
+    else:
+        print(f"{len(corpus)} replies, {len(failures)} mismatches")
+        print(
+            f"{'chunk':<12}{'replies/s':>12}{'MB/s':>8}"
+            f"{'legacy replies/s':>18}{'legacy MB/s':>13}"
+        )
+        for chunk, result in results.items():
+            print(
+                f"{chunk:<12}{result['replies_per_second']:>12.0f}"
+                f"{result['mb_per_second']:>8.1f}"
+                f"{result['legacy_replies_per_second']:>18.0f}"
+                f"{result['legacy_mb_per_second']:>13.1f}"
+            )
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+
+"""
+A local stand-in for the Microhard radio's SSH AT command shell.
+
+It speaks enough of the radio's CLI to exercise `send_commands`, `pair_monark`,
+`get_info` and the RSSI loop without hardware: settings can be read (AT+MWFREQ) and
+written (AT+MWFREQ=2310), AT+MWRSSI returns a jittered value, AT+MWSTATUS a status
+listing with the link metrics and AT&W saves.
+Response latency, output chunking and faults (ERROR replies, dropped sessions) are
+configurable so performance work can be reproduced on any Linux box.
+
+    python3 tools/simulated_radio.py --port 2222 --latency 0.02 --chunk_size 16
+"""
+
+from typing import Dict, List, Optional
+import argparse
+import random
+import socket
+import threading
+import time
+import paramiko
+
+PROMPT = "UserDevice> "
+BANNER = "\r\nEntering character mode\r\n\r\n\r\nCommand Line Interface\r\n"
+
+# Setting name -> (initial value, unit shown after the value)
+DEFAULT_SETTINGS = {
+    "MWRADIO": ("1", ""),
+    "MWVMODE": ("0", ""),
+    "MWTXPOWER": ("30", " dBm"),
+    "MWNETWORKID": ("pMDDL", ""),
+    "MWFREQ": ("2400", " MHz"),
+    "MWDISTANCE": ("3000", " m"),
+    "MWVENCRYPT": ("0", ""),
+    "MNLAN": ("LAN,192.168.168.1,255.255.255.0", ""),
+    "MNLANDHCP": ("1", ""),
+    "MWBAND": ("8", " MHz"),
+}
+
+
+class RadioConfig:
+    def __init__(
+        self,
+        password: str = "admin",
+        latency: float = 0.0,
+        chunk_size: int = 0,
+        chunk_delay: float = 0.0,
+        error_rate: float = 0.0,
+        drop_rate: float = 0.0,
+        rssi: float = -65.0,
+        rssi_jitter: float = 3.0,
+    ) -> None:
+        self.password = password
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.rssi = rssi
+        self.rssi_jitter = rssi_jitter
+
+
+class RadioState:
+    """
+    Settings shared by every SSH session, like the real radio's configuration.
+    """
+
+    def __init__(self) -> None:
+        self.settings: Dict[str, str] = {k: v[0] for k, v in DEFAULT_SETTINGS.items()}
+        self.saved = dict(self.settings)
+        self.lock = threading.Lock()
+        self.commands = 0
+        self.saves = 0
+
+    def _status(self, config: RadioConfig) -> str:
+        """
+        A wireless status listing with the link metrics the telemetry reads.
+        """
+        rssi = config.rssi + random.uniform(-config.rssi_jitter, config.rssi_jitter)
+        noise = -100 + random.uniform(-1, 1)
+        return (
+            "+MWSTATUS:\r\n"
+            f"  Frequency          : {self.settings['MWFREQ']} MHz\r\n"
+            f"  Tx Power           : {self.settings['MWTXPOWER']} dBm\r\n"
+            "  Connection Info\r\n"
+            f"    RSSI (dBm)       : {int(round(rssi))}\r\n"
+            f"    SNR (dB)         : {int(round(rssi - noise))}\r\n"
+            f"    Noise Floor (dBm): {int(round(noise))}\r\n"
+            f"    Remote RSSI (dBm): {int(round(rssi - 2))}\r\n"
+            f"    Remote Noise Floor (dBm): {int(round(noise + 1))}\r\n"
+            "    Tx Rate (kbps)   : 12000\r\n"
+            "    Rx Rate (kbps)   : 9000\r\n"
+            "OK\r\n"
+        )
+
+    def handle(self, command: str, config: RadioConfig) -> str:
+        """
+        Returns the reply body (without echo or prompt) for one AT command.
+        """
+        with self.lock:
+            self.commands += 1
+            if config.error_rate and random.random() < config.error_rate:
+                return "ERROR: simulated fault\r\n"
+
+            if command == "AT":
+                return "OK\r\n"
+            if command == "AT&W":
+                self.saved = dict(self.settings)
+                self.saves += 1
+                return "OK\r\n"
+            if not command.startswith("AT+"):
+                return "ERROR: Invalid command\r\n"
+
+            key, is_write, value = command[3:].partition("=")
+            if key == "MWRSSI" and not is_write:
+                rssi = config.rssi + random.uniform(
+                    -config.rssi_jitter, config.rssi_jitter
+                )
+                return f"+MWRSSI: {int(round(rssi))} dBm\r\nOK\r\n"
+            if key == "MWSTATUS" and not is_write:
+                return self._status(config)
+            if key == "MSPWD" and is_write:
+                password, _, confirm = value.partition(",")
+                if password != confirm:
+                    return "ERROR: Passwords do not match\r\n"
+                config.password = password
+                return "OK\r\n"
+            if key not in self.settings:
+                return "ERROR: Invalid command\r\n"
+
+            if is_write:
+                if key == "MNLAN":
+                    # AT+MNLAN=LAN,EDIT,0,<ip>,<netmask>,0
+                    parts = value.split(",")
+                    if len(parts) < 5:
+                        return "ERROR: Invalid parameters\r\n"
+                    value = ",".join([parts[0], parts[3], parts[4]])
+                elif key == "MWVENCRYPT":
+                    value = value.split(",")[0]
+                self.settings[key] = value
+                return "OK\r\n"
+
+            unit = DEFAULT_SETTINGS[key][1]
+            return f"+{key}: {self.settings[key]}{unit}\r\nOK\r\n"
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, config: RadioConfig) -> None:
+        self.config = config
+        self.shell_requested = threading.Event()
+
+    def check_auth_password(self, username: str, password: str) -> int:
+        if username == "admin" and password == self.config.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username: str) -> str:
+        return "password"
+
+    def check_channel_request(self, kind: str, chanid: int) -> int:
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, *args) -> bool:
+        return True
+
+    def check_channel_shell_request(self, channel: paramiko.Channel) -> bool:
+        self.shell_requested.set()
+        return True
+
+
+class SimulatedRadio:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 2222,
+        config: Optional[RadioConfig] = None,
+        verbose: bool = False,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.config = config or RadioConfig()
+        self.state = RadioState()
+        self.verbose = verbose
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((host, port))
+        self.port = self.server_socket.getsockname()[1]
+        self.is_running = False
+        self.transports: List[paramiko.Transport] = []
+
+    def start(self) -> "SimulatedRadio":
+        self.server_socket.listen(16)
+        self.is_running = True
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.is_running = False
+        self.server_socket.close()
+        for transport in self.transports:
+            transport.close()
+
+    def serve_forever(self) -> None:
+        while self.is_running:
+            try:
+                client_socket, _ = self.server_socket.accept()
+            except OSError:
+                break
+            threading.Thread(
+                target=self._serve_client, args=(client_socket,), daemon=True
+            ).start()
+
+    def _serve_client(self, client_socket: socket.socket) -> None:
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        transport = paramiko.Transport(client_socket)
+        transport.add_server_key(self.host_key)
+        self.transports.append(transport)
+        server = _ServerInterface(self.config)
+        try:
+            transport.start_server(server=server)
+            channel = transport.accept(timeout=10)
+            if channel is None or not server.shell_requested.wait(timeout=10):
+                return
+            self._run_shell(channel)
+        except Exception as e:
+            if self.verbose:
+                print(f"Session ended: {e}")
+        finally:
+            transport.close()
+            self.transports.remove(transport)
+
+    def _write(self, channel: paramiko.Channel, data: str) -> None:
+        payload = data.encode()
+        chunk_size = self.config.chunk_size or len(payload)
+        for i in range(0, len(payload), chunk_size):
+            channel.sendall(payload[i : i + chunk_size])
+            if self.config.chunk_delay and i + chunk_size < len(payload):
+                time.sleep(self.config.chunk_delay)
+
+    def _run_shell(self, channel: paramiko.Channel) -> None:
+        self._write(channel, BANNER + PROMPT)
+        pending = b""
+        while self.is_running:
+            data = channel.recv(1024)
+            if not data:
+                return
+            pending += data
+            while b"\n" in pending:
+                line, _, pending = pending.partition(b"\n")
+                command = line.decode(errors="replace").strip()
+                # Echo the input like the radio's terminal does
+                self._write(channel, command + "\r\n")
+                if not command:
+                    self._write(channel, PROMPT)
+                    continue
+
+                if self.config.drop_rate and random.random() < self.config.drop_rate:
+                    if self.verbose:
+                        print(f"Dropping the session on {command}")
+                    channel.get_transport().close()
+                    return
+
+                if self.config.latency:
+                    time.sleep(self.config.latency)
+                reply = self.state.handle(command, self.config)
+                if self.verbose:
+                    print(f"{command} -> {reply.strip()}")
+                self._write(channel, reply + PROMPT)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Simulated Microhard radio SSH AT command shell."
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2222)
+    parser.add_argument("--password", type=str, default="admin")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds before each reply."
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=0,
+        help="Split output into writes of this many bytes (0 for whole replies).",
+    )
+    parser.add_argument(
+        "--chunk_delay", type=float, default=0.0, help="Seconds between chunks."
+    )
+    parser.add_argument(
+        "--error_rate", type=float, default=0.0, help="Probability of an ERROR reply."
+    )
+    parser.add_argument(
+        "--drop_rate",
+        type=float,
+        default=0.0,
+        help="Probability of dropping the session on a command.",
+    )
+    parser.add_argument("--rssi", type=float, default=-65.0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    radio = SimulatedRadio(
+        host=args.host,
+        port=args.port,
+        config=RadioConfig(
+            password=args.password,
+            latency=args.latency,
+            chunk_size=args.chunk_size,
+            chunk_delay=args.chunk_delay,
+            error_rate=args.error_rate,
+            drop_rate=args.drop_rate,
+            rssi=args.rssi,
+        ),
+        verbose=args.verbose,
+    ).start()
+    print(f"Simulated radio listening on {radio.host}:{radio.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        radio.stop()
+
+
+if __name__ == "__main__":
+    main()